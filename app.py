@@ -3,10 +3,9 @@ import sqlite3
 from typing import Annotated
 from dotenv import load_dotenv
 
-from langchain_groq import ChatGroq
-from langgraph.prebuilt import create_react_agent
 from typing_extensions import TypedDict
 from langgraph.graph.message import add_messages
+from langchain_core.runnables import RunnableLambda
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,14 +15,16 @@ from tools import (
     expert_planner_skill,
     robust_search_skill,
     critique_skill,
-    report_writer_skill
+    report_writer_skill,
+    safe_json_parse,
+    _get_token_writer,
 )
+from guardrails import GUARDRAIL_MAX_CHARS, get_guardrail
+from conversation_memory import asummarize_node, summarize_node, summary_prompt_section
 
 # === ENVIRONMENT SETUP ===
 load_dotenv()
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-if not GROQ_API_KEY:
-    raise EnvironmentError("❌ Missing GROQ_API_KEY in .env")
 
 # === MEMORY / CHECKPOINTING ===
 # Using dynamically injected postgres checkpoints via db_manager.py
@@ -32,17 +33,46 @@ if not GROQ_API_KEY:
 class AgentState(TypedDict):
     """The agent state tracks the conversation messages via LangChain."""
     messages: Annotated[list, add_messages]
+    # Running summary of the turns folded out of `messages` (conversation_memory.py)
+    summary: str
+
+class PipelineState(TypedDict):
+    """State for the deterministic plan -> search -> write -> critique pipeline."""
+    messages: Annotated[list, add_messages]
+    topic: str
+    plan: str
+    gathered_content: str
+    draft: str
+    critique: str
+    revisions: int
+
+# === WORKFLOW MODES ===
+# "react": the LLM agent chooses each tool call. "pipeline": fixed StateGraph
+# nodes with no tool-selection completions in between.
+WORKFLOW_MODES = ("react", "pipeline")
+DEFAULT_WORKFLOW_MODE = os.getenv("WORKFLOW_MODE", "react")
+# Upper bound on critique-driven rewrite rounds in pipeline mode
+PIPELINE_MAX_REVISIONS = int(os.getenv("PIPELINE_MAX_REVISIONS", "1"))
 
 # === MODEL ===
 # We must use a LangChain compatible ChatModel for create_react_agent
 # Utilizing ChatGroq with a custom model string. If this is routing through an 
 # OpenAI compatible API proxy (like OpenRouter) due to the 'openai/' prefix, 
 # you may also need to set base_url depending on the user's environment setup.
-llm = ChatGroq(
-    model="openai/gpt-oss-120b", 
-    temperature=0.7, 
-    api_key=GROQ_API_KEY
-)
+# The model and the agent are built on first use, so importing this module
+# (workers, the pipeline mode, tests) does not pay for langchain_groq.
+def _get_llm():
+    model = globals().get("llm")
+    if model is None:
+        if not GROQ_API_KEY:
+            raise EnvironmentError("❌ Missing GROQ_API_KEY in .env")
+        from langchain_groq import ChatGroq
+        model = globals()["llm"] = ChatGroq(
+            model="openai/gpt-oss-120b", 
+            temperature=0.7, 
+            api_key=GROQ_API_KEY
+        )
+    return model
 
 # === TOOLS ENSEMBLE ===
 tools = [
@@ -70,26 +100,50 @@ def _get_system_message() -> str:
         "If you encounter such a request, politely refuse and state the reason, then STOP."
     )
 
-react_agent = create_react_agent(
-    model=llm,
-    tools=tools,
-    prompt=_get_system_message()
-)
+def _agent_prompt(state) -> list:
+    """System message (with the running summary of older turns, if any) followed by the kept messages."""
+    from langchain_core.messages import SystemMessage
+    system = _get_system_message() + summary_prompt_section(state.get("summary"))
+    return [SystemMessage(content=system)] + list(state["messages"])
+
+def _get_react_agent():
+    agent = globals().get("react_agent")
+    if agent is None:
+        from langgraph.prebuilt import create_react_agent
+        from langgraph.prebuilt.chat_agent_executor import AgentState as ReactAgentState
+
+        class SummarizedAgentState(ReactAgentState):
+            summary: str
+
+        agent = globals()["react_agent"] = create_react_agent(
+            model=_get_llm(),
+            tools=tools,
+            prompt=_agent_prompt,
+            state_schema=SummarizedAgentState
+        )
+    return agent
+
+def __getattr__(name: str):
+    # `app.llm` and `app.react_agent` still work as attributes (PEP 562)
+    if name == "llm":
+        return _get_llm()
+    if name == "react_agent":
+        return _get_react_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def guardrail_node(state: AgentState):
     from langchain_core.messages import AIMessage
-    user_msg = state["messages"][-1].content.lower()
+    user_msg = state["messages"][-1].content
     
     # Input sanity validation (length)
-    if len(user_msg) > 5000:
+    if len(user_msg) > GUARDRAIL_MAX_CHARS:
         logger.warning(f"Input rejected due to excessive length ({len(user_msg)} chars).")
-        refusal = AIMessage(content="I must REFUSE to answer this request as it exceeds the maximum allowed length (5000 characters).")
+        refusal = AIMessage(content=f"I must REFUSE to answer this request as it exceeds the maximum allowed length ({GUARDRAIL_MAX_CHARS} characters).")
         return {"messages": [refusal]}
 
-    banned_words = ["illegal", "pii", "violence", "steal", "hack", "social security", "credit card"]
-    
-    if any(m in user_msg for m in banned_words):
-        logger.warning("Input rejected due to guardrail violation.")
+    violation = get_guardrail().check(user_msg)
+    if violation:
+        logger.warning(f"Input rejected due to guardrail violation ({violation.category}: {violation.pattern!r}).")
         refusal = AIMessage(content="I must REFUSE to answer this request as it violates safety policies.")
         return {"messages": [refusal]}
     return {"messages": []}
@@ -103,21 +157,140 @@ def route_after_guardrail(state: AgentState):
 
 from langgraph.graph import StateGraph, START, END
 
-def build_workflow(checkpointer):
-    """
-    Builds the state graph using a provided checkpointer.
-    This allows us to seamlessly swap between SQLite and PostgreSQL.
-    """
+# === DETERMINISTIC PIPELINE NODES ===
+# Each node has a sync and an async body so the pipeline runs natively under
+# both graph.stream and graph.astream.
+
+def _announce_step(step: str) -> None:
+    """Emit a {"step": ...} custom stream event so the UI can show progress."""
+    writer = _get_token_writer()
+    if writer is not None:
+        writer({"step": step})
+
+def intake_node(state: PipelineState):
+    """Reset the per-report fields from the latest user message."""
+    return {"topic": state["messages"][-1].content, "plan": "", "gathered_content": "",
+            "draft": "", "critique": "", "revisions": 0}
+
+def route_after_guardrail_pipeline(state: PipelineState):
+    return END if route_after_guardrail(state) == END else "intake"
+
+def plan_node(state: PipelineState):
+    _announce_step("plan")
+    return {"plan": expert_planner_skill.invoke({"topic": state["topic"]})}
+
+async def aplan_node(state: PipelineState):
+    _announce_step("plan")
+    return {"plan": await expert_planner_skill.ainvoke({"topic": state["topic"]})}
+
+def _search_args(state: PipelineState) -> dict:
+    # Revision rounds steer the search with the latest critique
+    return {"topic": state["topic"], "context": state.get("critique") or None}
+
+def search_node(state: PipelineState):
+    _announce_step("search")
+    found = robust_search_skill.invoke(_search_args(state))
+    return {"gathered_content": "\n\n".join(c for c in (state.get("gathered_content"), found) if c)}
+
+async def asearch_node(state: PipelineState):
+    _announce_step("search")
+    found = await robust_search_skill.ainvoke(_search_args(state))
+    return {"gathered_content": "\n\n".join(c for c in (state.get("gathered_content"), found) if c)}
+
+def _writer_args(state: PipelineState) -> dict:
+    # The critique travels on its own, so the plan stays a parseable outline for the section writer
+    return {"topic": state["topic"], "plan": state["plan"], "gathered_content": state["gathered_content"],
+            "critique": state.get("critique") or ""}
+
+def write_node(state: PipelineState):
+    _announce_step("write")
+    return {"draft": report_writer_skill.invoke(_writer_args(state))}
+
+async def awrite_node(state: PipelineState):
+    _announce_step("write")
+    return {"draft": await report_writer_skill.ainvoke(_writer_args(state))}
+
+def critique_node(state: PipelineState):
+    _announce_step("critique")
+    return {"critique": critique_skill.invoke({"draft": state["draft"]})}
+
+async def acritique_node(state: PipelineState):
+    _announce_step("critique")
+    return {"critique": await critique_skill.ainvoke({"draft": state["draft"]})}
+
+def revise_node(state: PipelineState):
+    """Start a revision round: re-search with the critique as context."""
+    return {**search_node(state), "revisions": state.get("revisions", 0) + 1}
+
+async def arevise_node(state: PipelineState):
+    return {**await asearch_node(state), "revisions": state.get("revisions", 0) + 1}
+
+def route_after_critique(state: PipelineState):
+    """Revise while the critique still lists weaknesses and the revision budget lasts."""
+    if state.get("revisions", 0) >= PIPELINE_MAX_REVISIONS:
+        return "finalize"
+    critique = safe_json_parse(state.get("critique", ""), fallback={})
+    if isinstance(critique, dict) and critique.get("weaknesses"):
+        return "revise"
+    return "finalize"
+
+def finalize_node(state: PipelineState):
+    from langchain_core.messages import AIMessage
+    return {"messages": [AIMessage(content=state["draft"])]}
+
+def _build_react_workflow(checkpointer):
     workflow = StateGraph(AgentState)
     workflow.add_node("guardrail", guardrail_node)
-    workflow.add_node("agent", react_agent)
+    # Folds older turns into `summary` once the thread is over MEMORY_TOKEN_BUDGET
+    workflow.add_node("memory", RunnableLambda(summarize_node, afunc=asummarize_node, name="memory"))
+    workflow.add_node("agent", _get_react_agent())
 
     workflow.add_edge(START, "guardrail")
-    workflow.add_conditional_edges("guardrail", route_after_guardrail, {END: END, "agent": "agent"})
+    workflow.add_conditional_edges("guardrail", route_after_guardrail, {END: END, "agent": "memory"})
+    workflow.add_edge("memory", "agent")
     workflow.add_edge("agent", END)
 
     return workflow.compile(checkpointer=checkpointer)
 
+def _build_pipeline_workflow(checkpointer):
+    workflow = StateGraph(PipelineState)
+    workflow.add_node("guardrail", guardrail_node)
+    workflow.add_node("intake", intake_node)
+    workflow.add_node("plan", RunnableLambda(plan_node, afunc=aplan_node, name="plan"))
+    workflow.add_node("search", RunnableLambda(search_node, afunc=asearch_node, name="search"))
+    workflow.add_node("write", RunnableLambda(write_node, afunc=awrite_node, name="write"))
+    workflow.add_node("critique", RunnableLambda(critique_node, afunc=acritique_node, name="critique"))
+    workflow.add_node("revise", RunnableLambda(revise_node, afunc=arevise_node, name="revise"))
+    workflow.add_node("finalize", finalize_node)
+
+    workflow.add_edge(START, "guardrail")
+    workflow.add_conditional_edges("guardrail", route_after_guardrail_pipeline, {END: END, "intake": "intake"})
+    # Planning and the first search round run in parallel and join at "write"
+    workflow.add_edge("intake", "plan")
+    workflow.add_edge("intake", "search")
+    workflow.add_edge(["plan", "search"], "write")
+    workflow.add_edge("write", "critique")
+    workflow.add_conditional_edges("critique", route_after_critique, {"revise": "revise", "finalize": "finalize"})
+    workflow.add_edge("revise", "write")
+    workflow.add_edge("finalize", END)
+
+    return workflow.compile(checkpointer=checkpointer)
+
+def build_workflow(checkpointer, mode: str = "react"):
+    """
+    Builds the state graph using a provided checkpointer.
+    This allows us to seamlessly swap between SQLite and PostgreSQL.
+
+    `mode="react"` lets the agent choose tools; `mode="pipeline"` runs
+    plan and search in parallel, then write -> critique with a bounded
+    revision loop, skipping the per-step tool-selection completions.
+    """
+    if mode == "pipeline":
+        return _build_pipeline_workflow(checkpointer)
+    if mode != "react":
+        raise ValueError(f"Unknown workflow mode '{mode}'. Expected one of {WORKFLOW_MODES}.")
+    return _build_react_workflow(checkpointer)
+
 if __name__ == "__main__":
     from db_manager import get_postgres_saver
     
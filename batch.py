@@ -0,0 +1,261 @@
+# batch.py
+"""
+Batch report generation.
+
+Reads topics from a JSONL or CSV file and runs each one through the graph
+from `app.build_workflow` on a bounded thread pool. Each finished report is
+written to `<out>/<id>.md`, and one line per topic is appended to
+`<out>/manifest.jsonl`.
+
+    python batch.py topics.jsonl --out reports --concurrency 4 --mode pipeline
+
+Input formats:
+  * JSONL: one object per line with a "topic" field and an optional "id",
+    or a bare JSON string.
+  * CSV: a header row with a "topic" column (otherwise the first column is
+    used) and an optional "id" column.
+
+Work shared across topics runs once. Concurrent identical planner prompts
+and search queries are collapsed by singleflight.py, and the completion and
+search caches serve repeats that come later.
+
+Every topic gets a deterministic thread_id derived from the batch name and
+the topic. Re-running a batch after a crash does the following:
+  * skips topics whose report file already exists;
+  * resumes interrupted graph runs from the checkpointer;
+  * writes out runs that finished but were never saved;
+  * starts the remaining topics from scratch.
+
+With `--provider-batch` (or LLM_BATCH=1), completions from all running
+topics are pooled into provider Batch API jobs instead of interactive calls.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_OUTPUT_DIR = os.getenv("BATCH_OUTPUT_DIR", "reports")
+MANIFEST_NAME = "manifest.jsonl"
+
+_THREAD_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "multi-agent-report-system/batch")
+
+
+class BatchItem(NamedTuple):
+    id: str
+    topic: str
+
+
+def _slug(text: str, limit: int = 48) -> str:
+    slug = re.sub(r"[^a-z0-9]+", "-", text.casefold()).strip("-")
+    return slug[:limit].rstrip("-") or "topic"
+
+
+def _default_id(topic: str) -> str:
+    digest = hashlib.sha1(topic.encode("utf-8")).hexdigest()[:8]
+    return f"{_slug(topic)}-{digest}"
+
+
+def _make_item(topic: Any, item_id: Any = None) -> Optional[BatchItem]:
+    topic = str(topic or "").strip()
+    if not topic:
+        return None
+    if item_id is None or not str(item_id).strip():
+        return BatchItem(_default_id(topic), topic)
+    # Ids become file names, so they are slugged too
+    return BatchItem(_slug(str(item_id), limit=80), topic)
+
+
+def load_topics(path: str) -> List[BatchItem]:
+    """
+    Topics from a `.jsonl` or `.csv` file, in file order. Blank rows are
+    skipped and repeated ids are kept once.
+    """
+    items: List[BatchItem] = []
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            topic_field = "topic" if "topic" in (reader.fieldnames or []) else (reader.fieldnames or [None])[0]
+            for row in reader:
+                item = _make_item(row.get(topic_field), row.get("id"))
+                if item is not None:
+                    items.append(item)
+    else:
+        with open(path, encoding="utf-8") as f:
+            for lineno, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{path}:{lineno}: invalid JSON ({e})") from e
+                item = (_make_item(record.get("topic"), record.get("id")) if isinstance(record, dict)
+                        else _make_item(record))
+                if item is not None:
+                    items.append(item)
+
+    unique: Dict[str, BatchItem] = {}
+    for item in items:
+        if item.id in unique:
+            logger.warning(f"⚠️ Duplicate topic id '{item.id}' in {path}; keeping the first.")
+            continue
+        unique[item.id] = item
+    return list(unique.values())
+
+
+def thread_id_for(item: BatchItem, batch_name: str) -> str:
+    """Stable checkpointer thread for `item`, so a re-run finds its earlier progress."""
+    return f"batch-{uuid.uuid5(_THREAD_NAMESPACE, f'{batch_name}:{item.id}:{item.topic}')}"
+
+
+def _final_report(values: Dict[str, Any]) -> Optional[str]:
+    messages = (values or {}).get("messages") or []
+    if not messages or getattr(messages[-1], "type", "") != "ai":
+        return None
+    return str(messages[-1].content)
+
+
+def _write_report(path: str, report: str) -> None:
+    # Write-then-rename, so a crash never leaves a half-written report that would be skipped
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(report if report.endswith("\n") else report + "\n")
+    os.replace(tmp, path)
+
+
+def run_item(graph, item: BatchItem, out_dir: str, batch_name: str) -> Dict[str, Any]:
+    """Generate (or resume) one report. Never raises; failures are reported in the result."""
+    thread_id = thread_id_for(item, batch_name)
+    output = os.path.join(out_dir, f"{item.id}.md")
+    result = {"id": item.id, "topic": item.topic, "thread_id": thread_id, "output": output}
+    if os.path.exists(output):
+        return {**result, "status": "skipped", "seconds": 0.0}
+
+    from runtime import get_runtime
+
+    runtime = get_runtime()
+    config = {"configurable": {"thread_id": thread_id}}
+    started = time.perf_counter()
+    runtime.record_thread(thread_id, item.topic, "running")
+    try:
+        snapshot = graph.get_state(config)
+        report = _final_report(snapshot.values)
+        if snapshot.next:
+            # Interrupted mid-run: continue from the last completed node
+            status = "resumed"
+            report = _final_report(graph.invoke(None, config))
+        elif report is not None and not report.startswith("[error"):
+            status = "recovered"  # finished before the crash, but never written out
+        else:
+            status = "done"
+            report = _final_report(graph.invoke({"messages": [("user", item.topic)]}, config))
+    except Exception as e:
+        logger.warning(f"⚠️ Topic '{item.id}' failed: {e}")
+        runtime.record_thread(thread_id, status="failed")
+        return {**result, "status": "failed", "error": str(e), "seconds": round(time.perf_counter() - started, 3)}
+
+    seconds = round(time.perf_counter() - started, 3)
+    if report is None or report.startswith("[error"):
+        runtime.record_thread(thread_id, status="failed")
+        return {**result, "status": "failed", "error": report or "no report produced", "seconds": seconds}
+    runtime.record_thread(thread_id, status="done")
+    if "REFUSE" in report:
+        return {**result, "status": "refused", "error": report, "seconds": seconds}
+    _write_report(output, report)
+    return {**result, "status": status, "seconds": seconds}
+
+
+def run_batch(items: List[BatchItem], out_dir: str = BATCH_OUTPUT_DIR, graph=None,
+              mode: str = "pipeline", concurrency: int = BATCH_CONCURRENCY,
+              batch_name: str = "batch") -> List[Dict[str, Any]]:
+    """
+    Run every item with at most `concurrency` graphs in flight. Results are
+    returned in input order, and each one is appended to the manifest as soon
+    as it finishes. Without `graph`, the process-wide runtime's graph for
+    `mode` is used, so its checkpointer is the one resumed from.
+    """
+    if graph is None:
+        from runtime import get_runtime
+        graph = get_runtime().get_graph(mode)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    manifest_lock = threading.Lock()
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="batch") as executor:
+        futures = {executor.submit(run_item, graph, item, out_dir, batch_name): i for i, item in enumerate(items)}
+        for fut in as_completed(futures):
+            result = fut.result()
+            results[futures[fut]] = result
+            with manifest_lock, open(manifest_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({**result, "finished_at": time.time()}) + "\n")
+            logger.info(f"[{result['status']}] {result['id']} ({result['seconds']}s)")
+    return results
+
+
+def dedupe_stats() -> dict:
+    """Work saved by single-flight and the caches during this process."""
+    import groq_client
+    import tools
+
+    return {
+        "completions": groq_client.inflight_stats(),
+        "searches": tools.search_inflight_stats(),
+        "completion_cache": groq_client.cache_stats(),
+        "search_cache": tools.search_cache_stats(),
+    }
+
+
+def summarize(results: List[Dict[str, Any]]) -> dict:
+    counts: Dict[str, int] = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    return {"topics": len(results), **counts}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL or CSV file of topics")
+    parser.add_argument("--out", default=BATCH_OUTPUT_DIR, help="directory for reports and the manifest")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--mode", default="pipeline", choices=("react", "pipeline"))
+    parser.add_argument("--batch-name", default=None,
+                        help="namespace for thread ids (default: input file name); reuse it to resume")
+    parser.add_argument("--provider-batch", action="store_true",
+                        help="send completions through the provider Batch API (slower, cheaper; see llm_batch.py)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.provider_batch:
+        import groq_client
+        groq_client.use_batch_backend(True)
+
+    items = load_topics(args.input)
+    batch_name = args.batch_name or os.path.splitext(os.path.basename(args.input))[0]
+    started = time.perf_counter()
+    results = run_batch(items, args.out, mode=args.mode, concurrency=args.concurrency, batch_name=batch_name)
+
+    print(f"\n{json.dumps(summarize(results))} in {time.perf_counter() - started:.1f}s")
+    stats = dedupe_stats()
+    for kind in ("completions", "searches"):
+        print(f"{kind}: {stats[kind]['executed']} executed, {stats[kind]['shared']} shared in flight")
+    for kind in ("completion_cache", "search_cache"):
+        if stats[kind].get("enabled"):
+            print(f"{kind}: {stats[kind]['hits']} hits, {stats[kind]['misses']} misses")
+    failed = [r for r in results if r["status"] == "failed"]
+    for result in failed:
+        print(f"❌ {result['id']}: {result.get('error')}")
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Microbenchmark: local overhead of one Groq completion call, excluding the network.
+
+"before" reproduces the old hot path. Each call decorated a fresh closure with
+tenacity, ran inspect.signature on `chat.completions.create` to pick the
+token keyword, built the payload from scratch and walked the response-shape
+guesses. "after" goes through the module-level retried function and the
+cached llm_adapter. Both use a fake client whose `create` has the real Groq
+SDK signature and returns a real ChatCompletion instantly. The full
+`ask_groq` figure also includes the router, rate limiter and breaker.
+
+    python bench_adapter.py --calls 20000
+"""
+import argparse
+import functools
+import inspect
+import os
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+os.environ.setdefault("GROQ_API_KEY", "bench-placeholder")
+
+from groq.resources.chat.completions import Completions
+from groq.types.chat import ChatCompletion
+from tenacity import retry, stop_after_attempt, wait_exponential
+
+import groq_client
+
+RESPONSE = ChatCompletion.model_validate({
+    "id": "bench", "object": "chat.completion", "created": 0, "model": "m",
+    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "ok"}}],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+})
+
+
+class FakeCompletions:
+    @functools.wraps(Completions.create)
+    def create(self, *args, **kwargs):
+        return RESPONSE
+
+
+CLIENT = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions()))
+
+
+def _legacy_choose_token_param(func):
+    try:
+        params = inspect.signature(func).parameters.keys()
+        if "max_output_tokens" in params:
+            return "max_output_tokens"
+        if "max_tokens" in params:
+            return "max_tokens"
+    except Exception:
+        pass
+    return None
+
+
+def _legacy_extract(resp):
+    try:
+        return resp.choices[0].message.content
+    except Exception:
+        pass
+    try:
+        return resp.choices[0].text
+    except Exception:
+        pass
+    try:
+        return resp.output[0].content[0].text
+    except Exception:
+        pass
+    return str(resp)
+
+
+def legacy_call(prompt, model="openai/gpt-oss-120b", temperature=0.7, max_tokens=300):
+    @retry(wait=wait_exponential(multiplier=1, min=2, max=10), stop=stop_after_attempt(3))
+    def _execute():
+        func = CLIENT.chat.completions.create
+        token_param = _legacy_choose_token_param(func)
+        payload = {"model": model,
+                   "messages": [{"role": "system", "content": groq_client.SYSTEM_MESSAGE},
+                                {"role": "user", "content": prompt}],
+                   "temperature": float(temperature)}
+        if max_tokens is not None and token_param:
+            payload[token_param] = int(max_tokens)
+        return _legacy_extract(func(**payload))
+    return _execute()
+
+
+def adapter_call(prompt, model="openai/gpt-oss-120b", temperature=0.7, max_tokens=300):
+    return groq_client._groq_complete(prompt, model, temperature, max_tokens, 0)
+
+
+def per_call(fn, n):
+    fn("warm-up")
+    start = time.perf_counter()
+    for i in range(n):
+        fn("Summarise the EV market")
+    return (time.perf_counter() - start) / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+
+    with patch.object(groq_client, "_get_client", lambda: CLIENT), \
+         patch.object(groq_client.rate_limiter, "_DEFAULT_LIMITS", {}):
+        before = per_call(legacy_call, args.calls)
+        after = per_call(adapter_call, args.calls)
+        full = per_call(lambda p: groq_client.ask_groq(p, max_tokens=300, use_cache=False), args.calls // 10)
+
+    print(f"before (closure + inspect + shape probing): {before * 1e6:8.1f} us/call")
+    print(f"after  (module retry + cached adapter):     {after * 1e6:8.1f} us/call")
+    print(f"speedup:                                    {before / after:8.1f}x")
+    print(f"full ask_groq (router, limiter, breaker):   {full * 1e6:8.1f} us/call")
+
+
+if __name__ == "__main__":
+    main()
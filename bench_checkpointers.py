@@ -0,0 +1,121 @@
+"""
+Benchmark: checkpoint write throughput per checkpointer backend.
+
+Each report is a synthetic 10-step graph run whose steps append a message
+with a ~2 KB tool result, so every step costs one put() and one
+put_writes(). `--workers` threads run reports on separate thread ids at
+the same time, like concurrent chat sessions. Backends:
+  * memory          MemorySaver (nothing survives a restart)
+  * sqlite (stock)  SqliteSaver on one default sqlite3 connection
+                    (rollback journal, synchronous=FULL, one global lock)
+  * sqlite (pooled) PooledSqliteSaver: connection per thread, WAL,
+                    synchronous=NORMAL, mmap (sqlite_saver.py)
+  * postgres        PostgresSaver on DATABASE_URL, skipped when unreachable
+No LLM or network call is made.
+
+    python bench_checkpointers.py --reports 40 --workers 8
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated, TypedDict
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.graph import END, StateGraph
+from langgraph.graph.message import add_messages
+
+import db_manager
+from sqlite_saver import PooledSqliteSaver, SqliteConnectionPool
+
+RESULT = "Source: https://example.com/ev\n" + "battery demand forecast " * 90
+
+
+class ReportState(TypedDict):
+    messages: Annotated[list, add_messages]
+    step: int
+
+
+def build_graph(checkpointer, steps: int):
+    def agent_step(state: ReportState):
+        step = state.get("step", 0) + 1
+        return {"step": step, "messages": [AIMessage(f"step {step}\n{RESULT}")]}
+
+    builder = StateGraph(ReportState)
+    builder.add_node("agent", agent_step)
+    builder.set_entry_point("agent")
+    builder.add_conditional_edges("agent", lambda s: END if s["step"] >= steps else "agent")
+    return builder.compile(checkpointer=checkpointer)
+
+
+def run(checkpointer, reports: int, workers: int, steps: int) -> dict:
+    graph = build_graph(checkpointer, steps)
+
+    def report(_):
+        config = {"configurable": {"thread_id": str(uuid.uuid4())}, "recursion_limit": steps + 5}
+        started = time.perf_counter()
+        graph.invoke({"messages": [HumanMessage("EV battery market outlook")], "step": 0}, config)
+        return time.perf_counter() - started
+
+    report(None)  # warm up: table creation, first connection
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        latencies = sorted(pool.map(report, range(reports)))
+    elapsed = time.perf_counter() - started
+    return {"checkpoints_per_s": reports * (steps + 1) / elapsed,
+            "report_p50_ms": latencies[len(latencies) // 2] * 1000,
+            "report_p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000}
+
+
+def backends(directory: str):
+    yield "memory", MemorySaver, lambda: None
+
+    def stock():
+        stock.conn = sqlite3.connect(os.path.join(directory, "stock.db"), check_same_thread=False)
+        return SqliteSaver(stock.conn)
+    yield "sqlite (stock)", stock, lambda: stock.conn.close()
+
+    def pooled():
+        pooled.pool = SqliteConnectionPool(os.path.join(directory, "pooled.db"))
+        return PooledSqliteSaver(pooled.pool)
+    yield "sqlite (pooled)", pooled, lambda: pooled.pool.close()
+
+    def postgres():
+        postgres.pool = db_manager.open_postgres_pool()
+        saver = db_manager.PostgresSaver(postgres.pool)
+        saver.setup()
+        return saver
+    yield "postgres", postgres, lambda: postgres.pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--steps", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{args.reports} reports x {args.steps} steps, {args.workers} concurrent")
+    print(f"{'backend':18}{'checkpoints/s':>15}{'report p50':>13}{'report p95':>13}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, open_saver, close in backends(directory):
+            try:
+                checkpointer = open_saver()
+            except Exception as e:
+                print(f"{name:18}  skipped ({e})")
+                continue
+            try:
+                r = run(checkpointer, args.reports, args.workers, args.steps)
+            finally:
+                close()
+            print(f"{name:18}{r['checkpoints_per_s']:>15.0f}"
+                  f"{r['report_p50_ms']:>11.1f}ms{r['report_p95_ms']:>11.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
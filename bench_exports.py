@@ -0,0 +1,75 @@
+"""
+Benchmark: report export latency, first render vs. cached.
+
+Exports `--reports` distinct synthetic reports (about 8 KB of Markdown with
+headings, lists and a table) from `--sessions` sessions each, the way users
+click "Export" on the same report. The first export of a report renders it
+in the export pool; the rest only link the cached artifact. PDF is skipped
+when markdown_pdf is not installed.
+
+    python bench_exports.py --reports 5 --sessions 4 --formats pdf html
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+from export_service import ExportService
+
+SECTION = """## Section {n}
+
+EV battery demand in region {n} keeps growing [1].
+
+* Cell prices fell 14% year on year
+* Sodium-ion share rises to {n}%
+
+| Year | GWh |
+|------|-----|
+| 2024 | {n}00 |
+| 2030 | {n}000 |
+
+"""
+
+
+def make_report(seed: int) -> str:
+    return f"# Report {seed}\n\n" + "".join(SECTION.format(n=n) for n in range(1, 25))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=5)
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--formats", nargs="+", default=["pdf", "html", "md"])
+    args = parser.parse_args()
+
+    print(f"{args.reports} reports x {args.sessions} sessions, {args.workers} export workers")
+    print(f"{'format':8}{'first p50':>12}{'cached p50':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        service = ExportService(directory, workers=args.workers)
+        try:
+            for fmt in args.formats:
+                first, cached = [], []
+                for seed in range(args.reports):
+                    report = make_report(seed)
+                    for session in range(args.sessions):
+                        started = time.perf_counter()
+                        try:
+                            service.export(report, fmt, session_id=f"s{session}")
+                        except ImportError as e:
+                            print(f"{fmt:8}  skipped ({e})")
+                            break
+                        (cached if session else first).append(time.perf_counter() - started)
+                    else:
+                        continue
+                    break
+                if first and cached:
+                    print(f"{fmt:8}{statistics.median(first) * 1000:>10.1f}ms"
+                          f"{statistics.median(cached) * 1000:>10.2f}ms")
+            print(service.stats())
+        finally:
+            service.close()
+
+
+if __name__ == "__main__":
+    main()
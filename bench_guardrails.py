@@ -0,0 +1,80 @@
+"""
+Benchmark: guardrail scan cost against policy size and message length.
+
+"before" is the old `guardrail_node` check: lowercase the message and test
+every banned word with a substring scan. "after" is the compiled
+guardrails.GuardrailPolicy, which normalizes the message once and runs one
+trie-shaped regex over it. Policies are synthetic word lists of increasing
+size (plus the shipped policy), and messages are benign report requests of
+several lengths, the case every chat message pays for.
+
+    python bench_guardrails.py --patterns 10 1000 5000 --sizes 100 1000 5000
+"""
+import argparse
+import random
+import time
+
+from guardrails import GuardrailPolicy, get_guardrail
+
+WORDS = ("market growth revenue battery supply chain lithium demand forecast policy subsidy adoption "
+         "charging network europe china margin capacity investment analyst quarter outlook risk "
+         "report summary strategy competitor pricing segment regional share trend").split()
+# The list app.guardrail_node used to scan for
+OLD_BANNED_WORDS = ["illegal", "pii", "violence", "steal", "hack", "social security", "credit card"]
+
+
+def synthetic_patterns(n: int, rng: random.Random) -> list:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    patterns = set()
+    while len(patterns) < n:
+        words = ["".join(rng.choice(letters) for _ in range(rng.randint(5, 10)))
+                 for _ in range(rng.choice((1, 1, 1, 2)))]
+        patterns.add(" ".join(words) + ("*" if rng.random() < 0.1 else ""))
+    return sorted(patterns)
+
+
+def message(chars: int, rng: random.Random) -> str:
+    words = []
+    while sum(len(w) + 1 for w in words) < chars:
+        words.append(rng.choice(WORDS))
+    return "Write a report on the " + " ".join(words) + "."
+
+
+def per_call_us(fn, messages, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in messages:
+            fn(text)
+    return (time.perf_counter() - start) / (repeat * len(messages)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patterns", type=int, nargs="+", default=[10, 1000, 5000])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    shipped = get_guardrail()
+    policies = [(f"shipped ({len(shipped)})", OLD_BANNED_WORDS, shipped)]
+    for n in args.patterns:
+        patterns = synthetic_patterns(n, rng)
+        start = time.perf_counter()
+        policy = GuardrailPolicy(("synthetic", p) for p in patterns)
+        compile_ms = (time.perf_counter() - start) * 1000
+        print(f"compiled {n} patterns in {compile_ms:.1f} ms")
+        policies.append((str(n), [p.rstrip("*") for p in patterns], policy))
+
+    print(f"\n{'patterns':>14}{'message':>9}{'before':>14}{'after':>14}")
+    for name, words, policy in policies:
+        for size in args.sizes:
+            messages = [message(size, rng) for _ in range(20)]
+            before = per_call_us(lambda text: any(w in text.lower() for w in words), messages, args.repeat)
+            after = per_call_us(policy.check, messages, args.repeat)
+            assert not any(policy.check(text) for text in messages)
+            print(f"{name:>14}{size:>8}c{before:>12.1f}us{after:>12.1f}us")
+
+
+if __name__ == "__main__":
+    main()
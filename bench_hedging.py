@@ -0,0 +1,73 @@
+"""
+Benchmark: tail latency with and without hedged requests.
+
+Two local provider stubs stand in for Groq and Gemini. The primary is usually
+fast but `--slow-rate` of its calls stall for `--stall`x their normal time
+(a busy upstream). The secondary is a little slower but steady. Each mode runs
+the same number of completions through a ProviderRouter from a pool of
+concurrent callers and reports p50/p99 latency and the share of extra
+(hedged) requests it cost.
+
+    python bench_hedging.py --calls 400 --scale 0.05
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from provider_router import ProviderRouter, _quantile
+
+
+def stub(median: float, slow_rate: float, stall: float, rng: random.Random):
+    def call():
+        latency = rng.lognormvariate(0, 0.25) * median
+        if rng.random() < slow_rate:
+            latency *= stall
+        time.sleep(latency)
+        return "ok"
+    return call
+
+
+def run(hedge: bool, args) -> dict:
+    rng = random.Random(args.seed)
+    router = ProviderRouter(["primary", "secondary"], hedge=hedge,
+                            initial_delay=args.scale * 5, min_delay=0)
+    calls = {
+        "primary": stub(args.scale, args.slow_rate, args.stall, rng),
+        "secondary": stub(args.scale * 1.5, 0.01, args.stall, rng),
+    }
+
+    def one(_):
+        started = time.perf_counter()
+        router.run(calls, key="bench")
+        return time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        latencies = list(pool.map(one, range(args.calls)))
+
+    stats = router.stats()
+    extra = sum(s["hedges"] for s in stats.values())
+    return {"p50": _quantile(latencies, 0.5), "p99": _quantile(latencies, 0.99),
+            "extra": extra / args.calls, "hedge_wins": stats["secondary"]["hedge_wins"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--scale", type=float, default=0.05, help="primary median latency in seconds")
+    parser.add_argument("--slow-rate", type=float, default=0.02)
+    parser.add_argument("--stall", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"calls={args.calls} median={args.scale}s slow_rate={args.slow_rate:.0%} stall={args.stall}x")
+    print(f"{'mode':<10}{'p50':>9}{'p99':>9}{'extra req':>11}{'hedge wins':>12}")
+    for hedge in (False, True):
+        r = run(hedge, args)
+        print(f"{'hedged' if hedge else 'primary':<10}{r['p50'] * 1000:>7.0f}ms{r['p99'] * 1000:>7.0f}ms"
+              f"{r['extra']:>11.1%}{r['hedge_wins']:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark: cold import time of the entry-point modules, with a budget.
+
+Each module is imported in a fresh interpreter under `python -X importtime`
+and the cumulative time of its own import is read from the report. The
+median over `--repeat` runs is compared with IMPORT_BUDGETS_MS, and the run
+fails if a module is over budget or if importing it pulled in one of the
+DEFERRED packages, which are only meant to load on first use (the chat
+model and agent, the Tavily and Groq SDKs, gradio, markdown_pdf). It exits
+with status 1 on failure, so it can gate CI.
+
+    python bench_imports.py --repeat 5
+    python bench_imports.py --top 10       # slowest packages under each module
+    python bench_imports.py --scale 2      # slower machine: double every budget
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# Cumulative cold-import budgets (milliseconds) on a developer laptop
+# (before lazy initialization: app ~1750, tools ~1300, chat_interface imported gradio)
+IMPORT_BUDGETS_MS = {
+    "guardrails": 25,
+    "chat_interface": 30,
+    "jobs": 60,
+    "runtime": 600,
+    "tools": 1300,
+    "app": 1500,
+}
+DEFERRED = ("langchain_groq", "langgraph.prebuilt", "tavily", "groq", "gradio", "markdown_pdf")
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def import_profile(module: str) -> list:
+    """(cumulative_us, depth, name) for every module loaded by a cold `import module`."""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    # Importing must not need credentials
+    env.pop("GROQ_API_KEY", None)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if m:
+            rows.append((int(m.group(2)), len(m.group(3)) // 2, m.group(4)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=list(IMPORT_BUDGETS_MS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=0)
+    parser.add_argument("--scale", type=float, default=1.0)
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'module':16}{'median':>10}{'budget':>10}  deferred packages loaded")
+    for module in args.modules:
+        runs = [import_profile(module) for _ in range(args.repeat)]
+        median_ms = statistics.median(next(us for us, _, name in reversed(rows) if name == module)
+                                      for rows in runs) / 1000
+        loaded = sorted({d for _, _, name in runs[0] for d in DEFERRED if name == d or name.startswith(d + ".")})
+        budget = IMPORT_BUDGETS_MS.get(module)
+        over = budget is not None and median_ms > budget * args.scale
+        failed |= over or bool(loaded)
+        budget_text = f"{budget * args.scale:.0f}ms" if budget is not None else "-"
+        print(f"{module:16}{median_ms:>8.0f}ms{budget_text:>10}  {', '.join(loaded) or '-'}"
+              f"{'  OVER BUDGET' if over else ''}")
+        if args.top:
+            # -X importtime lists a module's imports right above it, one level deeper
+            rows = runs[0]
+            end = max(i for i, (_, depth, name) in enumerate(rows) if depth == 0 and name == module)
+            start = max((i for i in range(end) if rows[i][1] == 0), default=-1) + 1
+            children = sorted(((us, name) for us, depth, name in rows[start:end] if depth == 1), reverse=True)
+            for us, name in children[:args.top]:
+                print(f"{'':18}{us / 1000:>8.1f}ms  {name}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark: agent prompt tokens per turn over a long thread, with and without
+the rolling conversation summary.
+
+A 30-turn synthetic consulting thread runs through the react workflow from
+`app.build_workflow` on one thread id. Every turn the scripted agent model
+calls the search and writer skills and then answers with the report, so
+each turn leaves a search dump and a full draft in the thread, the way a
+real follow-up does. Skills, Tavily and the summarizer are local fakes
+(see bench_pipeline.py) and tokens are estimated at ~4 chars/token.
+
+  * full history    MEMORY_TOKEN_BUDGET so large that nothing is folded
+  * rolling summary MEMORY_TOKEN_BUDGET / MEMORY_KEEP_TURNS as configured
+
+"prompt tok" is what the agent model is sent on each turn, summed over its
+calls; "summary tok" is the cost of the summarizer calls.
+
+    python bench_memory.py --turns 30 --budget 6000 --keep-turns 2
+"""
+import argparse
+import os
+import uuid
+import warnings
+from unittest.mock import patch
+
+os.environ.setdefault("GROQ_API_KEY", "bench-placeholder")
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langgraph.checkpoint.memory import MemorySaver
+
+import app
+import conversation_memory
+from bench_pipeline import FakeTavily, Meter, fake_skill_llm
+
+TOPICS = ["EV battery supply chain", "charging networks in Europe", "sodium-ion cell costs",
+          "US EV tax credits", "battery recycling economics", "fleet electrification"]
+
+
+class FollowUpAgentModel(BaseChatModel):
+    """Each turn: search, write, then answer with the draft."""
+
+    meter: Meter
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        start = max(i for i, m in enumerate(messages) if m.type == "human")
+        topic = messages[start].content
+        results = [m for m in messages[start:] if m.type == "tool"]
+        if len(results) == 0:
+            message = AIMessage(content="", tool_calls=[
+                {"name": "robust_search_skill", "args": {"topic": topic}, "id": f"call_{uuid.uuid4().hex}"}])
+        elif len(results) == 1:
+            message = AIMessage(content="", tool_calls=[
+                {"name": "report_writer_skill", "id": f"call_{uuid.uuid4().hex}",
+                 "args": {"topic": topic, "plan": "", "gathered_content": results[0].content}}])
+        else:
+            message = AIMessage(content=results[-1].content)
+        self.meter.record("\n".join(str(m.content) for m in messages), str(message.content) + str(message.tool_calls))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def fake_summarizer(meter: Meter):
+    def _ask(prompt, **kwargs):
+        summary = "The user is researching the EV market: " + "topics, findings and sources so far. " * 40
+        meter.record(prompt, summary)
+        return summary
+    return _ask
+
+
+def run(turns: int, budget: int, keep_turns: int) -> dict:
+    skills_meter, agent_meter, summary_meter = Meter(0), Meter(0), Meter(0)
+    ask, stream = fake_skill_llm(skills_meter)
+    app.__dict__.pop("react_agent", None)
+    per_turn = []
+    with patch("tools.ask_groq", ask), patch("tools.ask_groq_stream", stream), \
+         patch("tools.tavily", FakeTavily()), patch("tools.SEARCH_CACHE_PATH", ""), \
+         patch.object(app, "_get_llm", lambda: FollowUpAgentModel(meter=agent_meter)), \
+         patch.object(conversation_memory, "ask_groq", fake_summarizer(summary_meter)), \
+         patch.object(conversation_memory, "MEMORY_TOKEN_BUDGET", budget), \
+         patch.object(conversation_memory, "MEMORY_KEEP_TURNS", keep_turns):
+        graph = app.build_workflow(MemorySaver())
+        config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+        for turn in range(turns):
+            before = agent_meter.prompt_tokens
+            question = f"Now cover {TOPICS[turn % len(TOPICS)]} (follow-up {turn + 1})."
+            graph.invoke({"messages": [HumanMessage(content=question)]}, config)
+            per_turn.append(agent_meter.prompt_tokens - before)
+        stored = len(graph.get_state(config).values["messages"])
+    app.__dict__.pop("react_agent", None)
+    return {"per_turn": per_turn, "agent_tokens": agent_meter.prompt_tokens,
+            "summary_calls": summary_meter.calls, "summary_tokens": summary_meter.prompt_tokens,
+            "stored_messages": stored}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--budget", type=int, default=conversation_memory.MEMORY_TOKEN_BUDGET)
+    parser.add_argument("--keep-turns", type=int, default=conversation_memory.MEMORY_KEEP_TURNS)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    full = run(args.turns, 10 ** 9, args.keep_turns)
+    rolling = run(args.turns, args.budget, args.keep_turns)
+
+    print(f"{args.turns} turns, budget {args.budget} tokens, {args.keep_turns} turns kept verbatim")
+    print(f"{'turn':>6}{'full history':>15}{'rolling summary':>18}  (agent prompt tokens)")
+    marks = sorted({1, 2, 5, 10, 20, args.turns} & set(range(1, args.turns + 1)))
+    for turn in marks:
+        print(f"{turn:>6}{full['per_turn'][turn - 1]:>15}{rolling['per_turn'][turn - 1]:>18}")
+    print(f"{'total':>6}{full['agent_tokens']:>15}{rolling['agent_tokens']:>18}")
+    print(f"{'':>6}{'':>15}{rolling['summary_tokens']:>18}  + {rolling['summary_calls']} summarizer calls")
+    print(f"stored messages at the end: {full['stored_messages']} vs {rolling['stored_messages']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Benchmark: checkpoint storage and write latency with and without the
+content-addressed payload store (payload_store.py).
+
+A synthetic 20-step agent thread is checkpointed by a SqliteSaver file.
+Every step appends a tool call and a ToolMessage with a ~10 KB search dump,
+and every fourth search repeats an earlier one. "before" uses the saver's
+default serializer. "after" wraps it in a PayloadSerializer, which moves
+the dumps into a zstd-compressed side table. No LLM or network call is made.
+Latencies are medians over `--repeat` runs on fresh files.
+
+    python bench_payloads.py --steps 20 --payload-kb 10
+"""
+import argparse
+import functools
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from typing import Annotated, TypedDict
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.graph import END, StateGraph
+from langgraph.graph.message import add_messages
+
+from payload_store import PayloadSerializer, PayloadStore
+
+WORDS = ("market growth revenue battery supply chain lithium demand forecast policy subsidy adoption "
+         "charging network europe china margin capacity investment analyst quarter outlook risk").split()
+
+
+class ThreadState(TypedDict):
+    messages: Annotated[list, add_messages]
+    step: int
+
+
+@functools.lru_cache(maxsize=None)
+def search_dump(seed: int, kb: int) -> str:
+    rng = random.Random(seed)
+    lines = []
+    while sum(len(line) for line in lines) < kb * 1024:
+        lines.append(f"Source: https://example.com/{rng.randint(1, 10**6)}\n"
+                     + " ".join(rng.choice(WORDS) for _ in range(40)))
+    return "\n\n".join(lines)
+
+
+def build_graph(checkpointer, steps: int, kb: int):
+    def agent_step(state: ThreadState):
+        step = state.get("step", 0) + 1
+        # Every fourth search repeats an earlier query, as agents often do
+        seed = step - 3 if step % 4 == 0 else step
+        call_id = f"call_{step}"
+        return {"step": step, "messages": [
+            AIMessage("", tool_calls=[{"name": "robust_search_skill", "args": {"query": f"q{seed}"}, "id": call_id}]),
+            ToolMessage(search_dump(seed, kb), tool_call_id=call_id),
+        ]}
+
+    builder = StateGraph(ThreadState)
+    builder.add_node("agent", agent_step)
+    builder.set_entry_point("agent")
+    builder.add_conditional_edges("agent", lambda s: END if s["step"] >= steps else "agent")
+    return builder.compile(checkpointer=checkpointer)
+
+
+def _timed(saver, method: str, samples: list):
+    original = getattr(saver, method)
+
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - start)
+
+    setattr(saver, method, wrapper)
+
+
+def _file_bytes(path: str) -> int:
+    return sum(os.path.getsize(p) for p in (path, f"{path}-wal") if os.path.exists(p))
+
+
+def run(directory: str, steps: int, kb: int, payloads: bool) -> dict:
+    directory = tempfile.mkdtemp(dir=directory)
+    db_path = os.path.join(directory, "checkpoints.db")
+    store = PayloadStore(os.path.join(directory, "payloads.db")) if payloads else None
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    saver = SqliteSaver(conn, serde=PayloadSerializer(store) if store else None)
+    puts, writes = [], []
+    _timed(saver, "put", puts)
+    _timed(saver, "put_writes", writes)
+    graph = build_graph(saver, steps, kb)
+    config = {"configurable": {"thread_id": "bench"}, "recursion_limit": steps + 5}
+
+    started = time.perf_counter()
+    graph.invoke({"messages": [HumanMessage("EV battery market outlook")], "step": 0}, config)
+    elapsed = time.perf_counter() - started
+    read_started = time.perf_counter()
+    messages = graph.get_state(config).values["messages"]
+    read = time.perf_counter() - read_started
+    assert len(messages[-1].content) >= kb * 1024
+
+    rows = conn.execute("SELECT COALESCE(SUM(length(checkpoint) + length(metadata)), 0) FROM checkpoints").fetchone()[0]
+    rows += conn.execute("SELECT COALESCE(SUM(length(value)), 0) FROM writes").fetchone()[0]
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    stored = rows + (store.stats()["stored_bytes"] if store else 0)
+    files = _file_bytes(db_path) + (_file_bytes(store.path) if store else 0)
+    if store:
+        store.close()
+    return {"stored": stored, "files": files, "put_ms": statistics.mean(puts) * 1000,
+            "put_p95_ms": sorted(puts)[int(len(puts) * 0.95) - 1] * 1000,
+            "writes_ms": statistics.mean(writes) * 1000, "run_s": elapsed, "read_ms": read * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--payload-kb", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for seed in range(1, args.steps + 1):
+            search_dump(seed, args.payload_kb)
+        results = {False: [], True: []}
+        for _ in range(args.repeat):
+            for payloads in (False, True):
+                results[payloads].append(run(directory, args.steps, args.payload_kb, payloads))
+    before, after = ({key: statistics.median(r[key] for r in runs) for key in runs[0]}
+                     for runs in (results[False], results[True]))
+    print(f"{args.steps}-step thread, {args.payload_kb} KB search dumps")
+    print(f"{'':26}{'before':>12}{'after':>12}")
+    print(f"{'stored bytes':26}{before['stored'] / 1e6:>10.2f}MB{after['stored'] / 1e6:>10.2f}MB")
+    print(f"{'files on disk':26}{before['files'] / 1e6:>10.2f}MB{after['files'] / 1e6:>10.2f}MB")
+    print(f"{'put() mean':26}{before['put_ms']:>10.2f}ms{after['put_ms']:>10.2f}ms")
+    print(f"{'put() p95':26}{before['put_p95_ms']:>10.2f}ms{after['put_p95_ms']:>10.2f}ms")
+    print(f"{'put_writes() mean':26}{before['writes_ms']:>10.2f}ms{after['writes_ms']:>10.2f}ms")
+    print(f"{'whole run':26}{before['run_s'] * 1000:>10.0f}ms{after['run_s'] * 1000:>10.0f}ms")
+    print(f"{'get_state() (rehydrate)':26}{before['read_ms']:>10.2f}ms{after['read_ms']:>10.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
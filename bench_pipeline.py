@@ -0,0 +1,154 @@
+"""
+Benchmark: ReAct agent vs deterministic pipeline for one standard report.
+
+Both graphs run against local fakes: skill completions go through a fake
+`ask_groq`, Tavily is a fake client, and the ReAct agent's tool-selection
+turns come from a scripted chat model. Every fake completion sleeps for
+`--latency` seconds and counts prompt/completion tokens (~4 chars/token),
+so the totals show what the agent's extra full-context turns cost.
+
+Both graphs do the same work: plan, search, write, critique, one revision
+(search + write + critique), then answer.
+
+    python bench_pipeline.py --latency 0.3
+"""
+import argparse
+import os
+import threading
+import time
+import uuid
+import warnings
+from unittest.mock import patch
+
+os.environ.setdefault("GROQ_API_KEY", "bench-placeholder")
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.prebuilt import create_react_agent
+
+import app
+
+
+class Meter:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, prompt: str, completion: str) -> None:
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += len(prompt) // 4
+            self.completion_tokens += len(completion) // 4
+
+
+def fake_skill_llm(meter: Meter):
+    critiques = iter(['{"weaknesses": ["cite 2024 sales data"]}'])
+
+    def _ask(prompt, **kwargs):
+        if "CRITICAL REVIEWER" in prompt:
+            out = next(critiques, '{"weaknesses": []}')
+        elif "RESEARCH ASSISTANT" in prompt:
+            out = '{"queries": ["ev sales 2025", "ev battery costs", "ev policy incentives"]}'
+        elif "REPORT PLANNER" in prompt:
+            out = '{"title": "EV outlook", "sections": [{"name": "Market", "subsections": ["Sales"]}]}'
+        else:
+            out = "Report paragraph. " * 300
+        meter.record(prompt, out)
+        return out
+
+    def _stream(prompt, **kwargs):
+        yield _ask(prompt)
+
+    return _ask, _stream
+
+
+class FakeTavily:
+    def search(self, query, **kwargs):
+        time.sleep(0.05)
+        return {"results": [{"content": f"Evidence about {query}. " * 40, "url": f"https://example.org/{uuid.uuid4()}"}]}
+
+
+class ScriptedAgentModel(BaseChatModel):
+    """Plays the ReAct agent's tool-selection turns in the fixed system-prompt order."""
+
+    meter: Meter
+    script: list
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        tool_results = [m for m in messages if m.type == "tool"]
+        step = len(tool_results)
+        prompt = "\n".join(str(m.content) for m in messages)
+        if step < len(self.script):
+            name = self.script[step]
+            last = {"plan": "", "content": "", "draft": ""}
+            for m in tool_results:
+                last[{"expert_planner_skill": "plan", "robust_search_skill": "content"}.get(m.name, "draft")] = m.content
+            args = {
+                "expert_planner_skill": {"topic": "EV outlook"},
+                "robust_search_skill": {"topic": "EV outlook"},
+                "report_writer_skill": {"topic": "EV outlook", "plan": last["plan"], "gathered_content": last["content"]},
+                "critique_skill": {"draft": last["draft"]},
+            }[name]
+            message = AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": f"call_{step}"}])
+        else:
+            message = AIMessage(content=tool_results[-2].content if len(tool_results) > 1 else "done")
+        self.meter.record(prompt, str(message.content) + str(message.tool_calls))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+REACT_SCRIPT = ["expert_planner_skill", "robust_search_skill", "report_writer_skill", "critique_skill",
+                "robust_search_skill", "report_writer_skill", "critique_skill"]
+
+
+def run(mode: str, latency: float) -> dict:
+    skills_meter, agent_meter = Meter(latency), Meter(latency)
+    ask, stream = fake_skill_llm(skills_meter)
+    agent = create_react_agent(ScriptedAgentModel(meter=agent_meter, script=REACT_SCRIPT),
+                               app.tools, prompt=app._get_system_message())
+
+    with patch("tools.ask_groq", ask), patch("tools.ask_groq_stream", stream), \
+         patch("tools.tavily", FakeTavily()), patch("tools.SEARCH_CACHE_PATH", ""), \
+         patch.object(app, "react_agent", agent), patch.object(app, "PIPELINE_MAX_REVISIONS", 1):
+        graph = app.build_workflow(MemorySaver(), mode=mode)
+        config = {"configurable": {"thread_id": str(uuid.uuid4())}, "recursion_limit": 50}
+        start = time.perf_counter()
+        graph.invoke({"messages": [HumanMessage(content="Write a report on the EV market outlook for 2025.")]}, config)
+        elapsed = time.perf_counter() - start
+
+    return {
+        "llm_calls": skills_meter.calls + agent_meter.calls,
+        "agent_calls": agent_meter.calls,
+        "prompt_tokens": skills_meter.prompt_tokens + agent_meter.prompt_tokens,
+        "completion_tokens": skills_meter.completion_tokens + agent_meter.completion_tokens,
+        "seconds": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per fake completion")
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    print(f"{'mode':<10}{'llm calls':>10}{'(agent)':>9}{'prompt tok':>12}{'compl tok':>11}{'latency':>10}")
+    for mode in ("react", "pipeline"):
+        r = run(mode, args.latency)
+        print(f"{mode:<10}{r['llm_calls']:>10}{r['agent_calls']:>9}{r['prompt_tokens']:>12}"
+              f"{r['completion_tokens']:>11}{r['seconds']:>9.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark: per-message setup overhead of the chat handler.
+
+"before" reproduces the old handler, which opened get_postgres_saver() and
+compiled the graph for every message; "after" reuses the process-wide
+AgentRuntime. Each message is a guardrail-rejected prompt, so no LLM or
+network call is made and the numbers isolate the per-message plumbing.
+
+    python bench_runtime.py --messages 50
+"""
+import argparse
+import os
+import time
+import uuid
+
+os.environ.setdefault("GROQ_API_KEY", "bench-placeholder")
+
+from db_manager import get_postgres_saver
+from runtime import AgentRuntime
+
+MESSAGE = {"messages": [("user", "how to hack a database")]}
+
+
+def _run(graph):
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+    for _ in graph.stream(MESSAGE, config, stream_mode="values"):
+        pass
+
+
+def per_message_before(n: int) -> float:
+    from app import build_workflow
+    start = time.perf_counter()
+    for _ in range(n):
+        with get_postgres_saver() as checkpointer:
+            _run(build_workflow(checkpointer))
+    return (time.perf_counter() - start) / n
+
+
+def per_message_after(n: int) -> float:
+    runtime = AgentRuntime().start()
+    try:
+        start = time.perf_counter()
+        for _ in range(n):
+            _run(runtime.graph)
+        return (time.perf_counter() - start) / n, runtime.backend
+    finally:
+        runtime.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20)
+    args = parser.parse_args()
+
+    before = per_message_before(args.messages)
+    after, backend = per_message_after(args.messages)
+    print(f"checkpointer backend: {backend}")
+    print(f"before (connect + compile per message): {before * 1000:.1f} ms/message")
+    print(f"after  (shared runtime):                {after * 1000:.1f} ms/message")
+    print(f"saved per message:                      {(before - after) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: sequential vs concurrent Tavily fan-out in robust_search_skill.
+
+Uses a local fake Tavily client with configurable latency so no network
+or API key is needed.
+
+    python bench_search.py --queries 8 --latency 0.8 --workers 4
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import tools
+
+
+class FakeTavilyClient:
+    """Stands in for TavilyClient.search with a fixed latency plus jitter."""
+
+    def __init__(self, latency: float, jitter: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+
+    def search(self, query: str, max_results: int = 2, timeout: float = 60, **kwargs) -> dict:
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+        return {"results": [{"content": f"Result for {query}", "url": f"https://example.com/{i}"}
+                            for i in range(max_results)]}
+
+
+def _sequential(queries):
+    return [tools._search_one(q, tools.SEARCH_TIMEOUT) for q in queries]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per fake search call")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--workers", type=int, default=tools.SEARCH_MAX_WORKERS)
+    args = parser.parse_args()
+
+    tools.tavily = FakeTavilyClient(args.latency, args.jitter)
+    # Measure the fan-out itself first, with the result cache out of the way
+    tools.SEARCH_CACHE_PATH = ""
+    queries = [f"query {i}" for i in range(args.queries)]
+
+    start = time.perf_counter()
+    seq = _sequential(queries)
+    seq_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    conc = tools.run_searches(queries, max_workers=args.workers)
+    conc_time = time.perf_counter() - start
+
+    assert seq == conc, "concurrent results must match sequential order"
+    print(f"queries={args.queries} latency={args.latency}s workers={args.workers}")
+    print(f"sequential: {seq_time:.2f}s")
+    print(f"concurrent: {conc_time:.2f}s")
+    print(f"speedup:    {seq_time / conc_time:.1f}x")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tools.SEARCH_CACHE_PATH = os.path.join(tmp, "search_cache.db")
+        tools._search_cache = None
+        tools.run_searches(queries, max_workers=args.workers)
+        # Same topics phrased differently still hit after normalization
+        variants = [f"The {q.upper()}  " for q in queries]
+        start = time.perf_counter()
+        tools.run_searches(variants, max_workers=args.workers)
+        warm_time = time.perf_counter() - start
+        stats = tools.search_cache_stats()
+        print(f"warm cache: {warm_time:.3f}s (hit rate over cold+warm passes {stats['hit_rate']:.0%})")
+        tools._search_cache.close()
+
+
+if __name__ == "__main__":
+    main()
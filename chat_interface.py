@@ -1,8 +1,12 @@
 # chat_interface.py
-import gradio as gr
+import os
 import uuid
 import time
-from markdown_pdf import MarkdownPdf, Section
+
+# Run reports with graph.astream on Gradio's event loop (set ASYNC_WORKFLOW=0 for the threaded path)
+ASYNC_WORKFLOW = os.getenv("ASYNC_WORKFLOW", "1") != "0"
+# Enqueue reports for `python jobs.py worker` processes instead of running them in the web process
+JOB_QUEUE = os.getenv("JOB_QUEUE", "0") == "1"
 
 # CSS to handle simple tooltips on citations 
 css = """
@@ -40,158 +44,387 @@ body {
 }
 """
 
-theme = gr.themes.Base(
-    primary_hue="slate",
-    secondary_hue="gray",
-    neutral_hue="slate",
-).set(
-    body_background_fill="*neutral_50",
-    button_primary_background_fill="*primary_700",
-    button_primary_background_fill_hover="*primary_600",
-    button_primary_text_color="white",
-)
-with gr.Blocks() as demo:
-    gr.Markdown("## 📊 Multi-Agent Strategy Consultant")
+
+def build_theme():
+    import gradio as gr
+
+    return gr.themes.Base(
+        primary_hue="slate",
+        secondary_hue="gray",
+        neutral_hue="slate",
+    ).set(
+        body_background_fill="*neutral_50",
+        button_primary_background_fill="*primary_700",
+        button_primary_background_fill_hover="*primary_600",
+        button_primary_text_color="white",
+    )
+
+
+def build_demo():
+    """
+    Build the Gradio app. gradio is imported here (and markdown_pdf in the
+    export workers) rather than at module level, so importing this module
+    stays cheap; the UI is only constructed by `python chat_interface.py` or
+    on first access to `chat_interface.demo`.
+    """
+    import gradio as gr
+
+    with gr.Blocks() as demo:
+        gr.Markdown("## 📊 Multi-Agent Strategy Consultant")
     
-    # Store the active thread ID
-    current_thread = gr.State(str(uuid.uuid4()))
+        # Store the active thread ID
+        current_thread = gr.State(str(uuid.uuid4()))
     
-    with gr.Row():
-        # Sidebar for History
-        with gr.Column(scale=1, min_width=200):
-            gr.Markdown("### 🕒 Report History")
-            history_list = gr.Radio(choices=[], label="Past Sessions", interactive=True)
-            refresh_btn = gr.Button("🔄 Refresh History")
-            new_chat_btn = gr.Button("📝 New Report")
+        with gr.Row():
+            # Sidebar for History
+            with gr.Column(scale=1, min_width=200):
+                gr.Markdown("### 🕒 Report History")
+                history_search = gr.Textbox(placeholder="Search titles", show_label=False)
+                history_list = gr.Radio(choices=[], label="Past Sessions", interactive=True)
+                older_btn = gr.Button("⬇️ Older")
+                # Keyset cursor (updated_at, thread_id) of the last thread shown, and the choices so far
+                history_cursor = gr.State(None)
+                history_choices = gr.State([])
+                refresh_btn = gr.Button("🔄 Refresh History")
+                new_chat_btn = gr.Button("📝 New Report")
             
-        # Main Chat Area
-        with gr.Column(scale=3):
-            chatbot = gr.Chatbot(height=600, elem_classes="tooltip")
-            with gr.Row():
-                txt = gr.Textbox(placeholder="Type a report topic or question and press Enter", show_label=False, scale=4)
-                send_btn = gr.Button("Send", variant="primary", scale=1)
+            # Main Chat Area
+            with gr.Column(scale=3):
+                chatbot = gr.Chatbot(height=600, elem_classes="tooltip")
+                workflow_mode = gr.Radio(
+                    choices=[("ReAct agent", "react"), ("Fixed pipeline (faster)", "pipeline")],
+                    value=os.getenv("WORKFLOW_MODE", "react"),
+                    label="Workflow",
+                )
+                with gr.Row():
+                    txt = gr.Textbox(placeholder="Type a report topic or question and press Enter", show_label=False, scale=4)
+                    send_btn = gr.Button("Send", variant="primary", scale=1)
             
-            with gr.Row():
-                export_btn = gr.Button("📄 Export Last Report to PDF")
-                download_file = gr.File(label="Download PDF", visible=False)
+                with gr.Row():
+                    export_format = gr.Radio(
+                        choices=[("PDF", "pdf"), ("HTML", "html"), ("Markdown", "md")],
+                        value="pdf",
+                        label="Export format",
+                    )
+                    export_btn = gr.Button("📄 Export Last Report")
+                    download_file = gr.File(label="Download", visible=False)
     
-    gr.Markdown("Logs printed in the server console. If the workflow takes long, wait a few seconds.")
+        gr.Markdown("Logs printed in the server console. If the workflow takes long, wait a few seconds.")
 
-    # --- Callbacks ---
+        # --- Callbacks ---
     
-    def load_history():
-        """Fetch distinct thread IDs from Postgres to populate the sidebar."""
-        from db_manager import fetch_thread_history
-        threads = fetch_thread_history()
-        return gr.update(choices=threads, value=None)
-
-    def start_new_chat():
-        """Reset the chat window and generate a new thread ID."""
-        return [], str(uuid.uuid4()), None
-
-    def switch_thread(selected_thread):
-        """Switch the active thread ID. Future requests map to this session."""
-        if not selected_thread:
-            return gr.update()
-        return selected_thread
-
-    def chat_with_agents_with_thread(message: str, chat_history, thread_id: str):
-        if not message:
-            return chat_history or []
-        if chat_history is None:
-            chat_history = []
-
-        chat_history.append({"role": "user", "content": message})
-        yield chat_history
+        HISTORY_PAGE_SIZE = 50
+
+        def _history_choices(threads):
+            return [(t.title or t.thread_id, t.thread_id) for t in threads]
+
+        def _next_cursor(threads):
+            return (threads[-1].updated_at, threads[-1].thread_id) if len(threads) == HISTORY_PAGE_SIZE else None
+
+        def load_history(search=None):
+            """Most recently updated threads (optionally filtered by title) for the sidebar."""
+            from db_manager import fetch_thread_history
+            threads = fetch_thread_history(HISTORY_PAGE_SIZE, search=search or None)
+            choices = _history_choices(threads)
+            return gr.update(choices=choices, value=None), _next_cursor(threads), choices
+
+        def load_older_history(search, cursor, choices):
+            """Append the next page of threads after `cursor`."""
+            if cursor is None:
+                return gr.update(), None, choices
+            from db_manager import fetch_thread_history
+            threads = fetch_thread_history(HISTORY_PAGE_SIZE, before=tuple(cursor), search=search or None)
+            choices = list(choices or []) + _history_choices(threads)
+            return gr.update(choices=choices), _next_cursor(threads), choices
+
+        def start_new_chat():
+            """Reset the chat window and generate a new thread ID."""
+            return [], str(uuid.uuid4()), None
+
+        def switch_thread(selected_thread):
+            """Switch the active thread ID. Future requests map to this session."""
+            if not selected_thread:
+                return gr.update()
+            return selected_thread
+
+        # Graph runs stream whole states ("values"), chat-model tokens ("messages")
+        # and report_writer_skill tokens ("custom"), including from the agent subgraph.
+        STREAM_MODES = ["values", "messages", "custom"]
+
+        def _apply_stream_event(mode, data, chat_history, live):
+            """
+            Reflect one streamed item in the chat window. `live` buffers the token
+            chunks of the message currently being streamed, keyed by its source.
+            Returns the finished assistant text if the event carried some, else None.
+            """
+            def _append(source, token):
+                if live.get("source") != source:
+                    live.update(source=source, parts=[])
+                live["parts"].append(token)
+                chat_history[-1]["content"] = "".join(live["parts"])
+
+            if mode == "custom":
+                if not isinstance(data, dict):
+                    return None
+                if data.get("step"):
+                    # Pipeline mode announces each node as it starts
+                    live.clear()
+                    chat_history[-1]["content"] = f"*(⏳ Running step: `{data['step']}`)*\n\n"
+                elif data.get("report_token"):
+                    _append("report_writer_skill", data["report_token"])
+                return None
+
+            if mode == "messages":
+                chunk, _metadata = data
+                if (chunk.type == "AIMessageChunk" and isinstance(chunk.content, str)
+                        and chunk.content and not chunk.tool_call_chunks):
+                    _append(chunk.id, chunk.content)
+                return None
+
+            if "messages" not in data:
+                return None
+            msg = data["messages"][-1]
+            live.clear()
         
-        # Connect to postgres and stream
-        from db_manager import get_postgres_saver
-        from app import build_workflow
+            # We intercept tool calls to show step logs
+            if hasattr(msg, "tool_calls") and msg.tool_calls:
+                for tc in msg.tool_calls:
+                    tool_name = tc.get("name", "tool")
+                    chat_history[-1]["content"] = f"*(⏳ Using skill: `{tool_name}`)*\n\n"
+                return None
         
-        try:
-            with get_postgres_saver() as checkpointer:
-                graph = build_workflow(checkpointer)
-                
+            # We accumulate AI text content
+            if msg.type == "ai" and msg.content:
+                chat_history[-1]["content"] = msg.content
+                return msg.content
+            return None
+
+        def _report_stream_error(e: Exception, chat_history):
+            error_msg = str(e)
+            if "recursion_limit" in error_msg.lower():
+                gr.Warning("Workflow exceeded maximum steps. Terminated early.")
+                chat_history[-1]["content"] = "⚠️ The agent took too long and the workflow was stopped to prevent an infinite loop."
+            else:
+                gr.Warning("An unexpected error occurred.")
+                chat_history[-1]["content"] = f"❌ Error: {error_msg}"
+
+        def chat_with_agents_with_thread(message: str, chat_history, thread_id: str, workflow: str = None):
+            if not message:
+                return chat_history or []
+            if chat_history is None:
+                chat_history = []
+
+            chat_history.append({"role": "user", "content": message})
+            yield chat_history
+        
+            # The runtime owns one pool, checkpointer and compiled graph per process
+            from runtime import get_runtime
+        
+            tid = None
+            try:
+                graph = get_runtime().get_graph(workflow)
+            
                 tid = thread_id or str(uuid.uuid4())
+                get_runtime().record_thread(tid, message, "running")
                 # Enforce loop limits (recursion_limit) to avoid infinite cycles
                 config = {"configurable": {"thread_id": tid}, "recursion_limit": 25}
                 initial_input = {"messages": [("user", message)]}
-                
+            
                 # Create a placeholder in the chat history for the agent's response
                 chat_history.append({"role": "assistant", "content": "⏳ Thinking..."})
                 yield chat_history
-                
+            
                 final_text = ""
-                # Stream both tool calls and agent messages
-                for event in graph.stream(initial_input, config, stream_mode="values"):
-                    if "messages" in event:
-                        msg = event["messages"][-1]
-                        
-                        # We intercept tool calls to show step logs
-                        if hasattr(msg, "tool_calls") and msg.tool_calls:
-                            for tc in msg.tool_calls:
-                                tool_name = tc.get("name", "tool")
-                                status_msg = f"*(⏳ Using skill: `{tool_name}`)*\n\n"
-                                chat_history[-1]["content"] = status_msg
-                                yield chat_history
+                live = {}
+                # Stream tool calls, agent messages and report tokens as they arrive
+                for _namespace, mode, data in graph.stream(initial_input, config, stream_mode=STREAM_MODES, subgraphs=True):
+                    final_text = _apply_stream_event(mode, data, chat_history, live) or final_text
+                    yield chat_history
                         
-                        # We accumulate AI text content
-                        elif msg.type == "ai" and msg.content:
-                            final_text = msg.content
-                            chat_history[-1]["content"] = final_text
-                            yield chat_history
-                            
                 # Final polish when done streaming
                 if not final_text:
                     chat_history[-1]["content"] = "✅ Process finished."
+                get_runtime().record_thread(tid, status="done")
                 yield chat_history
-                
-        except Exception as e:
-            error_msg = str(e)
-            if "recursion_limit" in error_msg.lower():
-                gr.Warning("Workflow exceeded maximum steps. Terminated early.")
-                chat_history[-1]["content"] = "⚠️ The agent took too long and the workflow was stopped to prevent an infinite loop."
-            else:
+            
+            except Exception as e:
+                if tid:
+                    get_runtime().record_thread(tid, status="failed")
+                _report_stream_error(e, chat_history)
+                yield chat_history
+
+        async def chat_with_agents_with_thread_async(message: str, chat_history, thread_id: str, workflow: str = None):
+            """
+            Async twin of `chat_with_agents_with_thread`: runs `graph.astream` on
+            Gradio's event loop, so concurrent reports don't each hold a worker thread.
+            """
+            if not message:
+                yield chat_history or []
+                return
+            if chat_history is None:
+                chat_history = []
+
+            chat_history.append({"role": "user", "content": message})
+            yield chat_history
+
+            from runtime import get_async_runtime
+
+            runtime = get_async_runtime()
+            tid = None
+            try:
+                graph = await runtime.get_graph(workflow)
+
+                tid = thread_id or str(uuid.uuid4())
+                await runtime.record_thread(tid, message, "running")
+                config = {"configurable": {"thread_id": tid}, "recursion_limit": 25}
+                initial_input = {"messages": [("user", message)]}
+
+                chat_history.append({"role": "assistant", "content": "⏳ Thinking..."})
+                yield chat_history
+
+                final_text = ""
+                live = {}
+                async for _namespace, mode, data in graph.astream(initial_input, config, stream_mode=STREAM_MODES, subgraphs=True):
+                    final_text = _apply_stream_event(mode, data, chat_history, live) or final_text
+                    yield chat_history
+
+                if not final_text:
+                    chat_history[-1]["content"] = "✅ Process finished."
+                await runtime.record_thread(tid, status="done")
+                yield chat_history
+
+            except Exception as e:
+                if tid:
+                    await runtime.record_thread(tid, status="failed")
+                _report_stream_error(e, chat_history)
+                yield chat_history
+
+        def _apply_job_event(event, chat_history, live):
+            """Reflect one progress event from jobs.py in the chat window (see `_apply_stream_event`)."""
+            kind, data = event.kind, event.data
+            if kind == "token":
+                if live.get("source") != data["source"]:
+                    live.update(source=data["source"], parts=[])
+                live["parts"].append(data["text"])
+                chat_history[-1]["content"] = "".join(live["parts"])
+                return
+            live.clear()
+            if kind == "queued":
+                chat_history[-1]["content"] = "⏳ Queued, waiting for a worker..."
+            elif kind == "started":
+                chat_history[-1]["content"] = "⏳ Resuming from the last checkpoint..." if data.get("resumed") else "⏳ Thinking..."
+            elif kind == "step":
+                chat_history[-1]["content"] = f"*(⏳ Running step: `{data['step']}`)*\n\n"
+            elif kind == "tool":
+                chat_history[-1]["content"] = f"*(⏳ Using skill: `{data['name']}`)*\n\n"
+            elif kind == "message":
+                chat_history[-1]["content"] = data["text"]
+            elif kind == "done":
+                chat_history[-1]["content"] = data.get("report") or "✅ Process finished."
+            elif kind == "error":
                 gr.Warning("An unexpected error occurred.")
-                chat_history[-1]["content"] = f"❌ Error: {error_msg}"
+                chat_history[-1]["content"] = f"❌ Error: {data.get('error')}"
+
+        def _follow_job(job_id, chat_history):
+            from jobs import get_queue
+            live = {}
+            for event in get_queue().subscribe(job_id):
+                _apply_job_event(event, chat_history, live)
+                yield chat_history
+
+        def chat_via_job_queue(message: str, chat_history, thread_id: str, workflow: str = None):
+            """Enqueue the report for the worker pool, then follow its progress events."""
+            if not message:
+                yield chat_history or []
+                return
+            if chat_history is None:
+                chat_history = []
+            from jobs import get_queue
+
+            chat_history.append({"role": "user", "content": message})
+            chat_history.append({"role": "assistant", "content": "⏳ Queued, waiting for a worker..."})
             yield chat_history
+            from runtime import get_runtime
+            tid = thread_id or str(uuid.uuid4())
+            get_runtime().record_thread(tid, message, "queued")
+            job = get_queue().enqueue(message, thread_id=tid, mode=workflow)
+            yield from _follow_job(job.id, chat_history)
 
-    def export_to_pdf(chat_history):
-        """Converts the last AI message from the chat history into a downloadable PDF."""
-        if not chat_history:
-            return gr.update(visible=False)
+        def attach_to_job(thread_id):
+            """
+            Reconnect to the thread's job after a refresh or thread switch: replay
+            its events so far, then keep following it while it runs.
+            """
+            from jobs import get_queue, TERMINAL_STATUSES
+            job = get_queue().latest_job(thread_id) if thread_id else None
+            if job is None or job.status in TERMINAL_STATUSES:
+                yield gr.update()
+                return
+            chat_history = [{"role": "user", "content": job.topic}, {"role": "assistant", "content": "⏳ Reconnecting..."}]
+            yield chat_history
+            yield from _follow_job(job.id, chat_history)
+
+        async def export_report(chat_history, thread_id, fmt):
+            """
+            Exports the last AI message from the chat history. Rendering runs in
+            the export service's process pool and finished files are cached by
+            content, so exporting the same report again is immediate.
+            """
+            if not chat_history:
+                return gr.update(visible=False)
             
-        # Find the last message from the 'Agents'
-        last_agent_msg = ""
-        for msg in reversed(chat_history):
-            role = msg.get("role", "")
-            text = msg.get("content", "")
-            if role == "assistant" and not text.startswith("*(⏳"):
-                last_agent_msg = text
-                break
+            # Find the last message from the 'Agents'
+            last_agent_msg = ""
+            for msg in reversed(chat_history):
+                role = msg.get("role", "")
+                text = msg.get("content", "")
+                if role == "assistant" and not text.startswith("*(⏳"):
+                    last_agent_msg = text
+                    break
                 
-        if not last_agent_msg:
-            return gr.update(visible=False)
+            if not last_agent_msg:
+                return gr.update(visible=False)
             
-        # Convert Markdown to PDF
-        pdf = MarkdownPdf()
-        pdf.add_section(Section(last_agent_msg))
-        
-        output_path = "exported_report.pdf"
-        pdf.save(output_path)
-        
-        return gr.update(value=output_path, visible=True)
+            from export_service import get_export_service
+            output_path = await get_export_service().aexport(last_agent_msg, fmt or "pdf", session_id=thread_id or "default")
+            return gr.update(value=output_path, visible=True)
 
-    # --- Events ---
-    demo.load(load_history, inputs=[], outputs=[history_list])
-    refresh_btn.click(load_history, inputs=[], outputs=[history_list])
+        # --- Events ---
+        history_outputs = [history_list, history_cursor, history_choices]
+        demo.load(load_history, inputs=[history_search], outputs=history_outputs)
+        refresh_btn.click(load_history, inputs=[history_search], outputs=history_outputs)
+        history_search.submit(load_history, inputs=[history_search], outputs=history_outputs)
+        older_btn.click(load_older_history, inputs=[history_search, history_cursor, history_choices],
+                        outputs=history_outputs)
     
-    new_chat_btn.click(start_new_chat, inputs=[], outputs=[chatbot, current_thread, history_list])
-    history_list.change(switch_thread, inputs=[history_list], outputs=[current_thread])
+        new_chat_btn.click(start_new_chat, inputs=[], outputs=[chatbot, current_thread, history_list])
+        thread_switch = history_list.change(switch_thread, inputs=[history_list], outputs=[current_thread])
     
-    txt.submit(chat_with_agents_with_thread, inputs=[txt, chatbot, current_thread], outputs=[chatbot])
-    send_btn.click(chat_with_agents_with_thread, inputs=[txt, chatbot, current_thread], outputs=[chatbot])
-    export_btn.click(export_to_pdf, inputs=[chatbot], outputs=[download_file])
+        if JOB_QUEUE:
+            chat_handler = chat_via_job_queue
+            thread_switch.then(attach_to_job, inputs=[current_thread], outputs=[chatbot])
+        else:
+            chat_handler = chat_with_agents_with_thread_async if ASYNC_WORKFLOW else chat_with_agents_with_thread
+        txt.submit(chat_handler, inputs=[txt, chatbot, current_thread, workflow_mode], outputs=[chatbot])
+        send_btn.click(chat_handler, inputs=[txt, chatbot, current_thread, workflow_mode], outputs=[chatbot])
+        export_btn.click(export_report, inputs=[chatbot, current_thread, export_format], outputs=[download_file])
+
+    return demo
+
+
+def __getattr__(name: str):
+    # `chat_interface.demo` still works as an attribute, e.g. for `gradio chat_interface.py` (PEP 562)
+    if name == "demo":
+        demo = globals()["demo"] = build_demo()
+        return demo
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == "__main__":
-    demo.launch(server_name="127.0.0.1", server_port=7861, share=False, theme=theme, css=css)
+    if JOB_QUEUE:
+        print("JOB_QUEUE=1: reports run in worker processes; start them with `python jobs.py worker`.")
+    elif not ASYNC_WORKFLOW:
+        from runtime import get_runtime
+        # Connect, run checkpointer setup and compile the graph once, before serving
+        # (the async runtime starts on the first request, inside Gradio's event loop)
+        get_runtime().start()
+    build_demo().launch(server_name="127.0.0.1", server_port=7861, share=False, theme=build_theme(), css=css)
@@ -0,0 +1,219 @@
+# circuit_breaker.py
+"""
+Per-provider circuit breakers.
+
+A breaker watches the outcomes of calls to one provider over a sliding time
+window. While CLOSED every call goes through. Once enough calls have been
+seen and the failure rate crosses the threshold it OPENS. Calls are then
+refused at once with CircuitOpenError, so callers fail over without paying
+for retries and backoff. After `open_seconds` the breaker goes HALF_OPEN and
+lets a limited number of probe calls through. A successful probe closes it
+again, and a failed probe re-opens it for another cool-down.
+
+Only provider-side failures count: connection errors, timeouts, 429s and
+5xx responses. Other 4xx errors are the caller's fault and leave the
+breaker alone.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+BREAKER_WINDOW = float(os.getenv("BREAKER_WINDOW", "60"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "5"))
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+BREAKER_HALF_OPEN_PROBES = 1
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose circuit is open."""
+
+
+def is_provider_failure(error: BaseException) -> bool:
+    """True unless `error` is a non-429 4xx response, i.e. a problem with the request itself."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return not (isinstance(status, int) and 400 <= status < 500 and status != 429)
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, window: float = BREAKER_WINDOW, min_calls: int = BREAKER_MIN_CALLS,
+                 failure_rate: float = BREAKER_FAILURE_RATE, open_seconds: float = BREAKER_OPEN_SECONDS,
+                 half_open_probes: int = BREAKER_HALF_OPEN_PROBES):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    def _trim(self, now: float) -> None:
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            self._outcomes.popleft()
+
+    def _transition(self, state: str, now: float) -> None:
+        if state == self._state:
+            return
+        self._state = state
+        if state == OPEN:
+            self._opened_at = now
+            self._stats["opened"] += 1
+            logger.warning(f"⚠️ Circuit for {self.name} opened; refusing calls for {self.open_seconds:.0f}s.")
+        elif state == CLOSED:
+            self._outcomes.clear()
+            logger.info(f"Circuit for {self.name} closed.")
+        self._probes = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go out now. In HALF_OPEN only `half_open_probes` calls are let through."""
+        now = time.monotonic()
+        with self._lock:
+            if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+                self._transition(HALF_OPEN, now)
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return True
+            self._stats["rejected"] += 1
+            return False
+
+    def record_success(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._stats["calls"] += 1
+            if self._state == HALF_OPEN:
+                self._transition(CLOSED, now)
+                return
+            self._outcomes.append((now, True))
+            self._trim(now)
+
+    def record_failure(self, error: BaseException = None) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._stats["calls"] += 1
+            if error is not None and not is_provider_failure(error):
+                if self._state == HALF_OPEN:
+                    self._probes = max(0, self._probes - 1)
+                return
+            self._stats["failures"] += 1
+            if self._state == HALF_OPEN:
+                self._transition(OPEN, now)
+                return
+            self._outcomes.append((now, False))
+            self._trim(now)
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                self._transition(OPEN, now)
+
+    def release(self) -> None:
+        """
+        Give up a call let through by `allow()` without an outcome, e.g. when it
+        was cancelled because a hedge won, so a HALF_OPEN probe slot is freed.
+        """
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+
+    def _reject(self) -> CircuitOpenError:
+        return CircuitOpenError(f"circuit for {self.name} is open")
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        """
+        Run `fn` under the breaker. Raises CircuitOpenError without calling it
+        while open, and also when this very failure trips the breaker, so that
+        retry loops stop instead of backing off against a dead provider.
+        """
+        if not self.allow():
+            raise self._reject()
+        try:
+            result = fn()
+        except Exception as e:
+            self.record_failure(e)
+            if self.state == OPEN:
+                raise self._reject() from e
+            raise
+        except BaseException:
+            # Cancelled or interrupted: says nothing about the provider
+            self.release()
+            raise
+        self.record_success()
+        return result
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.allow():
+            raise self._reject()
+        try:
+            result = await fn()
+        except Exception as e:
+            self.record_failure(e)
+            if self.state == OPEN:
+                raise self._reject() from e
+            raise
+        except BaseException:
+            # Cancelled or interrupted: says nothing about the provider
+            self.release()
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self) -> dict:
+        state = self.state
+        with self._lock:
+            self._trim(time.monotonic())
+            recent = len(self._outcomes)
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            stats = dict(self._stats)
+            retry_in = max(0.0, self._opened_at + self.open_seconds - time.monotonic()) if state == OPEN else 0.0
+        stats.update(state=state, recent_calls=recent,
+                     recent_failure_rate=round(failures / recent, 3) if recent else 0.0,
+                     retry_in=round(retry_in, 2))
+        return stats
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    """The process-wide breaker for `provider`, shared by sync and async callers."""
+    breaker = _breakers.get(provider)
+    if breaker is not None:
+        return breaker
+    with _registry_lock:
+        if provider not in _breakers:
+            _breakers[provider] = CircuitBreaker(provider)
+        return _breakers[provider]
+
+
+def stats() -> dict:
+    """State, recent failure rate and counters for every breaker, for monitoring."""
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.snapshot() for b in breakers}
+
+
+def reset() -> None:
+    with _registry_lock:
+        _breakers.clear()
@@ -0,0 +1,251 @@
+# clients.py
+"""
+Process-wide registry of provider SDK clients.
+
+Each provider (Groq, Gemini, Tavily) gets one client per process, created
+on first use and shared by every thread. Async clients are kept per event
+loop instead: an httpx.AsyncClient's keep-alive connections belong to the
+loop that opened them and fail on any other ("Event loop is closed" after a
+second `asyncio.run`), so each running loop gets its own, dropped with the
+loop. All of them sit on connection pools with keep-alive sized for
+our fan-out, and on HTTP/2 when the `h2` package is installed, so parallel
+searches and section writers reuse warm TLS connections instead of
+handshaking on every call.
+
+Connection reuse is measured per provider: every request is counted, and an
+httpcore trace hook counts new TCP connections and TLS handshakes.
+`stats()` reports both.
+"""
+import asyncio
+import inspect
+import logging
+import os
+import threading
+import weakref
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+try:
+    import h2  # noqa: F401  (enables httpx HTTP/2)
+    _H2_AVAILABLE = True
+except ImportError:
+    _H2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "32"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "90"))
+HTTP2_ENABLED = os.getenv("HTTP2", "1") == "1" and _H2_AVAILABLE
+
+_clients: Dict[str, Any] = {}
+_loop_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Any]]" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+_stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"requests": 0, "new_connections": 0, "tls_handshakes": 0})
+_stats_lock = threading.Lock()
+
+
+def _count(provider: str, field: str) -> None:
+    with _stats_lock:
+        _stats[provider][field] += 1
+
+
+def _on_trace_event(provider: str, event: str) -> None:
+    if event == "connection.connect_tcp.complete":
+        _count(provider, "new_connections")
+    elif event == "connection.start_tls.complete":
+        _count(provider, "tls_handshakes")
+
+
+def _request_hook(provider: str) -> Callable:
+    def trace(event: str, info: dict) -> None:
+        _on_trace_event(provider, event)
+
+    def hook(request: httpx.Request) -> None:
+        _count(provider, "requests")
+        request.extensions["trace"] = trace
+    return hook
+
+
+def _async_request_hook(provider: str) -> Callable:
+    async def trace(event: str, info: dict) -> None:
+        _on_trace_event(provider, event)
+
+    async def hook(request: httpx.Request) -> None:
+        _count(provider, "requests")
+        request.extensions["trace"] = trace
+    return hook
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY)
+
+
+def _pool_kwargs(provider: str, request_hook: Callable, response_hooks: Optional[List[Callable]]) -> dict:
+    return {
+        "limits": _limits(),
+        "http2": HTTP2_ENABLED,
+        "event_hooks": {"request": [request_hook], "response": list(response_hooks or [])},
+    }
+
+
+def httpx_client(provider: str, response_hooks: Optional[List[Callable]] = None,
+                 client_class=httpx.Client, **kwargs) -> httpx.Client:
+    """A pooled, instrumented httpx.Client; `client_class` lets SDKs pass their own subclass."""
+    return client_class(**_pool_kwargs(provider, _request_hook(provider), response_hooks), **kwargs)
+
+
+def async_httpx_client(provider: str, response_hooks: Optional[List[Callable]] = None,
+                       client_class=httpx.AsyncClient, **kwargs) -> httpx.AsyncClient:
+    return client_class(**_pool_kwargs(provider, _async_request_hook(provider), response_hooks), **kwargs)
+
+
+def _get(name: str, factory: Callable[[], Any]) -> Any:
+    client = _clients.get(name)
+    if client is not None:
+        return client
+    with _lock:
+        if name not in _clients:
+            _clients[name] = factory()
+        return _clients[name]
+
+
+def _get_async(name: str, factory: Callable[[], Any]) -> Any:
+    """`name`'s client for the running event loop (process-wide when called outside one)."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return _get(name, factory)
+    with _lock:
+        per_loop = _loop_clients.get(loop)
+        if per_loop is None:
+            per_loop = _loop_clients[loop] = {}
+        if name not in per_loop:
+            per_loop[name] = factory()
+        return per_loop[name]
+
+
+def _require_env(var: str) -> str:
+    value = os.getenv(var)
+    if not value:
+        raise EnvironmentError(f"{var} is not set. Add it to .env or export it in your shell.")
+    return value
+
+
+def get_groq():
+    """The shared Groq client; its responses also feed the rate limiter."""
+    from groq import Groq, DefaultHttpxClient
+    import rate_limiter
+
+    api_key = _require_env("GROQ_API_KEY")
+    return _get("groq", lambda: Groq(api_key=api_key, http_client=httpx_client(
+        "groq", [rate_limiter.response_hook("groq")], client_class=DefaultHttpxClient)))
+
+
+def get_async_groq():
+    from groq import AsyncGroq, DefaultAsyncHttpxClient
+    import rate_limiter
+
+    api_key = _require_env("GROQ_API_KEY")
+    return _get_async("groq_async", lambda: AsyncGroq(api_key=api_key, http_client=async_httpx_client(
+        "groq", [rate_limiter.async_response_hook("groq")], client_class=DefaultAsyncHttpxClient)))
+
+
+def get_gemini():
+    """The shared google-genai client; `client.aio` runs on its own pooled async transport."""
+    from google import genai
+    from google.genai import types
+
+    api_key = _require_env("GEMINI_API_KEY")
+    return _get("gemini", lambda: genai.Client(api_key=api_key, http_options=types.HttpOptions(
+        httpx_client=httpx_client("gemini"), httpx_async_client=async_httpx_client("gemini"))))
+
+
+def get_async_gemini():
+    """A google-genai client for the running event loop; use its `aio` interface."""
+    from google import genai
+    from google.genai import types
+
+    api_key = _require_env("GEMINI_API_KEY")
+    return _get_async("gemini_async", lambda: genai.Client(api_key=api_key, http_options=types.HttpOptions(
+        httpx_async_client=async_httpx_client("gemini"))))
+
+
+def get_tavily():
+    """
+    The shared TavilyClient. The SDK is built on `requests`, so it gets a
+    Session whose adapter keeps up to HTTP_MAX_KEEPALIVE connections alive.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from tavily import TavilyClient
+
+    def factory():
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_MAX_KEEPALIVE))
+        return TavilyClient(api_key=os.getenv("TAVILY_API_KEY", ""), session=session)
+    return _get("tavily", factory)
+
+
+def get_async_tavily():
+    from tavily import AsyncTavilyClient
+
+    return _get_async("tavily_async", lambda: AsyncTavilyClient(
+        api_key=os.getenv("TAVILY_API_KEY", ""),
+        client=async_httpx_client("tavily", base_url="https://api.tavily.com")))
+
+
+def _requests_pool_stats(session) -> Dict[str, int]:
+    requests_made = connections = 0
+    for adapter in session.adapters.values():
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                requests_made += pool.num_requests
+                connections += pool.num_connections
+    return {"requests": requests_made, "new_connections": connections}
+
+
+def stats() -> dict:
+    """
+    Per-provider request and connection counts since start-up. `reuse_rate`
+    is the share of requests that went out on an already-open connection.
+    """
+    with _stats_lock:
+        merged = {provider: dict(counts) for provider, counts in _stats.items()}
+    tavily = _clients.get("tavily")
+    session = getattr(tavily, "session", None)
+    if session is not None:
+        counts = merged.setdefault("tavily", {"requests": 0, "new_connections": 0, "tls_handshakes": 0})
+        for field, value in _requests_pool_stats(session).items():
+            counts[field] += value
+    for counts in merged.values():
+        reused = max(0, counts["requests"] - counts["new_connections"])
+        counts["reused"] = reused
+        counts["reuse_rate"] = round(reused / counts["requests"], 3) if counts["requests"] else 0.0
+    return merged
+
+
+def reset_stats() -> None:
+    with _stats_lock:
+        _stats.clear()
+
+
+def close_all() -> None:
+    """Close every pooled client (e.g. at shutdown); the next `get_*` call recreates it."""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        try:
+            close = getattr(client, "close", None) or getattr(getattr(client, "session", None), "close", None)
+            # Async clients are closed with their event loop
+            if close is not None and not inspect.iscoroutinefunction(close):
+                close()
+        except Exception as e:
+            logger.debug(f"Error closing client: {e}")
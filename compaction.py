@@ -0,0 +1,348 @@
+# compaction.py
+"""
+Checkpoint compaction and retention.
+
+Every super-step writes a full checkpoint, so a long ReAct thread leaves
+dozens of copies of the same messages, search dumps and drafts behind. Only
+the most recent checkpoints are needed to resume or inspect a thread. This
+job trims the checkpoint tables of the Postgres and SQLite checkpointers:
+
+  * threads idle for more than CHECKPOINT_RETENTION_DAYS are deleted outright;
+  * finished threads (status "done" in the threads index) keep only their
+    final checkpoint;
+  * other threads keep their CHECKPOINT_KEEP_LAST newest checkpoints;
+  * pending writes and (Postgres) channel blobs that no remaining checkpoint
+    refers to are deleted with them.
+
+The work is incremental: threads are visited in keyset pages of thread_id and
+each thread is compacted in its own short transaction, so writers are never
+blocked for long. Threads that were checkpointed in the last
+COMPACTION_MIN_IDLE_SECONDS are skipped, so a running report is never touched.
+
+    python compaction.py                               # DATABASE_URL (Postgres)
+    python compaction.py sqlite:///memory.db --vacuum  # a SqliteSaver file
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", "10"))
+# 0 keeps threads forever
+CHECKPOINT_RETENTION_DAYS = float(os.getenv("CHECKPOINT_RETENTION_DAYS", "30"))
+COMPACTION_MIN_IDLE_SECONDS = float(os.getenv("COMPACTION_MIN_IDLE_SECONDS", "300"))
+COMPACTION_PAGE_SIZE = 200
+# Unreferenced checkpoint payloads are only removed once they have been unused this long
+PAYLOAD_SWEEP_GRACE_SECONDS = 3600.0
+
+# uuid6 checkpoint ids count 100ns ticks from the Gregorian epoch (1582-10-15)
+_UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+
+class Dialect(NamedTuple):
+    name: str
+    param: str
+    writes_table: str
+    # Stored size of one deleted row, summed into bytes_reclaimed
+    checkpoint_size: str
+    write_size: str
+    # Postgres keeps non-primitive channel values in checkpoint_blobs, keyed by channel version
+    has_blobs: bool
+    threads_exists: str
+    # Serialized rows of a thread that may reference payload_store payloads
+    payload_rows: str
+
+
+POSTGRES = Dialect(
+    "postgres", "%s", "checkpoint_writes",
+    "coalesce(pg_column_size(checkpoint), 0) + coalesce(pg_column_size(metadata), 0)",
+    "coalesce(pg_column_size(blob), 0)",
+    True, "SELECT to_regclass('threads')",
+    "SELECT blob FROM checkpoint_blobs WHERE thread_id = {p} "
+    "UNION ALL SELECT blob FROM checkpoint_writes WHERE thread_id = {p}",
+)
+SQLITE = Dialect(
+    "sqlite", "?", "writes",
+    "coalesce(length(checkpoint), 0) + coalesce(length(metadata), 0)",
+    "coalesce(length(value), 0)",
+    False, "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'threads'",
+    "SELECT checkpoint FROM checkpoints WHERE thread_id = {p} "
+    "UNION ALL SELECT value FROM writes WHERE thread_id = {p}",
+)
+
+
+def checkpoint_time(checkpoint_id: str) -> Optional[float]:
+    """Unix time a checkpoint was written, read from its time-ordered (uuid6) id."""
+    try:
+        value = uuid.UUID(checkpoint_id)
+    except (TypeError, ValueError):
+        return None
+    if value.version != 6:
+        return None
+    ticks = (value.time_low << 28) | (value.time_mid << 12) | (value.time_hi_version & 0x0FFF)
+    return (ticks - _UUID_EPOCH_OFFSET) / 1e7
+
+
+class CheckpointCompactor:
+    """
+    Applies the retention policy to one checkpointer database through `conn`
+    (a psycopg connection in autocommit mode, or a sqlite3 connection opened
+    with `isolation_level=None`).
+
+    `keep_last=0` disables count-based pruning and `retention_days=0`
+    disables age-based deletion. With a `payloads` store, a full pass also
+    deletes the stored payloads that no remaining checkpoint refers to.
+    """
+
+    def __init__(self, conn, dialect: Dialect, keep_last: int = CHECKPOINT_KEEP_LAST,
+                 retention_days: float = CHECKPOINT_RETENTION_DAYS,
+                 min_idle_seconds: float = COMPACTION_MIN_IDLE_SECONDS,
+                 page_size: int = COMPACTION_PAGE_SIZE, pause: float = 0.0, payloads=None):
+        self.conn = conn
+        self.dialect = dialect
+        self.keep_last = keep_last
+        self.retention_days = retention_days
+        self.min_idle_seconds = min_idle_seconds
+        self.page_size = page_size
+        # Seconds to sleep between threads, to leave the database to live traffic
+        self.pause = pause
+        self.payloads = payloads
+
+    def _sql(self, sql: str) -> str:
+        return sql.replace("{p}", self.dialect.param)
+
+    def _rows(self, sql: str, params: tuple = ()) -> List[tuple]:
+        return self.conn.execute(self._sql(sql), params).fetchall()
+
+    def _deleted_bytes(self, sql: str, params: tuple) -> Tuple[int, int]:
+        """Run a DELETE ... RETURNING <size>; (rows deleted, bytes they held)."""
+        sizes = self._rows(sql, params)
+        return len(sizes), sum(size or 0 for size, in sizes)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        if self.dialect.name == "postgres":
+            with self.conn.transaction():
+                yield
+            return
+        # IMMEDIATE takes the write lock up front, so the transaction cannot fail half-way on a busy file
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def threads(self) -> Iterator[Tuple[str, str]]:
+        """(thread_id, newest checkpoint_id) for every checkpointed thread, in pages."""
+        after = ""
+        while True:
+            page = self._rows(
+                "SELECT thread_id, MAX(checkpoint_id) FROM checkpoints WHERE thread_id > {p} "
+                "GROUP BY thread_id ORDER BY thread_id LIMIT {p}", (after, self.page_size))
+            yield from page
+            if len(page) < self.page_size:
+                return
+            after = page[-1][0]
+
+    def _finished(self, thread_id: str, has_threads: bool) -> bool:
+        if not has_threads:
+            return False
+        row = self._rows("SELECT status FROM threads WHERE thread_id = {p}", (thread_id,))
+        return bool(row) and row[0][0] == "done"
+
+    def _prune_checkpoints(self, thread_id: str, keep: int) -> Tuple[int, int]:
+        """Delete all but the `keep` newest checkpoints of each namespace in the thread."""
+        ids: Dict[str, List[str]] = defaultdict(list)
+        for ns, checkpoint_id in self._rows(
+                "SELECT checkpoint_ns, checkpoint_id FROM checkpoints WHERE thread_id = {p} "
+                "ORDER BY checkpoint_ns, checkpoint_id DESC", (thread_id,)):
+            ids[ns].append(checkpoint_id)
+        count = size = 0
+        for ns, newest_first in ids.items():
+            if len(newest_first) <= keep:
+                continue
+            # Checkpoint ids are time-ordered, so everything older than the keep-th newest goes
+            n, b = self._deleted_bytes(
+                "DELETE FROM checkpoints WHERE thread_id = {p} AND checkpoint_ns = {p} "
+                f"AND checkpoint_id < {{p}} RETURNING {self.dialect.checkpoint_size}",
+                (thread_id, ns, newest_first[keep - 1]))
+            count, size = count + n, size + b
+        return count, size
+
+    def compact_thread(self, thread_id: str, expired: bool, finished: bool,
+                       has_threads: bool = False) -> Dict[str, int]:
+        """Compact one thread in a single transaction; counts of deleted rows and bytes."""
+        d = self.dialect
+        result = {"checkpoints": 0, "writes": 0, "blobs": 0, "bytes_reclaimed": 0}
+        with self._transaction():
+            if expired:
+                n, b = self._deleted_bytes(
+                    f"DELETE FROM checkpoints WHERE thread_id = {{p}} RETURNING {d.checkpoint_size}", (thread_id,))
+            else:
+                keep = 1 if finished else self.keep_last
+                n, b = self._prune_checkpoints(thread_id, keep) if keep > 0 else (0, 0)
+            result["checkpoints"], result["bytes_reclaimed"] = n, b
+
+            n, b = self._deleted_bytes(
+                f"DELETE FROM {d.writes_table} WHERE thread_id = {{p}} AND NOT EXISTS ("
+                "SELECT 1 FROM checkpoints c WHERE c.thread_id = "
+                f"{d.writes_table}.thread_id AND c.checkpoint_ns = {d.writes_table}.checkpoint_ns "
+                f"AND c.checkpoint_id = {d.writes_table}.checkpoint_id) RETURNING {d.write_size}", (thread_id,))
+            result["writes"], result["bytes_reclaimed"] = n, result["bytes_reclaimed"] + b
+
+            if d.has_blobs:
+                # A blob is live while some remaining checkpoint still points at its channel version
+                n, b = self._deleted_bytes(
+                    "DELETE FROM checkpoint_blobs WHERE thread_id = {p} AND NOT EXISTS ("
+                    "SELECT 1 FROM checkpoints c WHERE c.thread_id = checkpoint_blobs.thread_id "
+                    "AND c.checkpoint_ns = checkpoint_blobs.checkpoint_ns "
+                    "AND c.checkpoint -> 'channel_versions' ->> checkpoint_blobs.channel = checkpoint_blobs.version) "
+                    "RETURNING coalesce(pg_column_size(blob), 0)", (thread_id,))
+                result["blobs"], result["bytes_reclaimed"] = n, result["bytes_reclaimed"] + b
+
+            if expired and has_threads:
+                self._rows("DELETE FROM threads WHERE thread_id = {p} RETURNING thread_id", (thread_id,))
+        return result
+
+    def _payload_refs(self, thread_id: str) -> Set[str]:
+        from payload_store import references
+
+        digests: Set[str] = set()
+        for blob, in self._rows(self.dialect.payload_rows, (thread_id, thread_id)):
+            digests |= references(bytes(blob or b""))
+        return digests
+
+    def run(self, limit: Optional[int] = None, now: Optional[float] = None) -> Dict[str, float]:
+        """
+        Compact up to `limit` threads (all by default) and return what was
+        reclaimed. A thread that fails is logged and skipped.
+        """
+        started_at = time.time()
+        now = started_at if now is None else now
+        started = time.perf_counter()
+        stats = {"threads": 0, "compacted": 0, "expired": 0, "busy": 0, "errors": 0,
+                 "checkpoints": 0, "writes": 0, "blobs": 0, "payloads": 0, "bytes_reclaimed": 0}
+        row = self._rows(self.dialect.threads_exists)
+        has_threads = bool(row) and row[0][0] is not None
+        referenced: Set[str] = set()
+        # Payloads may only be swept after every thread's references were collected
+        full_pass = self.payloads is not None
+        for thread_id, newest in self.threads():
+            if limit is not None and stats["threads"] >= limit:
+                full_pass = False
+                break
+            stats["threads"] += 1
+            written = checkpoint_time(newest)
+            age = now - written if written is not None else float("inf")
+            expired = self.retention_days > 0 and age > self.retention_days * 86400
+            try:
+                if age < self.min_idle_seconds:
+                    stats["busy"] += 1
+                    deleted = None
+                else:
+                    deleted = self.compact_thread(thread_id, expired, self._finished(thread_id, has_threads),
+                                                  has_threads)
+                if self.payloads is not None:
+                    referenced |= self._payload_refs(thread_id)
+            except Exception as e:
+                logger.warning(f"⚠️ Could not compact thread {thread_id}: {e}")
+                stats["errors"] += 1
+                full_pass = False
+                continue
+            if deleted is None:
+                continue
+            for key, value in deleted.items():
+                stats[key] += value
+            if expired:
+                stats["expired"] += 1
+            elif deleted["checkpoints"] or deleted["writes"] or deleted["blobs"]:
+                stats["compacted"] += 1
+            if self.pause:
+                time.sleep(self.pause)
+        if full_pass:
+            removed, size = self.payloads.sweep(referenced, started_at - PAYLOAD_SWEEP_GRACE_SECONDS)
+            stats["payloads"], stats["bytes_reclaimed"] = removed, stats["bytes_reclaimed"] + size
+        stats["seconds"] = round(time.perf_counter() - started, 3)
+        return stats
+
+
+def _file_bytes(path: str) -> int:
+    return sum(os.path.getsize(p) for p in (path, f"{path}-wal") if os.path.exists(p))
+
+
+def compact_sqlite(path: str, vacuum: bool = False, **policy) -> Dict[str, float]:
+    """
+    Compact a SqliteSaver database file. Deleted pages are reused by later
+    checkpoints. The WAL is always checkpointed and truncated afterwards, and
+    `vacuum=True` also shrinks the file (this holds an exclusive lock while it runs).
+    """
+    limit, now = policy.pop("limit", None), policy.pop("now", None)
+    before = _file_bytes(path)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    try:
+        stats = CheckpointCompactor(conn, SQLITE, **policy).run(limit, now)
+        if vacuum:
+            conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+    stats["file_bytes_before"], stats["file_bytes_after"] = before, _file_bytes(path)
+    return stats
+
+
+def compact_postgres(pool, **policy) -> Dict[str, float]:
+    """Compact the PostgresSaver tables reachable through `pool` (autocommit connections)."""
+    limit, now = policy.pop("limit", None), policy.pop("now", None)
+    with pool.connection() as conn:
+        return CheckpointCompactor(conn, POSTGRES, **policy).run(limit, now)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("database", nargs="?", default=None,
+                        help="Postgres URL or sqlite:///path (default: DATABASE_URL)")
+    parser.add_argument("--keep-last", type=int, default=CHECKPOINT_KEEP_LAST,
+                        help="checkpoints kept per unfinished thread (0 keeps all)")
+    parser.add_argument("--retention-days", type=float, default=CHECKPOINT_RETENTION_DAYS,
+                        help="delete threads idle for longer than this (0 keeps them)")
+    parser.add_argument("--min-idle", type=float, default=COMPACTION_MIN_IDLE_SECONDS,
+                        help="skip threads checkpointed in the last N seconds")
+    parser.add_argument("--limit", type=int, default=None, help="stop after this many threads")
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between threads")
+    parser.add_argument("--vacuum", action="store_true", help="SQLite: VACUUM afterwards to shrink the file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    policy = {"keep_last": args.keep_last, "retention_days": args.retention_days,
+              "min_idle_seconds": args.min_idle, "pause": args.pause, "limit": args.limit}
+    import db_manager
+    import payload_store
+
+    if payload_store.CHECKPOINT_PAYLOADS or os.path.exists(payload_store.CHECKPOINT_PAYLOAD_PATH):
+        policy["payloads"] = payload_store.get_payload_store()
+
+    url = args.database or db_manager.DB_URI
+    path = db_manager.sqlite_path(url)
+    if path is not None:
+        stats = compact_sqlite(path, vacuum=args.vacuum, **policy)
+    else:
+        with db_manager.open_postgres_pool(url) as pool:
+            stats = compact_postgres(pool, **policy)
+    print(json.dumps(stats))
+    print(f"Reclaimed {stats['bytes_reclaimed'] / 1e6:.2f} MB from {stats['checkpoints']} checkpoints, "
+          f"{stats['writes']} writes, {stats['blobs']} blobs and {stats['payloads']} payloads "
+          f"in {stats['threads']} threads.")
+
+
+if __name__ == "__main__":
+    main()
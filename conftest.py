@@ -0,0 +1,31 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def isolated_caches(tmp_path, monkeypatch):
+    """Point the on-disk caches at a per-test directory so runs never share results."""
+    import groq_client
+    import tools
+    monkeypatch.setattr(groq_client, "LLM_CACHE_PATH", str(tmp_path / "llm_cache.db"))
+    monkeypatch.setattr(groq_client, "_cache", None)
+    monkeypatch.setattr(tools, "SEARCH_CACHE_PATH", str(tmp_path / "search_cache.db"))
+    monkeypatch.setattr(tools, "_search_cache", None)
+    yield
+
+
+@pytest.fixture(autouse=True)
+def fresh_provider_state():
+    """Start every test with full rate-limit buckets, closed circuits, no learned provider latencies and no recorded threads."""
+    import circuit_breaker
+    import groq_client
+    import rate_limiter
+    import runtime
+    for module in (rate_limiter, circuit_breaker):
+        module.reset()
+    groq_client._router = None
+    runtime._memory_threads.clear()
+    yield
+    for module in (rate_limiter, circuit_breaker):
+        module.reset()
+    groq_client._router = None
+    runtime._memory_threads.clear()
@@ -0,0 +1,187 @@
+# context_packer.py
+"""
+Context packing for the report writer.
+
+Search results arrive as "content (Source: url)" snippets joined by blank
+lines. Before they reach a writer prompt they are deduplicated (word
+shingles + MinHash), ranked against the plan's sections with BM25, and
+packed into a token budget so that every section gets its best evidence
+and the source URL stays attached to each snippet.
+"""
+import logging
+import math
+import os
+import re
+import zlib
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+try:
+    import tiktoken
+except ImportError:  # Token counts fall back to a ~4 chars/token estimate
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+# Estimated Jaccard similarity above which two snippets count as duplicates
+CONTEXT_DEDUPE_THRESHOLD = float(os.getenv("CONTEXT_DEDUPE_THRESHOLD", "0.8"))
+
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+_MERSENNE_PRIME = (1 << 61) - 1
+_PERMUTATIONS = [
+    (1 + zlib.crc32(f"a{i}".encode()) * 2654435761 % (_MERSENNE_PRIME - 1),
+     zlib.crc32(f"b{i}".encode()) * 40503 % _MERSENNE_PRIME)
+    for i in range(NUM_PERM)
+]
+
+_SOURCE_RE = re.compile(r"\s*\(Source:\s*(?P<url>[^()\s]+)\)\s*$")
+_TOKEN_RE = re.compile(r"\w+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from how in is it of on or the this to was were what when which who why with"
+    .split()
+)
+
+_encoder = None
+
+
+class Snippet(NamedTuple):
+    text: str
+    source: Optional[str]
+
+    def render(self) -> str:
+        return f"{self.text} (Source: {self.source})" if self.source else self.text
+
+
+def count_tokens(text: str) -> int:
+    """Tokens in `text` with tiktoken's cl100k_base when installed, else ~4 chars/token."""
+    global _encoder
+    if tiktoken is not None:
+        if _encoder is None:
+            try:
+                _encoder = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:  # encoding files unavailable offline
+                logger.debug(f"tiktoken unavailable ({e}); estimating token counts.")
+                _encoder = False
+        if _encoder:
+            return len(_encoder.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.casefold()) if t not in _STOPWORDS]
+
+
+def parse_snippets(gathered_content: str) -> List[Snippet]:
+    """Split gathered search content into snippets, peeling off the trailing "(Source: url)"."""
+    snippets = []
+    for chunk in gathered_content.split("\n\n"):
+        chunk = chunk.strip()
+        if not chunk:
+            continue
+        match = _SOURCE_RE.search(chunk)
+        if match:
+            snippets.append(Snippet(chunk[:match.start()].strip(), match.group("url")))
+        else:
+            snippets.append(Snippet(chunk, None))
+    return snippets
+
+
+def format_snippets(snippets: Sequence[Snippet]) -> str:
+    return "\n\n".join(s.render() for s in snippets)
+
+
+def _minhash(text: str) -> List[int]:
+    words = _TOKEN_RE.findall(text.casefold())
+    shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))}
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles]
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def dedupe(snippets: Sequence[Snippet], threshold: float = CONTEXT_DEDUPE_THRESHOLD) -> List[Snippet]:
+    """
+    Drop near-duplicate snippets, keeping the first occurrence. Similarity is
+    the MinHash estimate of Jaccard overlap between 5-word shingle sets.
+    """
+    kept: List[Snippet] = []
+    signatures: List[List[int]] = []
+    for snippet in snippets:
+        signature = _minhash(snippet.text)
+        duplicate = any(
+            sum(x == y for x, y in zip(signature, other)) / NUM_PERM >= threshold
+            for other in signatures
+        )
+        if not duplicate:
+            kept.append(snippet)
+            signatures.append(signature)
+    return kept
+
+
+class BM25:
+    """Okapi BM25 over a small in-memory corpus of token lists."""
+
+    def __init__(self, corpus: Sequence[List[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1, self.b = k1, b
+        self.docs = [Counter(doc) for doc in corpus]
+        self.lengths = [len(doc) for doc in corpus]
+        self.avgdl = (sum(self.lengths) / len(self.lengths)) if corpus else 0.0
+        df = Counter(term for doc in self.docs for term in doc)
+        n = len(corpus)
+        self.idf = {term: math.log(1 + (n - freq + 0.5) / (freq + 0.5)) for term, freq in df.items()}
+
+    def scores(self, query: Sequence[str]) -> List[float]:
+        out = []
+        for doc, length in zip(self.docs, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self.avgdl) if self.avgdl else self.k1
+            out.append(sum(
+                self.idf[t] * doc[t] * (self.k1 + 1) / (doc[t] + norm)
+                for t in set(query) if t in doc
+            ))
+        return out
+
+
+def pack(snippets: Sequence[Snippet], queries: Sequence[str],
+         budget_tokens: int = CONTEXT_TOKEN_BUDGET) -> List[Snippet]:
+    """
+    Choose snippets for the prompt: rank them per query with BM25, then take
+    each query's next-best snippet in turn until the token budget is spent,
+    so no section is starved by another's evidence. The result keeps the
+    snippets' original order.
+    """
+    if not snippets:
+        return []
+    bm25 = BM25([tokenize(s.text) for s in snippets])
+    rankings = []
+    for query in queries or [""]:
+        scores = bm25.scores(tokenize(query))
+        rankings.append(sorted(range(len(snippets)), key=lambda i: (-scores[i], i)))
+
+    chosen: Dict[int, None] = {}
+    used = 0
+    cursors = [0] * len(rankings)
+    while any(c < len(snippets) for c in cursors):
+        for q, ranking in enumerate(rankings):
+            while cursors[q] < len(snippets) and ranking[cursors[q]] in chosen:
+                cursors[q] += 1
+            if cursors[q] >= len(snippets):
+                continue
+            i = ranking[cursors[q]]
+            cursors[q] += 1
+            cost = count_tokens(snippets[i].render())
+            if used + cost > budget_tokens:
+                continue
+            chosen[i] = None
+            used += cost
+    return [snippets[i] for i in sorted(chosen)]
+
+
+def pack_context(gathered_content: str, queries: Sequence[str],
+                 budget_tokens: Optional[int] = None) -> str:
+    """Deduplicate `gathered_content`, rank it against `queries` and fit it into the token budget."""
+    budget = CONTEXT_TOKEN_BUDGET if budget_tokens is None else budget_tokens
+    snippets = parse_snippets(gathered_content)
+    unique = dedupe(snippets)
+    packed = pack(unique, queries, budget)
+    logger.debug(f"Context packed: {len(snippets)} snippets -> {len(unique)} unique -> {len(packed)} within {budget} tokens")
+    return format_snippets(packed)
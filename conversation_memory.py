@@ -0,0 +1,171 @@
+# conversation_memory.py
+"""
+Rolling summary memory for long report threads.
+
+`AgentState.messages` keeps every turn of a thread (search dumps, drafts,
+critiques) and the react agent is sent all of it, so each turn of a long
+thread costs more tokens and time than the one before. `summarize_node`
+runs before the agent. When the thread's history (running summary plus
+messages) is over MEMORY_TOKEN_BUDGET, every turn except the last
+MEMORY_KEEP_TURNS is folded into the `summary` field and removed from the
+state (and so from later checkpoints) with RemoveMessage. If the kept turns
+alone are still over budget they are folded too, oldest first; only the
+current request is always kept. A turn is a user message and everything
+that answers it, so a tool call is never separated from its result. The
+summarizer runs at most once per turn, and only on turns that start over
+budget; with report-sized turns (a search dump plus a draft) that is most
+turns of a long thread, each call reading clipped messages only.
+
+The new summary is written by the LLM from the previous summary and the
+folded turns, capped at MEMORY_SUMMARY_MAX_TOKENS. If the LLM call fails,
+an extractive summary (each request and the opening of its answer) is used
+instead, so the budget holds either way. The agent sees the summary in its
+system prompt (`summary_prompt_section`).
+"""
+import logging
+import os
+from typing import List, Optional, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage, RemoveMessage
+
+from context_packer import count_tokens
+from groq_client import ask_groq, ask_groq_async
+
+logger = logging.getLogger(__name__)
+
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "6000"))
+MEMORY_KEEP_TURNS = int(os.getenv("MEMORY_KEEP_TURNS", "2"))
+MEMORY_SUMMARY_MAX_TOKENS = int(os.getenv("MEMORY_SUMMARY_MAX_TOKENS", "600"))
+# Each folded message is clipped to this many characters in the summarizer prompt
+MEMORY_SUMMARY_INPUT_CHARS = 2000
+
+SUMMARY_PROMPT = """You maintain the running memory of a conversation between a user and a strategy consultant AI that researches and writes reports.
+Update the summary with the new turns below. Keep: the topics and reports requested, key findings and figures with their sources, decisions, the user's stated preferences and any open follow-ups.
+Drop raw search output, formatting and pleasantries. Reply with the updated summary only, at most {max_words} words."""
+
+_ROLES = {"human": "User", "ai": "Assistant", "tool": "Tool", "system": "System"}
+
+
+def split_turns(messages: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+    """Group messages into turns, each starting at a user message."""
+    turns: List[List[BaseMessage]] = []
+    for message in messages:
+        if message.type == "human" or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def message_tokens(message: BaseMessage) -> int:
+    """Tokens the model is sent for `message`: its text plus any tool-call arguments."""
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    tool_calls = getattr(message, "tool_calls", None)
+    return count_tokens(content + (str(tool_calls) if tool_calls else "")) + 4
+
+
+def history_tokens(messages: Sequence[BaseMessage], summary: str = "") -> int:
+    return sum(message_tokens(m) for m in messages) + (count_tokens(summary) if summary else 0)
+
+
+def plan_fold(messages: Sequence[BaseMessage], summary: str = "", budget: int = MEMORY_TOKEN_BUDGET,
+              keep_turns: int = MEMORY_KEEP_TURNS) -> Tuple[List[BaseMessage], List[BaseMessage]]:
+    """
+    (messages to fold into the summary, messages to keep). Nothing is folded
+    while the history fits in `budget`.
+    """
+    turns = split_turns(messages)
+    sizes = [sum(message_tokens(m) for m in turn) for turn in turns]
+    summary_tokens = count_tokens(summary) if summary else 0
+    if summary_tokens + sum(sizes) <= budget or len(turns) < 2:
+        return [], list(messages)
+    # Everything but the current request and the last `keep_turns` turns, then more while over budget
+    cut = max(0, len(turns) - 1 - keep_turns)
+    while cut < len(turns) - 1 and summary_tokens + sum(sizes[cut:]) > budget:
+        cut += 1
+    folded = [m for turn in turns[:cut] for m in turn]
+    return folded, [m for turn in turns[cut:] for m in turn]
+
+
+def render_messages(messages: Sequence[BaseMessage], max_chars: int = MEMORY_SUMMARY_INPUT_CHARS) -> str:
+    lines = []
+    for message in messages:
+        text = message.content if isinstance(message.content, str) else str(message.content)
+        role = _ROLES.get(message.type, message.type)
+        if message.type == "tool":
+            role = f"Tool ({getattr(message, 'name', None) or 'result'})"
+        tool_calls = getattr(message, "tool_calls", None)
+        if tool_calls and not text:
+            text = "calls " + ", ".join(f"{c['name']}({c['args']})" for c in tool_calls)
+        if len(text) > max_chars:
+            text = text[:max_chars] + " …"
+        lines.append(f"{role}: {text.strip()}")
+    return "\n\n".join(lines)
+
+
+def summary_prompt(summary: str, messages: Sequence[BaseMessage],
+                   max_tokens: int = MEMORY_SUMMARY_MAX_TOKENS) -> str:
+    previous = summary or "(empty)"
+    return (f"{SUMMARY_PROMPT.format(max_words=int(max_tokens * 0.75))}\n\n"
+            f"Current summary:\n{previous}\n\nNew turns:\n{render_messages(messages)}")
+
+
+def extractive_summary(summary: str, messages: Sequence[BaseMessage],
+                       max_tokens: int = MEMORY_SUMMARY_MAX_TOKENS) -> str:
+    """Summary without an LLM: each request and the first line of its final answer, newest kept."""
+    lines = [summary] if summary else []
+    for turn in split_turns(messages):
+        request = turn[0].content if turn[0].type == "human" else ""
+        answers = [m.content for m in turn[1:] if m.type == "ai" and isinstance(m.content, str) and m.content]
+        answer = answers[-1].strip().splitlines()[0] if answers else ""
+        lines.append(f"- User asked: {str(request).strip()[:300]}" + (f" → {answer[:300]}" if answer else ""))
+    text = "\n".join(lines)
+    max_chars = max_tokens * 4
+    return text if len(text) <= max_chars else "…" + text[-max_chars:]
+
+
+def _update(folded: List[BaseMessage], summary: str) -> dict:
+    logger.info(f"Folded {len(folded)} messages ({history_tokens(folded)} tokens) into the conversation summary.")
+    return {"summary": summary, "messages": [RemoveMessage(id=m.id) for m in folded]}
+
+
+def _usable(text: Optional[str]) -> bool:
+    return isinstance(text, str) and bool(text.strip()) and not text.startswith("[error")
+
+
+def summarize_node(state: dict) -> dict:
+    """Fold older turns into `summary` when the thread is over MEMORY_TOKEN_BUDGET."""
+    summary = state.get("summary") or ""
+    folded, _ = plan_fold(state["messages"], summary, MEMORY_TOKEN_BUDGET, MEMORY_KEEP_TURNS)
+    if not folded:
+        return {}
+    try:
+        text = ask_groq(summary_prompt(summary, folded), max_tokens=MEMORY_SUMMARY_MAX_TOKENS)
+    except Exception as e:
+        text = f"[error: {e}]"
+    if not _usable(text):
+        logger.warning(f"⚠️ Conversation summary failed ({str(text)[:200]}); using an extractive summary.")
+        text = extractive_summary(summary, folded)
+    return _update(folded, text.strip())
+
+
+async def asummarize_node(state: dict) -> dict:
+    summary = state.get("summary") or ""
+    folded, _ = plan_fold(state["messages"], summary, MEMORY_TOKEN_BUDGET, MEMORY_KEEP_TURNS)
+    if not folded:
+        return {}
+    try:
+        text = await ask_groq_async(summary_prompt(summary, folded), max_tokens=MEMORY_SUMMARY_MAX_TOKENS)
+    except Exception as e:
+        text = f"[error: {e}]"
+    if not _usable(text):
+        logger.warning(f"⚠️ Conversation summary failed ({str(text)[:200]}); using an extractive summary.")
+        text = extractive_summary(summary, folded)
+    return _update(folded, text.strip())
+
+
+def summary_prompt_section(summary: Optional[str]) -> str:
+    """The part of the agent's system prompt that carries the running summary."""
+    if not summary:
+        return ""
+    return ("\n\nSUMMARY OF THE EARLIER CONVERSATION (older turns are no longer shown verbatim):\n"
+            f"{summary}")
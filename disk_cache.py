@@ -0,0 +1,171 @@
+# disk_cache.py
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(*parts: Any) -> str:
+    """Content-addressed cache key: sha256 over a canonical JSON encoding of `parts`."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CacheEntry(NamedTuple):
+    value: str
+    age: float
+    fresh: bool
+    cost: float
+
+
+class DiskCache:
+    """
+    Small SQLite-backed key/value cache shared across threads and processes.
+
+    Entries expire after `ttl` seconds and the table is kept under `max_bytes`
+    by evicting the least recently used rows. Each entry may carry a `cost`
+    (e.g. the seconds it took to produce) so callers can report what the cache
+    saved them. Hit/miss/byte counters are kept per process.
+
+    Expired entries are retained for a further `max_stale` seconds so that
+    `lookup()` callers can fall back to them when the origin is slow or down.
+    """
+
+    def __init__(self, path: str, table: str = "cache",
+                 ttl: Optional[float] = None, max_bytes: Optional[int] = None,
+                 max_stale: float = 0.0):
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_stale = max_stale
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "bytes_served": 0,
+                       "bytes_stored": 0, "cost_saved": 0.0, "evictions": 0}
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "cost REAL NOT NULL DEFAULT 0, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed_idx ON {table}(accessed_at)")
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value, or None on a miss or an expired entry."""
+        entry = self.lookup(key)
+        if entry is None:
+            return None
+        if not entry.fresh:
+            self.record_miss()
+            return None
+        self.record_hit(entry)
+        return entry.value
+
+    def lookup(self, key: str) -> Optional[CacheEntry]:
+        """
+        Return a CacheEntry for `key`, including expired-but-retained entries
+        (with `fresh=False`), or None when nothing usable is stored. Misses
+        are counted here; call record_hit()/record_miss() once the caller has
+        decided whether to serve the entry.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, size, cost, created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            value, size, cost, created_at = row
+            age = now - created_at
+            fresh = self.ttl is None or age <= self.ttl
+            if not fresh and age > self.ttl + self.max_stale:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._conn.commit()
+                self._stats["misses"] += 1
+                return None
+            if fresh:
+                self._conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+            return CacheEntry(value, age, fresh, cost)
+
+    def record_hit(self, entry: CacheEntry) -> None:
+        """Count an entry returned by lookup() as served to the caller."""
+        size = len(entry.value.encode("utf-8"))
+        with self._lock:
+            self._stats["hits" if entry.fresh else "stale_hits"] += 1
+            self._stats["bytes_served"] += size
+            self._stats["cost_saved"] += entry.cost
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self._stats["misses"] += 1
+
+    def set(self, key: str, value: str, cost: float = 0.0) -> None:
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, size, cost, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, value, size, float(cost), now, now),
+            )
+            self._stats["bytes_stored"] += size
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Drop expired rows, then least recently used rows until under max_bytes. Caller holds the lock."""
+        if self.ttl is not None:
+            cutoff = time.time() - self.ttl - self.max_stale
+            cur = self._conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (cutoff,))
+            self._stats["evictions"] += max(cur.rowcount, 0)
+        if self.max_bytes is None:
+            return
+        total = self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+        while total > self.max_bytes:
+            rows = self._conn.execute(
+                f"SELECT key, size FROM {self.table} ORDER BY accessed_at ASC LIMIT 32"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._stats["evictions"] += 1
+                total -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Process-local counters plus the current on-disk footprint."""
+        with self._lock:
+            entries, size = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}"
+            ).fetchone()
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        stats.update(entries=entries, size_bytes=size,
+                     hit_rate=(stats["hits"] / lookups) if lookups else 0.0)
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,227 @@
+# export_service.py
+"""
+Report exports (PDF, HTML, Markdown) for the chat UI.
+
+Rendering used to happen inside the Gradio callback and always wrote the
+same `exported_report.pdf`, so concurrent users overwrote each other's
+downloads and every click rendered the report again. Here:
+
+  * finished files are kept in EXPORT_DIR/artifacts, named by the sha256 of
+    the report text and the format, so exporting a report a second time (in
+    any session) only links an existing file;
+  * PDF and HTML are rendered in a small process pool (EXPORT_WORKERS), off
+    the UI's threads and its GIL. Concurrent exports of the same report
+    share one render;
+  * each session gets its own download path under EXPORT_DIR/sessions, a
+    hard link to the artifact (a copy where links are not supported).
+    Session directories idle for EXPORT_SESSION_TTL seconds and artifacts
+    unused for EXPORT_CACHE_TTL seconds are removed, and the artifact store
+    is kept under EXPORT_CACHE_MAX_MB, least recently used first.
+"""
+import asyncio
+import hashlib
+import html
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+EXPORT_DIR = os.getenv("EXPORT_DIR", os.path.join(".cache", "exports"))
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+EXPORT_SESSION_TTL = float(os.getenv("EXPORT_SESSION_TTL", str(3600)))
+EXPORT_CACHE_TTL = float(os.getenv("EXPORT_CACHE_TTL", str(7 * 86400)))
+EXPORT_CACHE_MAX_MB = float(os.getenv("EXPORT_CACHE_MAX_MB", "256"))
+# Cleanup runs from export() at most this often
+EXPORT_CLEANUP_INTERVAL = 300
+
+FORMATS = {"pdf": ".pdf", "html": ".html", "md": ".md"}
+# Bump when rendering changes, so cached artifacts are not served stale
+RENDER_VERSION = "1"
+
+_SESSION_RE = re.compile(r"[^\w-]+")
+_HEADING_RE = re.compile(r"^#{1,6}\s+(.+)$", re.MULTILINE)
+
+
+def report_digest(text: str, fmt: str) -> str:
+    return hashlib.sha256(f"{RENDER_VERSION}\0{fmt}\0{text}".encode()).hexdigest()
+
+
+def render_html(text: str) -> str:
+    """A standalone HTML page for the Markdown report (escaped plain text without markdown-it)."""
+    try:
+        from markdown_it import MarkdownIt
+        body = MarkdownIt("commonmark").enable("table").render(text)
+    except ImportError:
+        body = f"<pre>{html.escape(text)}</pre>"
+    heading = _HEADING_RE.search(text)
+    title = html.escape(heading.group(1).strip() if heading else "Report")
+    return (f'<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>{title}</title></head>\n'
+            f"<body>\n{body}</body></html>\n")
+
+
+def render_file(fmt: str, text: str, path: str) -> str:
+    """Render `text` as `fmt` into `path` atomically. Runs in the export pool's processes."""
+    root, ext = os.path.splitext(path)
+    tmp = f"{root}.tmp-{os.getpid()}-{threading.get_ident()}{ext}"
+    try:
+        if fmt == "pdf":
+            from markdown_pdf import MarkdownPdf, Section
+            pdf = MarkdownPdf()
+            pdf.add_section(Section(text))
+            pdf.save(tmp)
+        else:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(render_html(text) if fmt == "html" else text)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return path
+
+
+class ExportService:
+    """Content-addressed export cache with per-session download paths."""
+
+    def __init__(self, directory: str = EXPORT_DIR, workers: int = EXPORT_WORKERS,
+                 session_ttl: float = EXPORT_SESSION_TTL, cache_ttl: float = EXPORT_CACHE_TTL,
+                 max_bytes: Optional[int] = int(EXPORT_CACHE_MAX_MB * 1024 * 1024)):
+        self.directory = directory
+        self.workers = workers
+        self.session_ttl = session_ttl
+        self.cache_ttl = cache_ttl
+        self.max_bytes = max_bytes
+        self._artifacts = os.path.join(directory, "artifacts")
+        self._sessions = os.path.join(directory, "sessions")
+        os.makedirs(self._artifacts, exist_ok=True)
+        os.makedirs(self._sessions, exist_ok=True)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._flights = SingleFlight("exports")
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+        self._stats = {"hits": 0, "misses": 0, "render_seconds": 0.0, "removed": 0}
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # Spawned like the job workers, so renders never inherit the UI's threads
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def _render(self, fmt: str, text: str, path: str) -> None:
+        start = time.perf_counter()
+        if fmt == "md" or self.workers <= 0:
+            render_file(fmt, text, path)
+        else:
+            try:
+                self._get_pool().submit(render_file, fmt, text, path).result()
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); start a fresh pool next time
+                with self._lock:
+                    self._pool = None
+                raise
+        with self._lock:
+            self._stats["misses"] += 1
+            self._stats["render_seconds"] += time.perf_counter() - start
+
+    def artifact(self, text: str, fmt: str = "pdf") -> str:
+        """Path of the cached artifact for `text` in `fmt`, rendered on first request."""
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown export format {fmt!r}; expected one of {', '.join(FORMATS)}")
+        digest = report_digest(text, fmt)
+        path = os.path.join(self._artifacts, digest + FORMATS[fmt])
+        if os.path.exists(path):
+            os.utime(path)  # recently used, for LRU cleanup
+            with self._lock:
+                self._stats["hits"] += 1
+            return path
+        self._flights.do(digest, lambda: os.path.exists(path) or self._render(fmt, text, path))
+        return path
+
+    def export(self, text: str, fmt: str = "pdf", session_id: str = "default") -> str:
+        """The session's own download path for `text` rendered as `fmt`."""
+        artifact = self.artifact(text, fmt)
+        session_dir = os.path.join(self._sessions, _SESSION_RE.sub("_", session_id) or "default")
+        os.makedirs(session_dir, exist_ok=True)
+        target = os.path.join(session_dir, f"report-{os.path.basename(artifact)[:12]}{FORMATS[fmt]}")
+        if not os.path.exists(target):
+            try:
+                os.link(artifact, target)
+            except OSError:
+                shutil.copyfile(artifact, target)
+        os.utime(session_dir)
+        if time.time() - self._last_cleanup >= EXPORT_CLEANUP_INTERVAL:
+            try:
+                self.cleanup()
+            except Exception as e:
+                logger.warning(f"⚠️ Export cleanup failed: {e}")
+        return target
+
+    async def aexport(self, text: str, fmt: str = "pdf", session_id: str = "default") -> str:
+        """`export` without blocking the event loop."""
+        return await asyncio.to_thread(self.export, text, fmt, session_id)
+
+    def remove_session(self, session_id: str) -> None:
+        shutil.rmtree(os.path.join(self._sessions, _SESSION_RE.sub("_", session_id) or "default"),
+                      ignore_errors=True)
+
+    def cleanup(self, now: Optional[float] = None) -> int:
+        """Remove idle session directories, expired artifacts, then the least recently used ones over budget."""
+        now = now if now is not None else time.time()
+        self._last_cleanup = now
+        removed = 0
+        for entry in os.scandir(self._sessions):
+            if entry.is_dir() and now - entry.stat().st_mtime > self.session_ttl:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+
+        artifacts = sorted((entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                           for entry in os.scandir(self._artifacts) if entry.is_file())
+        total = sum(size for _, size, _ in artifacts)
+        for mtime, size, path in artifacts:
+            if now - mtime <= self.cache_ttl and (self.max_bytes is None or total <= self.max_bytes):
+                break
+            os.remove(path)
+            total -= size
+            removed += 1
+        with self._lock:
+            self._stats["removed"] += removed
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        sizes = [entry.stat().st_size for entry in os.scandir(self._artifacts) if entry.is_file()]
+        requests = stats["hits"] + stats["misses"]
+        stats.update(artifacts=len(sizes), size_bytes=sum(sizes), renders_shared=self._flights.stats()["shared"],
+                     hit_rate=(stats["hits"] / requests) if requests else 0.0)
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+_service: Optional[ExportService] = None
+_service_lock = threading.Lock()
+
+
+def get_export_service() -> ExportService:
+    """The process-wide export service, created on first use."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ExportService()
+        return _service
@@ -0,0 +1,185 @@
+# fake_batch_server.py
+"""
+Local stand-in for the Groq Batch API (files + batches endpoints).
+
+Batches complete `delay` seconds after they are created. Each request is
+answered by `responder(body) -> str`, and a request whose responder raises
+goes to the batch's error file. Point the Groq SDK at it to try offline
+batch mode without a provider account:
+
+    python fake_batch_server.py --port 8765 --delay 2
+    GROQ_BASE_URL=http://127.0.0.1:8765 LLM_BATCH=1 python batch.py topics.jsonl
+"""
+import argparse
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+PREFIX = "/openai/v1"
+
+
+def echo_responder(body: dict) -> str:
+    prompt = body["messages"][-1]["content"]
+    return f"[fake batch completion] {prompt[:80]}"
+
+
+def _multipart_file(content_type: str, data: bytes) -> bytes:
+    """The `file` part of a multipart/form-data upload."""
+    boundary = re.search(r"boundary=\"?([^\";]+)", content_type).group(1).encode()
+    for part in data.split(b"--" + boundary):
+        head, _, payload = part.partition(b"\r\n\r\n")
+        if b'name="file"' in head:
+            return payload[:-2] if payload.endswith(b"\r\n") else payload
+    raise ValueError("no file part in upload")
+
+
+class FakeBatchServer:
+    def __init__(self, responder: Callable[[dict], str] = echo_responder, delay: float = 0.0,
+                 host: str = "127.0.0.1", port: int = 0, status: Optional[str] = None):
+        self.responder = responder
+        self.delay = delay
+        # Force every batch to end in this status (e.g. "expired") instead of "completed"
+        self.status = status
+        self.files: Dict[str, bytes] = {}
+        self.batches: Dict[str, dict] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeBatchServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeBatchServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _new_id(self, prefix: str) -> str:
+        return f"{prefix}_{next(self._ids)}"
+
+    def _run_batch(self, batch: dict) -> None:
+        """Answer every request in the batch's input file and store the output/error files."""
+        outputs, errors = [], []
+        for line in self.files[batch["input_file_id"]].decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            body = request["body"]
+            try:
+                text = self.responder(body)
+            except Exception as e:
+                errors.append({"id": self._new_id("batch_req"), "custom_id": request["custom_id"],
+                               "response": {"status_code": 500, "body": {"error": {"message": str(e)}}},
+                               "error": {"code": "server_error", "message": str(e)}})
+                continue
+            completion = {
+                "id": self._new_id("chatcmpl"), "object": "chat.completion", "created": int(time.time()),
+                "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(text) // 4, "total_tokens": len(text) // 4},
+            }
+            outputs.append({"id": self._new_id("batch_req"), "custom_id": request["custom_id"],
+                            "response": {"status_code": 200, "request_id": completion["id"], "body": completion},
+                            "error": None})
+        for field, lines in (("output_file_id", outputs), ("error_file_id", errors)):
+            if lines:
+                file_id = self._new_id("file")
+                self.files[file_id] = "\n".join(json.dumps(line) for line in lines).encode("utf-8")
+                batch[field] = file_id
+        batch["request_counts"] = {"total": len(outputs) + len(errors), "completed": len(outputs),
+                                   "failed": len(errors)}
+
+    def _refresh(self, batch: dict) -> dict:
+        with self._lock:
+            if batch["status"] == "in_progress" and time.time() >= batch["created_at"] + self.delay:
+                if self.status:
+                    batch["status"] = self.status
+                else:
+                    self._run_batch(batch)
+                    batch["status"] = "completed"
+                    batch["completed_at"] = int(time.time())
+            return dict(batch)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, payload, raw: bool = False):
+                data = payload if raw else json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/octet-stream" if raw else "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _body(self) -> bytes:
+                return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+            def do_POST(self):
+                if self.path == f"{PREFIX}/files":
+                    data = _multipart_file(self.headers["Content-Type"], self._body())
+                    file_id = server._new_id("file")
+                    server.files[file_id] = data
+                    return self._send(200, {"id": file_id, "object": "file", "bytes": len(data),
+                                            "created_at": int(time.time()), "filename": "requests.jsonl",
+                                            "purpose": "batch"})
+                if self.path == f"{PREFIX}/batches":
+                    request = json.loads(self._body())
+                    if request.get("input_file_id") not in server.files:
+                        return self._send(404, {"error": {"message": "input file not found"}})
+                    batch = {"id": server._new_id("batch"), "object": "batch", "endpoint": request["endpoint"],
+                             "input_file_id": request["input_file_id"],
+                             "completion_window": request["completion_window"], "status": "in_progress",
+                             "created_at": time.time(), "output_file_id": None, "error_file_id": None}
+                    with server._lock:
+                        server.batches[batch["id"]] = batch
+                    return self._send(200, server._refresh(batch))
+                self._send(404, {"error": {"message": "not found"}})
+
+            def do_GET(self):
+                match = re.fullmatch(rf"{PREFIX}/batches/([\w-]+)", self.path)
+                if match and match.group(1) in server.batches:
+                    return self._send(200, server._refresh(server.batches[match.group(1)]))
+                match = re.fullmatch(rf"{PREFIX}/files/([\w-]+)/content", self.path)
+                if match and match.group(1) in server.files:
+                    return self._send(200, server.files[match.group(1)], raw=True)
+                self._send(404, {"error": {"message": "not found"}})
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=2.0, help="seconds before a batch completes")
+    args = parser.parse_args()
+    server = FakeBatchServer(delay=args.delay, port=args.port)
+    print(f"Fake batch API on {server.url} (batches complete after {args.delay}s)")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,127 +1,518 @@
 # groq_client.py
-from groq import Groq
 import os
+import time
+import asyncio
 import logging
+import threading
 from dotenv import load_dotenv
-from typing import Optional, Any
-import inspect
-from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type
+from typing import Optional, Any, Iterator, AsyncIterator, TYPE_CHECKING
+from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type, retry_if_not_exception_type
+from disk_cache import DiskCache, make_key
+import clients
+import llm_adapter
+import llm_batch
+import rate_limiter
+from provider_router import ProviderRouter
+import circuit_breaker
+from circuit_breaker import CircuitOpenError
+from singleflight import SingleFlight
+
+if TYPE_CHECKING:
+    from groq import Groq, AsyncGroq
 
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-_client: Optional[Groq] = None
+SYSTEM_MESSAGE = "You are a professional AI research assistant."
+GEMINI_MODEL = "gemini-2.5-flash"
+
+# === COMPLETION CACHE ===
+# Set LLM_CACHE_PATH to an empty string to disable the cache entirely.
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(".cache", "llm_cache.db"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "256"))
+
+_cache: Optional[DiskCache] = None
+_cache_lock = threading.Lock()
+_router: Optional[ProviderRouter] = None
+
+# === OFFLINE BATCH MODE ===
+# With LLM_BATCH=1 (or use_batch_backend()), completions are collected into
+# provider Batch API jobs instead of being sent interactively (see llm_batch.py)
+LLM_BATCH = os.getenv("LLM_BATCH", "0") == "1"
+_batch: Optional[llm_batch.BatchCollector] = None
+# Identical prompts in flight at the same time share one completion
+_inflight = SingleFlight("completions")
+
+def _get_client() -> "Groq":
+    # One pooled client per process, shared with every other caller (see clients.py)
+    return clients.get_groq()
+
+def _get_async_client() -> "AsyncGroq":
+    return clients.get_async_groq()
 
-def _get_client() -> Groq:
-    global _client
-    if _client is not None:
-        return _client
-    api_key = os.getenv("GROQ_API_KEY")
-    if not api_key:
-        raise EnvironmentError("GROQ_API_KEY is not set. Add it to .env or export it in your shell.")
-    _client = Groq(api_key=api_key)
-    return _client
+def _get_cache() -> Optional[DiskCache]:
+    global _cache
+    if _cache is not None:
+        return _cache
+    if not LLM_CACHE_PATH:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = DiskCache(LLM_CACHE_PATH, table="completions", ttl=LLM_CACHE_TTL,
+                                   max_bytes=int(LLM_CACHE_MAX_MB * 1024 * 1024))
+            except Exception as e:
+                logger.warning(f"⚠️ Completion cache unavailable ({e}). Continuing without it.")
+                return None
+    return _cache
 
-def _choose_token_param(func) -> Optional[str]:
+def _get_router() -> ProviderRouter:
+    global _router
+    if _router is None:
+        with _cache_lock:
+            if _router is None:
+                _router = ProviderRouter(["groq", "gemini"])
+    return _router
+
+def provider_stats() -> dict:
+    """Per-provider latency quantiles, error rates and hedge counts from the router."""
+    return _get_router().stats()
+
+def breaker_stats() -> dict:
+    """Circuit state (closed/open/half_open) and recent failure rate per provider."""
+    return circuit_breaker.stats()
+
+def use_batch_backend(enabled: bool = True, collector: Optional[llm_batch.BatchCollector] = None) -> None:
     """
-    Inspect the signature of the SDK function and return which
-    keyword name to use for token limit, or None if none supported.
+    Send completions through the provider Batch API (`enabled=True`) or
+    interactively again. `collector` replaces the default Groq-backed one.
     """
-    try:
-        sig = inspect.signature(func)
-        params = sig.parameters.keys()
-        if "max_output_tokens" in params:
-            return "max_output_tokens"
-        if "max_tokens" in params:
-            return "max_tokens"
-    except Exception:
-        # If inspection fails, return None and we'll try calls without token param
-        pass
-    return None
-
-def _extract_text_from_response(resp: Any) -> str:
+    global LLM_BATCH, _batch
+    with _cache_lock:
+        LLM_BATCH = enabled
+        if collector is not None:
+            _batch = collector
+
+def _get_batch() -> llm_batch.BatchCollector:
+    global _batch
+    if _batch is None:
+        with _cache_lock:
+            if _batch is None:
+                _batch = llm_batch.BatchCollector(llm_batch.GroqBatchBackend(_get_client()))
+    return _batch
+
+def batch_stats() -> dict:
+    """Requests queued, in flight, completed and failed in offline batch mode."""
+    return _get_batch().stats() if LLM_BATCH else {"enabled": False}
+
+def inflight_stats() -> dict:
+    """How many completions ran and how many concurrent duplicates shared them."""
+    return _inflight.stats()
+
+def completion_cache_key(model: str, system: str, prompt: str,
+                         temperature: float, max_tokens: Optional[int]) -> str:
+    return make_key("completion", model, system, prompt, float(temperature), max_tokens)
+
+def cache_stats() -> dict:
     """
-    Try multiple common response shapes to extract generated text.
+    Hit/miss/byte counters for the completion cache. `tokens_saved` is a rough
+    estimate (~4 characters per token); `seconds_saved` sums the original
+    latency of every completion served from cache.
     """
+    cache = _get_cache()
+    if cache is None:
+        return {"enabled": False}
+    stats = cache.stats()
+    stats.update(enabled=True,
+                 tokens_saved=stats["bytes_served"] // 4,
+                 seconds_saved=round(stats["cost_saved"], 3))
+    return stats
+
+def _call_gemini_fallback(prompt: str) -> str:
+    """Fallback logic utilizing the Google Gemini SDK when Groq fails."""
     try:
-        # typical shape: resp.choices[0].message.content
-        return resp.choices[0].message.content
-    except Exception:
-        pass
-    try:
-        # alternative: resp.choices[0].text
-        return resp.choices[0].text
-    except Exception:
-        pass
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            return "[error: Groq failed and GEMINI_API_KEY is missing for fallback]"
+            
+        def _send():
+            rate_limiter.get_limiter("gemini", GEMINI_MODEL).acquire(rate_limiter.estimate_tokens(prompt))
+            client = clients.get_gemini()
+            return client.models.generate_content(
+                model=GEMINI_MODEL,
+                contents=prompt,
+            )
+
+        return circuit_breaker.get_breaker("gemini").call(_send).text
+    except Exception as e:
+        return f"[error: both Groq and Gemini fallback failed: {e}]"
+
+def _stream_gemini_fallback(prompt: str) -> Iterator[str]:
+    """Streaming Gemini fallback: yields text chunks, or a single error marker."""
     try:
-        # Groq older/newer shapes
-        # e.g., resp.output[0].content[0].text
-        return resp.output[0].content[0].text
-    except Exception:
-        pass
-    # fallback to string representation
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            yield "[error: Groq failed and GEMINI_API_KEY is missing for fallback]"
+            return
+
+        breaker = circuit_breaker.get_breaker("gemini")
+        if not breaker.allow():
+            raise CircuitOpenError("circuit for gemini is open")
+        try:
+            rate_limiter.get_limiter("gemini", GEMINI_MODEL).acquire(rate_limiter.estimate_tokens(prompt))
+            client = clients.get_gemini()
+            for chunk in client.models.generate_content_stream(
+                model=GEMINI_MODEL,
+                contents=prompt,
+            ):
+                if chunk.text:
+                    yield chunk.text
+        except Exception as e:
+            breaker.record_failure(e)
+            raise
+        except BaseException:
+            # The consumer stopped early (GeneratorExit) or was cancelled: free the probe slot
+            breaker.release()
+            raise
+        breaker.record_success()
+    except Exception as e:
+        yield f"[error: both Groq and Gemini fallback failed: {e}]"
+
+async def _astream_gemini_fallback(prompt: str) -> AsyncIterator[str]:
     try:
-        return str(resp)
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            yield "[error: Groq failed and GEMINI_API_KEY is missing for fallback]"
+            return
+
+        breaker = circuit_breaker.get_breaker("gemini")
+        if not breaker.allow():
+            raise CircuitOpenError("circuit for gemini is open")
+        try:
+            await rate_limiter.get_limiter("gemini", GEMINI_MODEL).aacquire(rate_limiter.estimate_tokens(prompt))
+            client = clients.get_async_gemini()
+            stream = await client.aio.models.generate_content_stream(
+                model=GEMINI_MODEL,
+                contents=prompt,
+            )
+            async for chunk in stream:
+                if chunk.text:
+                    yield chunk.text
+        except Exception as e:
+            breaker.record_failure(e)
+            raise
+        except BaseException:
+            # The consumer stopped early (GeneratorExit) or was cancelled: free the probe slot
+            breaker.release()
+            raise
+        breaker.record_success()
     except Exception as e:
-        return f"[error extracting text: {e}]"
+        yield f"[error: both Groq and Gemini fallback failed: {e}]"
 
-def _call_gemini_fallback(prompt: str) -> str:
-    """Fallback logic utilizing the Google Gemini SDK when Groq fails."""
+async def _call_gemini_fallback_async(prompt: str) -> str:
+    """Async counterpart of `_call_gemini_fallback` using the SDK's `aio` client."""
     try:
-        from google import genai
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             return "[error: Groq failed and GEMINI_API_KEY is missing for fallback]"
-            
-        client = genai.Client(api_key=api_key)
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=prompt,
-        )
-        return response.text
+
+        async def _send():
+            await rate_limiter.get_limiter("gemini", GEMINI_MODEL).aacquire(rate_limiter.estimate_tokens(prompt))
+            client = clients.get_async_gemini()
+            return await client.aio.models.generate_content(
+                model=GEMINI_MODEL,
+                contents=prompt,
+            )
+
+        return (await circuit_breaker.get_breaker("gemini").acall(_send)).text
     except Exception as e:
         return f"[error: both Groq and Gemini fallback failed: {e}]"
 
+def _settle_usage(limiter: rate_limiter.RateLimiter, resp: Any, estimated: int) -> None:
+    """Correct the TPM bucket with the token count the provider actually billed."""
+    total = llm_adapter.usage_tokens(resp)
+    if total is not None:
+        limiter.adjust(total - estimated)
+
+# Built once at import instead of per call. An open circuit is final: no
+# backoff against a provider known to be down.
+_groq_retry = retry(wait=wait_exponential(multiplier=1, min=2, max=10), stop=stop_after_attempt(3),
+                    retry=retry_if_not_exception_type(CircuitOpenError))
+
+def _groq_complete(prompt: str, model: str, temperature: float,
+                   max_tokens: Optional[int], estimated: int) -> str:
+    """
+    One Groq completion (retried), gated by the breaker and rate limiter. The
+    caller waits in the limiter for the first attempt before the router starts
+    timing this call, so only retries queue here.
+    """
+    client = _get_client()
+    payload = llm_adapter.adapter_for(client, SYSTEM_MESSAGE).payload(prompt, model, temperature, max_tokens)
+    limiter = rate_limiter.get_limiter("groq", model)
+    attempts = 0
+
+    @_groq_retry
+    def _attempt():
+        nonlocal attempts
+        attempts += 1
+        if attempts > 1:
+            limiter.acquire(estimated)
+        return circuit_breaker.get_breaker("groq").call(lambda: client.chat.completions.create(**payload))
+
+    resp = _attempt()
+    _settle_usage(limiter, resp, estimated)
+    return llm_adapter.extract_text(resp)
+
+async def _agroq_complete(prompt: str, model: str, temperature: float,
+                          max_tokens: Optional[int], estimated: int) -> str:
+    client = _get_async_client()
+    payload = llm_adapter.adapter_for(client, SYSTEM_MESSAGE).payload(prompt, model, temperature, max_tokens)
+    limiter = rate_limiter.get_limiter("groq", model)
+    attempts = 0
+
+    @_groq_retry
+    async def _attempt():
+        nonlocal attempts
+        attempts += 1
+        if attempts > 1:
+            await limiter.aacquire(estimated)
+        return await circuit_breaker.get_breaker("groq").acall(lambda: client.chat.completions.create(**payload))
+
+    resp = await _attempt()
+    _settle_usage(limiter, resp, estimated)
+    return llm_adapter.extract_text(resp)
+
+@_groq_retry
+def _groq_open_stream(prompt: str, model: str, temperature: float, max_tokens: Optional[int]):
+    client = _get_client()
+    payload = llm_adapter.adapter_for(client, SYSTEM_MESSAGE).payload(
+        prompt, model, temperature, max_tokens, stream=True)
+    # Queue for quota before the breaker, so a half-open probe slot is not held while waiting
+    rate_limiter.get_limiter("groq", model).acquire(rate_limiter.estimate_tokens(prompt, max_tokens))
+    return circuit_breaker.get_breaker("groq").call(lambda: client.chat.completions.create(**payload))
+
+@_groq_retry
+async def _agroq_open_stream(prompt: str, model: str, temperature: float, max_tokens: Optional[int]):
+    client = _get_async_client()
+    payload = llm_adapter.adapter_for(client, SYSTEM_MESSAGE).payload(
+        prompt, model, temperature, max_tokens, stream=True)
+    await rate_limiter.get_limiter("groq", model).aacquire(rate_limiter.estimate_tokens(prompt, max_tokens))
+    return await circuit_breaker.get_breaker("groq").acall(lambda: client.chat.completions.create(**payload))
+
+def _batch_submit(prompt: str, model: str, temperature: float, max_tokens: Optional[int]):
+    payload = llm_adapter.adapter_for(_get_client(), SYSTEM_MESSAGE).payload(prompt, model, temperature, max_tokens)
+    return _get_batch().submit(payload)
+
+def _batch_result(future) -> Optional[str]:
+    """Text of a finished batch request, or None (logged) if it failed."""
+    try:
+        return llm_batch.completion_text(future.result())
+    except Exception as e:
+        logger.warning(f"⚠️ Batch completion failed ({e}). Falling back to an interactive call...")
+        return None
+
+def _cache_lookup(use_cache: bool, model: str, prompt: str, temperature: float,
+                  max_tokens: Optional[int]):
+    """Return (cache, key, cached_text); cache is None when caching is off."""
+    cache = _get_cache() if use_cache else None
+    if cache is None:
+        return None, None, None
+    cache_key = completion_cache_key(model, SYSTEM_MESSAGE, prompt, temperature, max_tokens)
+    return cache, cache_key, cache.get(cache_key)
+
+def _cache_store(cache: Optional[DiskCache], cache_key: Optional[str], text: Any, started: float) -> None:
+    # Only primary-provider answers are cached; fallbacks and error markers are not
+    if cache is None or not isinstance(text, str) or text.startswith("[error"):
+        return
+    try:
+        cache.set(cache_key, text, cost=time.perf_counter() - started)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not write completion cache: {e}")
+
 def ask_groq(prompt: str,
              model: str = "openai/gpt-oss-120b",
              temperature: float = 0.7,
-             max_tokens: Optional[int] = None) -> str:
+             max_tokens: Optional[int] = None,
+             use_cache: bool = True) -> str:
     """
     Safe, adaptive Groq wrapper. Accepts `max_tokens` for compatibility and
     maps it to the appropriate SDK parameter if supported.
     Returns generated text string or an error marker starting with '[error:'.
     
     If Groq fails (e.g., HTTP 429 or 500 timeout), it will automatically
-    failover to Gemini flash.
+    failover to Gemini flash. If Groq is merely slow — past its learned p95
+    for this model and max_tokens — a hedged Gemini request is raced against
+    it and the first answer wins (see provider_router.py).
+
+    Successful Groq completions are stored in a disk-backed cache keyed by
+    (model, system message, prompt, temperature, max_tokens); pass
+    `use_cache=False` to bypass it for a single call.
+
+    Every attempt first waits its turn in the shared per-model rate limiter,
+    so concurrent callers stay under the provider quota instead of retrying
+    into 429s together. The wait happens before the router starts timing
+    Groq, so a full local queue does not look like a slow provider. Concurrent calls with the same cache key share a
+    single completion (see singleflight.py).
+
+    In offline batch mode (`use_batch_backend()`), the call instead waits
+    for its request to come back from a provider batch job. If the batch
+    fails, it falls back to the interactive path above.
+    """
+    cache, cache_key, cached = _cache_lookup(use_cache, model, prompt, temperature, max_tokens)
+    if cached is not None:
+        return cached
+
+    def complete() -> str:
+        started = time.perf_counter()
+        if LLM_BATCH:
+            text = _batch_result(_batch_submit(prompt, model, temperature, max_tokens))
+            if text is not None:
+                _cache_store(cache, cache_key, text, started)
+                return text
+        # If Groq fails for any reason (Rate Limit, Server Timeout, Bad Request)
+        # the router fails over to Gemini; if it is slow, it hedges to Gemini
+        estimated = rate_limiter.estimate_tokens(prompt, max_tokens)
+        # Wait for Groq quota before the router starts its clock, so hedging
+        # and latency stats see the provider, not the local queue
+        rate_limiter.get_limiter("groq", model).acquire(estimated)
+        text, provider = _get_router().run(
+            {"groq": lambda: _groq_complete(prompt, model, temperature, max_tokens, estimated),
+             "gemini": lambda: _call_gemini_fallback(prompt)},
+            key=f"{model}:{max_tokens}",
+        )
+        if provider == "groq":
+            _cache_store(cache, cache_key, text, started)
+        return text
+
+    if not use_cache:
+        return complete()
+    return _inflight.do(cache_key or completion_cache_key(model, SYSTEM_MESSAGE, prompt, temperature, max_tokens),
+                        complete)
+
+async def ask_groq_async(prompt: str,
+                         model: str = "openai/gpt-oss-120b",
+                         temperature: float = 0.7,
+                         max_tokens: Optional[int] = None,
+                         use_cache: bool = True) -> str:
+    """
+    Non-blocking variant of `ask_groq` built on `AsyncGroq`, with the same
+    retry, cache and Gemini failover behaviour. Use it from async graph runs
+    so that one event loop can carry many reports at once.
+    """
+    cache, cache_key, cached = _cache_lookup(use_cache, model, prompt, temperature, max_tokens)
+    if cached is not None:
+        return cached
+
+    async def complete() -> str:
+        started = time.perf_counter()
+        if LLM_BATCH:
+            future = _batch_submit(prompt, model, temperature, max_tokens)
+            await asyncio.wait([asyncio.wrap_future(future)])
+            text = _batch_result(future)
+            if text is not None:
+                _cache_store(cache, cache_key, text, started)
+                return text
+        estimated = rate_limiter.estimate_tokens(prompt, max_tokens)
+        await rate_limiter.get_limiter("groq", model).aacquire(estimated)
+        text, provider = await _get_router().arun(
+            {"groq": lambda: _agroq_complete(prompt, model, temperature, max_tokens, estimated),
+             "gemini": lambda: _call_gemini_fallback_async(prompt)},
+            key=f"{model}:{max_tokens}",
+        )
+        if provider == "groq":
+            _cache_store(cache, cache_key, text, started)
+        return text
+
+    if not use_cache:
+        return await complete()
+    return await _inflight.ado(cache_key or completion_cache_key(model, SYSTEM_MESSAGE, prompt, temperature, max_tokens),
+                               complete)
+
+def ask_groq_stream(prompt: str,
+                    model: str = "openai/gpt-oss-120b",
+                    temperature: float = 0.7,
+                    max_tokens: Optional[int] = None,
+                    use_cache: bool = True) -> Iterator[str]:
+    """
+    Streaming variant of `ask_groq`: yields text chunks as Groq produces them.
+
+    Opening the stream is retried like `ask_groq`; if Groq still fails before
+    the first chunk, the Gemini fallback is streamed instead. A cache hit is
+    yielded as one chunk, and a completed Groq stream is written to the cache.
+    In offline batch mode the whole batched completion is yielded as one chunk.
     """
-    @retry(wait=wait_exponential(multiplier=1, min=2, max=10), stop=stop_after_attempt(3))
-    def _execute():
-        client = _get_client()
-        func = client.chat.completions.create
-        token_param_name = _choose_token_param(func)
-
-        payload = {
-            "model": model,
-            "messages": [
-                {"role": "system", "content": "You are a professional AI research assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            "temperature": float(temperature)
-        }
-
-        # Add token param only if we detected a supported name
-        if max_tokens is not None and token_param_name:
-            payload[token_param_name] = int(max_tokens)
-
-        # Try calling once with chosen payload
-        resp = func(**payload)
-        return _extract_text_from_response(resp)
+    if LLM_BATCH:
+        yield ask_groq(prompt, model, temperature, max_tokens, use_cache)
+        return
+    cache, cache_key, cached = _cache_lookup(use_cache, model, prompt, temperature, max_tokens)
+    if cached is not None:
+        yield cached
+        return
 
+    started = time.perf_counter()
     try:
-        return _execute()
+        stream = _groq_open_stream(prompt, model, temperature, max_tokens)
     except Exception as groq_error:
-        # If Groq fails for any reason (Rate Limit, Server Timeout, Bad Request)
-        # Attempt to failover to Gemini
         logger.warning(f"⚠️ Groq failed after retries: {groq_error}. Attempting Gemini failover...")
-        return _call_gemini_fallback(prompt)
+        yield from _stream_gemini_fallback(prompt)
+        return
+
+    parts = []
+    try:
+        for chunk in stream:
+            text = llm_adapter.extract_delta(chunk)
+            if text:
+                parts.append(text)
+                yield text
+    except Exception as e:
+        logger.warning(f"⚠️ Groq stream interrupted: {e}")
+        if not parts:
+            yield from _stream_gemini_fallback(prompt)
+        else:
+            yield f"\n\n[error: stream interrupted: {e}]"
+        return
+
+    _cache_store(cache, cache_key, "".join(parts), started)
+
+async def ask_groq_stream_async(prompt: str,
+                                model: str = "openai/gpt-oss-120b",
+                                temperature: float = 0.7,
+                                max_tokens: Optional[int] = None,
+                                use_cache: bool = True) -> AsyncIterator[str]:
+    """Async counterpart of `ask_groq_stream` built on `AsyncGroq`."""
+    if LLM_BATCH:
+        yield await ask_groq_async(prompt, model, temperature, max_tokens, use_cache)
+        return
+    cache, cache_key, cached = _cache_lookup(use_cache, model, prompt, temperature, max_tokens)
+    if cached is not None:
+        yield cached
+        return
+
+    started = time.perf_counter()
+    try:
+        stream = await _agroq_open_stream(prompt, model, temperature, max_tokens)
+    except Exception as groq_error:
+        logger.warning(f"⚠️ Groq failed after retries: {groq_error}. Attempting Gemini failover...")
+        async for text in _astream_gemini_fallback(prompt):
+            yield text
+        return
+
+    parts = []
+    try:
+        async for chunk in stream:
+            text = llm_adapter.extract_delta(chunk)
+            if text:
+                parts.append(text)
+                yield text
+    except Exception as e:
+        logger.warning(f"⚠️ Groq stream interrupted: {e}")
+        if not parts:
+            async for text in _astream_gemini_fallback(prompt):
+                yield text
+        else:
+            yield f"\n\n[error: stream interrupted: {e}]"
+        return
+
+    _cache_store(cache, cache_key, "".join(parts), started)
@@ -0,0 +1,167 @@
+# guardrails.py
+"""
+Input guardrail for the report writer.
+
+Banned phrases live in a policy file (GUARDRAIL_POLICY_PATH, default
+guardrail_policy.txt next to this module): one pattern per line under a
+`[category]` header, `#` for comments. A pattern matches whole words, so
+"hack" does not fire on "shackles"; a trailing `*` makes its last word a
+prefix ("credit card*" also matches "credit cards").
+
+Matching tolerates the usual evasions. Messages are folded once before the
+scan: Unicode compatibility forms (fullwidth letters, accents, zero-width
+characters, common Cyrillic look-alikes), case, leetspeak ("h4ck", "$teal",
+"h@ck"), and punctuation, which becomes a space. The compiled patterns then
+accept any number of spaces between words ("social   security",
+"credit-card"), letters spelled out one by one ("h a c k", "h.a.c.k") and
+repeated letters ("haaack").
+
+All patterns are compiled into one regex shaped like a trie, so the cost of
+a scan grows with the message, not with the number of patterns. Folding a
+plain ASCII message is one casefold and one str.translate, and the regex
+starts with a literal space so it is only tried at word starts, so a benign
+chat message costs a few microseconds.
+"""
+import logging
+import os
+import re
+import string
+import unicodedata
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+GUARDRAIL_POLICY_PATH = os.getenv(
+    "GUARDRAIL_POLICY_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "guardrail_policy.txt"))
+GUARDRAIL_MAX_CHARS = int(os.getenv("GUARDRAIL_MAX_CHARS", "5000"))
+
+_LEET = dict(zip("013457@$|+", "oieastasit"))
+# "!" ends far more words ("hack!") than it spells an "i", so it is punctuation here
+_FOLD = str.maketrans({**{c: " " for c in string.punctuation + string.whitespace}, **_LEET})
+_CONFUSABLES = str.maketrans("аеорсхуі", "aeopcxyi")  # Cyrillic look-alikes
+_NON_WORD_RE = re.compile(r"[\W_]+")
+_REPEAT_RE = re.compile(r"(\w)\1+")
+
+
+class GuardrailMatch(NamedTuple):
+    category: str
+    pattern: str
+    text: str
+
+
+def fold(text: str) -> str:
+    """`text` as the guardrail scans it: folded, with words separated by spaces and a leading space."""
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(c for c in text if not unicodedata.combining(c) and unicodedata.category(c) != "Cf")
+        text = _NON_WORD_RE.sub(" ", text.translate(_CONFUSABLES).casefold().translate(_FOLD))
+        return " " + text
+    return " " + text.casefold().translate(_FOLD)
+
+
+def _key(text: str) -> str:
+    """What a pattern and every text it matches have in common: no separators, no repeated letters."""
+    return _REPEAT_RE.sub(r"\1", _NON_WORD_RE.sub("", fold(text)))
+
+
+def _trie_regex(phrases: Iterable[str], spelled: bool = False) -> str:
+    """
+    One regex for all `phrases` (words joined by single spaces), branching
+    like a trie so a scan never tries them one by one. Letters may repeat,
+    words may be separated by several spaces, and with `spelled` every
+    letter must be followed by a space ("h a c k").
+    """
+    trie: dict = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def edge(char: str, prev: Optional[str]) -> str:
+        if char == " ":
+            return " +"
+        letter = re.escape(char)
+        if spelled:
+            return letter if prev in (None, " ") else " " + letter
+        return letter + "+"
+
+    def render(node: dict, prev: Optional[str]) -> str:
+        optional = "" in node
+        branches = [edge(char, prev) + render(child, char) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not optional:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if optional else group
+
+    return render(trie, None)
+
+
+class GuardrailPolicy:
+    """A compiled set of banned patterns, grouped by category."""
+
+    def __init__(self, patterns: Iterable[Tuple[str, str]]):
+        self._categories: Dict[str, Tuple[str, str]] = {}
+        exact, prefix = [], []
+        for category, pattern in patterns:
+            phrase = " ".join(fold(pattern.rstrip("*")).split())
+            if not phrase:
+                continue
+            self._categories.setdefault(_key(phrase), (category, pattern))
+            (prefix if pattern.endswith("*") else exact).append(phrase)
+
+        alternatives = []
+        if exact:
+            alternatives.append(f"(?P<exact>{_trie_regex(exact)})(?!\\w)")
+        if prefix:
+            alternatives.append(f"(?P<prefix>{_trie_regex(prefix)})\\w*")
+        if exact or prefix:
+            alternatives.append(f"(?P<spelled>{_trie_regex(exact + prefix, spelled=True)})(?!\\w)")
+        self._regex = re.compile(f" (?:{'|'.join(alternatives)})") if alternatives else None
+
+    @classmethod
+    def from_file(cls, path: str) -> "GuardrailPolicy":
+        """Load a policy file: `[category]` headers, one pattern per line, `#` comments."""
+        patterns, category = [], "policy"
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if line.startswith("[") and line.endswith("]"):
+                    category = line[1:-1].strip()
+                elif line:
+                    patterns.append((category, line))
+        return cls(patterns)
+
+    def __len__(self) -> int:
+        return len(self._categories)
+
+    def _match(self, m: re.Match) -> GuardrailMatch:
+        matched = next(text for text in m.groups() if text is not None)
+        category, pattern = self._categories[_key(matched)]
+        return GuardrailMatch(category, pattern, m.group().strip())
+
+    def check(self, text: str) -> Optional[GuardrailMatch]:
+        """The first policy violation in `text`, or None."""
+        if self._regex is None or not text:
+            return None
+        m = self._regex.search(fold(text))
+        return self._match(m) if m else None
+
+    def find_all(self, text: str) -> List[GuardrailMatch]:
+        if self._regex is None or not text:
+            return []
+        return [self._match(m) for m in self._regex.finditer(fold(text))]
+
+
+_guardrail: Optional[GuardrailPolicy] = None
+
+
+def get_guardrail() -> GuardrailPolicy:
+    """The process-wide policy, loaded from GUARDRAIL_POLICY_PATH on first use."""
+    global _guardrail
+    if _guardrail is None:
+        _guardrail = GuardrailPolicy.from_file(GUARDRAIL_POLICY_PATH)
+        logger.info(f"Loaded {len(_guardrail)} guardrail patterns from {GUARDRAIL_POLICY_PATH}.")
+    return _guardrail
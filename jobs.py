@@ -0,0 +1,472 @@
+# jobs.py
+"""
+Background report jobs.
+
+Submitting a topic enqueues a job row instead of running the graph in the
+web request. A pool of worker processes claims queued jobs and runs them
+through the graph from `build_workflow` (via the process's AgentRuntime).
+Each worker publishes progress events (steps, tool calls, report tokens,
+the final report) to an events table. The UI follows a job by polling that
+table, so it can reconnect to a running job by thread_id after a refresh,
+and workers can be scaled separately from the UI:
+
+    python jobs.py worker --workers 4          # run a worker pool
+    python jobs.py enqueue "EV market outlook"  # queue a report
+    python jobs.py follow <thread_id>           # print its events as they arrive
+
+The queue lives in one SQLite file (JOBS_DB_PATH) shared by all processes
+on the host. A job whose worker stops sending heartbeats is requeued. If
+the checkpointer is shared (Postgres, or a SQLite file), the next worker resumes the thread
+from its last checkpoint.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))
+# A running job with no heartbeat for this long is handed to another worker
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "300"))
+JOB_HEARTBEAT_SECONDS = 10.0
+# A job whose worker has gone silent this many times (e.g. killed by OOM) fails instead of being requeued
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Report tokens are coalesced into one event per source at most this often
+JOB_TOKEN_FLUSH_SECONDS = 0.25
+JOB_RECURSION_LIMIT = 25
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+TERMINAL_STATUSES = (DONE, FAILED)
+# Same stream modes as the interactive chat handler
+STREAM_MODES = ["values", "messages", "custom"]
+
+
+class Job(NamedTuple):
+    id: int
+    thread_id: str
+    topic: str
+    mode: Optional[str]
+    status: str
+    attempts: int
+    worker: Optional[str]
+    created_at: float
+    started_at: Optional[float]
+    finished_at: Optional[float]
+    result: Optional[str]
+    error: Optional[str]
+
+
+class Event(NamedTuple):
+    id: int
+    job_id: int
+    kind: str
+    data: Dict[str, Any]
+    created_at: float
+
+
+_JOB_COLUMNS = ", ".join(Job._fields)
+
+
+class JobQueue:
+    """
+    Jobs and their progress events in a SQLite file shared across processes.
+
+    `claim()` hands each queued job to exactly one worker. `publish()` and
+    `subscribe()` form the event stream the UI reads. Every instance owns one
+    connection, so open one JobQueue per process.
+    """
+
+    def __init__(self, path: str = JOBS_DB_PATH):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit mode, so claim() can take the write lock with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, thread_id TEXT NOT NULL, topic TEXT NOT NULL, "
+                "mode TEXT, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, worker TEXT, "
+                "created_at REAL NOT NULL, started_at REAL, finished_at REAL, heartbeat_at REAL, "
+                "result TEXT, error TEXT);"
+                "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id);"
+                "CREATE INDEX IF NOT EXISTS idx_jobs_thread ON jobs (thread_id, id);"
+                "CREATE TABLE IF NOT EXISTS events ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, job_id INTEGER NOT NULL, kind TEXT NOT NULL, "
+                "data TEXT NOT NULL, created_at REAL NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS idx_events_job ON events (job_id, id);"
+            )
+
+    def _job(self, where: str, params: tuple) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE {where}", params).fetchone()
+        return Job(*row) if row else None
+
+    def get(self, job_id: int) -> Optional[Job]:
+        return self._job("id = ?", (job_id,))
+
+    def latest_job(self, thread_id: str) -> Optional[Job]:
+        """The most recent job for `thread_id`, i.e. the one a reconnecting UI should follow."""
+        return self._job("thread_id = ? ORDER BY id DESC LIMIT 1", (thread_id,))
+
+    def enqueue(self, topic: str, thread_id: Optional[str] = None, mode: Optional[str] = None) -> Job:
+        thread_id = thread_id or str(uuid.uuid4())
+        with self._lock:
+            job_id = self._conn.execute(
+                "INSERT INTO jobs (thread_id, topic, mode, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                (thread_id, topic, mode, QUEUED, time.time())).lastrowid
+        self.publish(job_id, "queued", {"topic": topic})
+        return self.get(job_id)
+
+    def claim(self, worker: str) -> Optional[Job]:
+        """Atomically take the oldest queued job for `worker`, or None if the queue is empty."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE status = ? ORDER BY id LIMIT 1", (QUEUED,)).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, "
+                        "started_at = ?, heartbeat_at = ? WHERE id = ?", (RUNNING, worker, now, now, row[0]))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(row[0]) if row is not None else None
+
+    def heartbeat(self, job_id: int) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def _finish(self, job_id: int, status: str, result: Optional[str], error: Optional[str]) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                               (status, result, error, time.time(), job_id))
+
+    def complete(self, job_id: int, result: str) -> None:
+        self._finish(job_id, DONE, result, None)
+
+    def fail(self, job_id: int, error: str) -> None:
+        self._finish(job_id, FAILED, None, error)
+
+    def requeue_stale(self, stale_after: float = JOB_STALE_SECONDS, max_attempts: int = JOB_MAX_ATTEMPTS) -> int:
+        """
+        Put running jobs whose worker went silent back in the queue. Returns how
+        many. A job that has already been claimed `max_attempts` times is marked
+        failed with an "error" event instead, so a job that crashes its worker
+        cannot take down every worker in turn.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                stale = self._conn.execute(
+                    "SELECT id, attempts FROM jobs WHERE status = ? AND heartbeat_at < ?",
+                    (RUNNING, now - stale_after)).fetchall()
+                exhausted = [(job_id, attempts) for job_id, attempts in stale if attempts >= max_attempts]
+                requeue = [job_id for job_id, attempts in stale if attempts < max_attempts]
+                self._conn.executemany("UPDATE jobs SET status = ?, worker = NULL WHERE id = ?",
+                                       [(QUEUED, job_id) for job_id in requeue])
+                for job_id, attempts in exhausted:
+                    error = f"worker stopped responding on each of {attempts} attempts"
+                    self._conn.execute("UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                                       (FAILED, error, now, job_id))
+                    self._conn.execute("INSERT INTO events (job_id, kind, data, created_at) VALUES (?, ?, ?, ?)",
+                                       (job_id, "error", json.dumps({"error": error}), now))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if requeue:
+            logger.warning(f"⚠️ Requeued {len(requeue)} job(s) whose worker stopped responding.")
+        if exhausted:
+            logger.warning(f"⚠️ Failed job(s) {', '.join(str(j) for j, _ in exhausted)} after "
+                           f"{max_attempts} attempts whose worker stopped responding.")
+        return len(requeue)
+
+    def publish(self, job_id: int, kind: str, data: Optional[Dict[str, Any]] = None) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "INSERT INTO events (job_id, kind, data, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, kind, json.dumps(data or {}), time.time())).lastrowid
+
+    def events(self, job_id: int, after_id: int = 0, limit: int = 500) -> List[Event]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, job_id, kind, data, created_at FROM events "
+                "WHERE job_id = ? AND id > ? ORDER BY id LIMIT ?", (job_id, after_id, limit)).fetchall()
+        return [Event(r[0], r[1], r[2], json.loads(r[3]), r[4]) for r in rows]
+
+    def subscribe(self, job_id: int, after_id: int = 0, poll_interval: float = JOB_TOKEN_FLUSH_SECONDS,
+                  timeout: Optional[float] = None) -> Iterator[Event]:
+        """
+        Yield the job's events after `after_id` as they are published, ending
+        with its "done" or "error" event. Pass `after_id=0` to replay from the start.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            batch = self.events(job_id, after_id)
+            for event in batch:
+                after_id = event.id
+                yield event
+                if event.kind in ("done", "error"):
+                    return
+            if not batch:
+                job = self.get(job_id)
+                if job is None or job.status in TERMINAL_STATUSES:
+                    return
+                if deadline is not None and time.monotonic() >= deadline:
+                    return
+                time.sleep(poll_interval)
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_queue() -> JobQueue:
+    """The process-wide JobQueue on JOBS_DB_PATH."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue(JOBS_DB_PATH)
+    return _queue
+
+
+# === WORKER SIDE ===
+
+def stream_events(mode: str, data: Any) -> List[Tuple[str, Dict[str, Any]]]:
+    """Translate one `graph.stream` item into (kind, data) progress events."""
+    if mode == "custom":
+        if isinstance(data, dict) and data.get("step"):
+            return [("step", {"step": data["step"]})]
+        if isinstance(data, dict) and data.get("report_token"):
+            return [("token", {"source": "report_writer_skill", "text": data["report_token"]})]
+        return []
+    if mode == "messages":
+        chunk, _metadata = data
+        if (chunk.type == "AIMessageChunk" and isinstance(chunk.content, str)
+                and chunk.content and not chunk.tool_call_chunks):
+            return [("token", {"source": chunk.id, "text": chunk.content})]
+        return []
+    if not isinstance(data, dict) or not data.get("messages"):
+        return []
+    msg = data["messages"][-1]
+    if getattr(msg, "tool_calls", None):
+        return [("tool", {"name": tc.get("name", "tool")}) for tc in msg.tool_calls]
+    if msg.type == "ai" and msg.content:
+        return [("message", {"text": msg.content})]
+    return []
+
+
+class _EventBuffer:
+    """Publishes events for one job, merging consecutive tokens from the same source."""
+
+    def __init__(self, queue: JobQueue, job: Job):
+        self.queue = queue
+        self.job = job
+        self._token: Optional[Dict[str, Any]] = None
+        self._since = 0.0
+        self._last_message: Optional[str] = None
+
+    def add(self, kind: str, data: Dict[str, Any]) -> None:
+        if kind == "token":
+            if self._token is not None and self._token["source"] != data["source"]:
+                self.flush()
+            if self._token is None:
+                self._token, self._since = dict(data), time.monotonic()
+            else:
+                self._token["text"] += data["text"]
+            if time.monotonic() - self._since >= JOB_TOKEN_FLUSH_SECONDS:
+                self.flush()
+            return
+        if kind == "message":
+            # "values" repeats the last message on every state update
+            if data["text"] == self._last_message:
+                return
+            self._last_message = data["text"]
+        self.flush()
+        self.queue.publish(self.job.id, kind, data)
+
+    def flush(self) -> None:
+        if self._token is not None:
+            self.queue.publish(self.job.id, "token", self._token)
+            self._token = None
+
+
+def run_job(queue: JobQueue, job: Job, graph) -> None:
+    """Run one claimed job to completion, publishing its progress. Never raises."""
+    from runtime import get_runtime
+
+    runtime = get_runtime()
+    runtime.record_thread(job.thread_id, job.topic, RUNNING)
+    config = {"configurable": {"thread_id": job.thread_id}, "recursion_limit": JOB_RECURSION_LIMIT}
+    events = _EventBuffer(queue, job)
+    stop_heartbeat = threading.Event()
+
+    def beat():
+        while not stop_heartbeat.wait(JOB_HEARTBEAT_SECONDS):
+            queue.heartbeat(job.id)
+
+    threading.Thread(target=beat, name=f"job-{job.id}-heartbeat", daemon=True).start()
+    try:
+        # A retried job continues from its last checkpoint instead of starting over
+        resume = job.attempts > 1 and bool(graph.get_state(config).next)
+        events.add("started", {"attempt": job.attempts, "resumed": resume})
+        stream_input = None if resume else {"messages": [("user", job.topic)]}
+        final_text = ""
+        for _namespace, mode, data in graph.stream(stream_input, config, stream_mode=STREAM_MODES, subgraphs=True):
+            for kind, payload in stream_events(mode, data):
+                if kind == "message":
+                    final_text = payload["text"]
+                events.add(kind, payload)
+        events.flush()
+        # Publish before completing, so a subscriber that sees the terminal status has the event too
+        queue.publish(job.id, "done", {"report": final_text})
+        queue.complete(job.id, final_text)
+        runtime.record_thread(job.thread_id, status=DONE)
+    except Exception as e:
+        logger.warning(f"⚠️ Job {job.id} failed: {e}")
+        events.flush()
+        queue.publish(job.id, "error", {"error": str(e)})
+        queue.fail(job.id, str(e))
+        runtime.record_thread(job.thread_id, status=FAILED)
+    finally:
+        stop_heartbeat.set()
+
+
+def worker_loop(db_path: str, worker: str, stop, poll_interval: float = JOB_POLL_INTERVAL) -> None:
+    """Claim and run jobs until `stop` (a threading or multiprocessing Event) is set."""
+    from runtime import get_runtime
+
+    queue = JobQueue(db_path)
+    runtime = get_runtime()
+    logger.info(f"Worker {worker} polling {db_path}.")
+    while not stop.is_set():
+        job = queue.claim(worker)
+        if job is None:
+            queue.requeue_stale()
+            stop.wait(poll_interval)
+            continue
+        logger.info(f"Worker {worker} running job {job.id} (thread {job.thread_id}).")
+        run_job(queue, job, runtime.get_graph(job.mode))
+    queue.close()
+
+
+def _worker_main(db_path: str, worker: str, stop) -> None:
+    logging.basicConfig(level=logging.INFO, format=f"[{worker}] %(message)s")
+    try:
+        worker_loop(db_path, worker, stop)
+    except KeyboardInterrupt:
+        pass
+
+
+class WorkerPool:
+    """
+    `workers` separate processes running `worker_loop`. Spawned rather than
+    forked, so each one builds its own clients, pools and graph.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, db_path: str = JOBS_DB_PATH):
+        self.workers = workers
+        self.db_path = db_path
+        self._ctx = multiprocessing.get_context("spawn")
+        self._stop = self._ctx.Event()
+        self._processes: List[Any] = []
+
+    def start(self) -> "WorkerPool":
+        host = socket.gethostname()
+        for i in range(self.workers):
+            process = self._ctx.Process(target=_worker_main, args=(self.db_path, f"{host}-{os.getpid()}-{i}", self._stop),
+                                        name=f"report-worker-{i}", daemon=True)
+            process.start()
+            self._processes.append(process)
+        return self
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Let workers finish their current job, then terminate any that are still busy."""
+        self._stop.set()
+        deadline = time.monotonic() + timeout
+        for process in self._processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                # Its job stays "running" until requeue_stale() hands it to another worker
+                process.terminate()
+        self._processes = []
+
+    def __enter__(self) -> "WorkerPool":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=JOBS_DB_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+    worker = commands.add_parser("worker", help="run a pool of worker processes")
+    worker.add_argument("--workers", type=int, default=JOB_WORKERS)
+    enqueue = commands.add_parser("enqueue", help="queue a report topic")
+    enqueue.add_argument("topic")
+    enqueue.add_argument("--thread-id", default=None)
+    enqueue.add_argument("--mode", default=None, choices=("react", "pipeline"))
+    follow = commands.add_parser("follow", help="print a thread's latest job events")
+    follow.add_argument("thread_id")
+    commands.add_parser("status", help="job counts by status")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.command == "worker":
+        pool = WorkerPool(args.workers, args.db).start()
+        print(f"Started {args.workers} worker(s) on {args.db}. Ctrl+C to stop.")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print("Stopping workers (finishing current jobs)...")
+            pool.stop()
+        return
+
+    queue = JobQueue(args.db)
+    if args.command == "enqueue":
+        job = queue.enqueue(args.topic, thread_id=args.thread_id, mode=args.mode)
+        print(f"Queued job {job.id} on thread {job.thread_id}")
+    elif args.command == "follow":
+        job = queue.latest_job(args.thread_id)
+        if job is None:
+            raise SystemExit(f"No job for thread {args.thread_id}")
+        for event in queue.subscribe(job.id):
+            text = event.data.get("text") if event.kind == "token" else json.dumps(event.data)
+            print(f"[{event.kind}] {text}", flush=True)
+    else:
+        print(json.dumps(queue.stats()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# llm_adapter.py
+"""
+Provider adapters for chat-completion SDKs.
+
+Everything that used to be worked out again on every call is settled once
+here. The token-limit keyword an SDK accepts is found by inspecting its
+`create` signature once per SDK class. The fixed part of each request
+(the system message) is prebuilt. The accessor that pulls text out of a
+response is probed once per response type and then reused, with a typed
+fast path for the Groq SDK's own ChatCompletion.
+"""
+import inspect
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_adapters: Dict[tuple, "ChatCompletionsAdapter"] = {}
+_extractors: Dict[type, Callable[[Any], str]] = {}
+_sdk_types_registered = False
+_lock = threading.Lock()
+
+
+def detect_token_param(func) -> Optional[str]:
+    """
+    Which keyword `func` takes for the completion token limit
+    (`max_output_tokens` or `max_tokens`), or None if neither.
+    """
+    try:
+        params = inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return None
+    if "max_output_tokens" in params:
+        return "max_output_tokens"
+    if "max_tokens" in params:
+        return "max_tokens"
+    return None
+
+
+# Response shapes seen across SDK versions, in the order they are tried
+_SHAPES = (
+    lambda r: r.choices[0].message.content,
+    lambda r: r.choices[0].text,
+    lambda r: r.output[0].content[0].text,
+)
+
+
+def _probe(resp: Any) -> Optional[Callable[[Any], str]]:
+    for shape in _SHAPES:
+        try:
+            shape(resp)
+            return shape
+        except Exception:
+            continue
+    return None
+
+
+def extract_text(resp: Any) -> str:
+    """Generated text from a completion response, using the accessor learned for its type."""
+    extractor = _extractors.get(type(resp))
+    if extractor is not None:
+        try:
+            return extractor(resp)
+        except Exception:
+            pass  # same type, unusual instance: fall through to probing
+    shape = _probe(resp)
+    if shape is None:
+        try:
+            return str(resp)
+        except Exception as e:
+            return f"[error extracting text: {e}]"
+    if extractor is None:
+        _extractors[type(resp)] = shape
+    return shape(resp)
+
+
+def extract_delta(chunk: Any) -> str:
+    """Text carried by one streamed completion chunk (empty for role/finish chunks)."""
+    try:
+        return chunk.choices[0].delta.content or ""
+    except (AttributeError, IndexError, TypeError):
+        return ""
+
+
+def usage_tokens(resp: Any) -> Optional[int]:
+    total = getattr(getattr(resp, "usage", None), "total_tokens", None)
+    return total if isinstance(total, int) else None
+
+
+class ChatCompletionsAdapter:
+    """Request builder for an OpenAI-style `chat.completions.create` endpoint."""
+
+    def __init__(self, create_func, system_message: str):
+        self.token_param = detect_token_param(create_func)
+        self._system = {"role": "system", "content": system_message}
+
+    def payload(self, prompt: str, model: str, temperature: float,
+                max_tokens: Optional[int], stream: bool = False) -> dict:
+        payload = {
+            "model": model,
+            "messages": [self._system, {"role": "user", "content": prompt}],
+            "temperature": float(temperature),
+        }
+        # Add token param only if the SDK supports one
+        if max_tokens is not None and self.token_param:
+            payload[self.token_param] = int(max_tokens)
+        if stream:
+            payload["stream"] = True
+        return payload
+
+
+def adapter_for(client: Any, system_message: str) -> ChatCompletionsAdapter:
+    """The adapter for `client`'s SDK, built on first use and shared by every client of that class."""
+    completions = client.chat.completions
+    key = (type(completions), system_message)
+    adapter = _adapters.get(key)
+    if adapter is None:
+        with _lock:
+            adapter = _adapters.get(key)
+            if adapter is None:
+                if not _sdk_types_registered:
+                    _register_sdk_types()
+                adapter = _adapters[key] = ChatCompletionsAdapter(completions.create, system_message)
+                logger.debug(f"Adapter for {key[0].__name__}: token param {adapter.token_param!r}")
+    return adapter
+
+
+def _register_sdk_types() -> None:
+    """
+    Typed extractors for SDK response classes, so they never need probing.
+    Registered with the first adapter rather than at import, when the SDK is
+    loaded anyway.
+    """
+    global _sdk_types_registered
+    _sdk_types_registered = True
+    try:
+        from groq.types.chat import ChatCompletion
+    except ImportError:
+        return
+    _extractors[ChatCompletion] = lambda r: r.choices[0].message.content
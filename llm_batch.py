@@ -0,0 +1,225 @@
+# llm_batch.py
+"""
+Offline provider batch backend for non-interactive runs.
+
+For overnight jobs throughput and price matter more than latency. While
+batch mode is on (`groq_client.use_batch_backend()`), completion requests
+from every waiting report are collected into a BatchCollector instead of
+being sent one by one. The collector writes them into a JSONL batch file,
+uploads it to the provider's Batch API, polls until the batch is done, and
+hands each result back to the thread or task that asked for it.
+
+A batch is flushed once it holds LLM_BATCH_MAX_REQUESTS requests, or
+LLM_BATCH_FLUSH_SECONDS after its first request arrived, whichever comes
+first. `fake_batch_server.py` implements the same endpoints locally for
+tests and dry runs.
+"""
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LLM_BATCH_MAX_REQUESTS = int(os.getenv("LLM_BATCH_MAX_REQUESTS", "500"))
+LLM_BATCH_FLUSH_SECONDS = float(os.getenv("LLM_BATCH_FLUSH_SECONDS", "5"))
+LLM_BATCH_POLL_SECONDS = float(os.getenv("LLM_BATCH_POLL_SECONDS", "30"))
+LLM_BATCH_COMPLETION_WINDOW = os.getenv("LLM_BATCH_COMPLETION_WINDOW", "24h")
+BATCH_ENDPOINT = "/v1/chat/completions"
+FAILED_STATUSES = ("failed", "expired", "cancelled")
+
+
+class BatchJobError(RuntimeError):
+    """A request (or its whole batch) did not produce a completion."""
+
+
+def completion_text(body: Dict[str, Any]) -> str:
+    """Generated text from a chat-completion body in a batch output line."""
+    return body["choices"][0]["message"]["content"]
+
+
+class GroqBatchBackend:
+    """Batch API calls through a Groq SDK client (`files` and `batches` resources)."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def submit(self, lines: List[dict]) -> str:
+        data = "\n".join(json.dumps(line) for line in lines).encode("utf-8")
+        upload = self.client.files.create(file=("requests.jsonl", data), purpose="batch")
+        batch = self.client.batches.create(input_file_id=upload.id, endpoint=BATCH_ENDPOINT,
+                                           completion_window=LLM_BATCH_COMPLETION_WINDOW)
+        return batch.id
+
+    def status(self, batch_id: str) -> Tuple[str, Optional[str], Optional[str]]:
+        """(status, output_file_id, error_file_id) of a submitted batch."""
+        batch = self.client.batches.retrieve(batch_id)
+        return batch.status, batch.output_file_id, batch.error_file_id
+
+    def results(self, file_id: str) -> Iterator[dict]:
+        for line in self.client.files.content(file_id).text().splitlines():
+            if line.strip():
+                yield json.loads(line)
+
+
+class BatchCollector:
+    """
+    Collects chat-completion request bodies and resolves a Future for each.
+
+    One background thread does all provider traffic. It flushes the pending
+    requests as a batch when the batch is full or has waited long enough, and
+    it polls submitted batches every `poll_seconds`.
+    """
+
+    def __init__(self, backend, max_requests: int = LLM_BATCH_MAX_REQUESTS,
+                 flush_seconds: float = LLM_BATCH_FLUSH_SECONDS,
+                 poll_seconds: float = LLM_BATCH_POLL_SECONDS):
+        self.backend = backend
+        self.max_requests = max_requests
+        self.flush_seconds = flush_seconds
+        self.poll_seconds = poll_seconds
+        self._pending: List[Tuple[str, dict, Future]] = []
+        self._first_pending_at = 0.0
+        self._submitted: Dict[str, Dict[str, Future]] = {}
+        self._ids = itertools.count()
+        self._cond = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._closed = False
+        self._stats = {"requests": 0, "batches": 0, "completed": 0, "failed": 0}
+
+    def submit(self, body: dict) -> Future:
+        """Queue one `/v1/chat/completions` request body; the Future resolves to the response body."""
+        future: Future = Future()
+        with self._cond:
+            if self._closed:
+                raise BatchJobError("batch collector is closed")
+            if not self._pending:
+                self._first_pending_at = time.monotonic()
+            self._pending.append((f"req-{next(self._ids)}", body, future))
+            self._stats["requests"] += 1
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="llm-batch", daemon=True)
+                self._worker.start()
+            self._cond.notify_all()
+        return future
+
+    def _take_due(self, now: float) -> List[Tuple[str, dict, Future]]:
+        if not self._pending:
+            return []
+        if len(self._pending) < self.max_requests and now - self._first_pending_at < self.flush_seconds:
+            return []
+        due, self._pending = self._pending[:self.max_requests], self._pending[self.max_requests:]
+        self._first_pending_at = now
+        return due
+
+    def _run(self) -> None:
+        next_poll = 0.0
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        return
+                    now = time.monotonic()
+                    due = self._take_due(now)
+                    poll = bool(self._submitted) and now >= next_poll
+                    if due or poll:
+                        break
+                    waits = []
+                    if self._pending:
+                        waits.append(self._first_pending_at + self.flush_seconds - now)
+                    if self._submitted:
+                        waits.append(next_poll - now)
+                    self._cond.wait(timeout=max(0.0, min(waits)) if waits else None)
+            if due:
+                self._send(due)
+            if poll:
+                self._poll()
+                next_poll = time.monotonic() + self.poll_seconds
+
+    def _send(self, requests: List[Tuple[str, dict, Future]]) -> None:
+        lines = [{"custom_id": cid, "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+                 for cid, body, _ in requests]
+        try:
+            batch_id = self.backend.submit(lines)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not submit batch of {len(lines)} requests: {e}")
+            for _, _, future in requests:
+                future.set_exception(BatchJobError(f"batch submission failed: {e}"))
+            return
+        with self._cond:
+            self._submitted[batch_id] = {cid: future for cid, _, future in requests}
+            self._stats["batches"] += 1
+        logger.info(f"Submitted batch {batch_id} with {len(lines)} requests.")
+
+    def _poll(self) -> None:
+        with self._cond:
+            submitted = list(self._submitted.items())
+        for batch_id, futures in submitted:
+            try:
+                status, output_file, error_file = self.backend.status(batch_id)
+                if status == "completed":
+                    self._collect(futures, output_file, error_file)
+                elif status in FAILED_STATUSES:
+                    self._fail(futures, f"batch {batch_id} {status}")
+                else:
+                    continue
+            except Exception as e:
+                # Transient API errors: try again on the next poll
+                logger.warning(f"⚠️ Could not poll batch {batch_id}: {e}")
+                continue
+            with self._cond:
+                self._submitted.pop(batch_id, None)
+
+    def _collect(self, futures: Dict[str, Future], output_file: Optional[str],
+                 error_file: Optional[str]) -> None:
+        for file_id in (output_file, error_file):
+            if not file_id:
+                continue
+            for line in self.backend.results(file_id):
+                future = futures.pop(line.get("custom_id"), None)
+                if future is None or future.done():
+                    continue
+                response = line.get("response") or {}
+                # Counted before resolving, so a caller that wakes up sees its own request in stats()
+                if response.get("status_code") == 200 and response.get("body"):
+                    self._count("completed")
+                    future.set_result(response["body"])
+                else:
+                    error = line.get("error") or (response.get("body") or {}).get("error") or response
+                    self._count("failed")
+                    future.set_exception(BatchJobError(f"request failed in batch: {error}"))
+        self._fail(futures, "missing from batch output")
+
+    def _fail(self, futures: Dict[str, Future], reason: str) -> None:
+        for future in futures.values():
+            if future.done():  # already failed by close()
+                continue
+            self._count("failed")
+            future.set_exception(BatchJobError(reason))
+        futures.clear()
+
+    def _count(self, field: str) -> None:
+        with self._cond:
+            self._stats[field] += 1
+
+    def stats(self) -> dict:
+        with self._cond:
+            return dict(self._stats, pending=len(self._pending),
+                        in_flight=sum(len(f) for f in self._submitted.values()),
+                        open_batches=len(self._submitted))
+
+    def close(self) -> None:
+        """Stop the worker and fail every request that has not completed yet."""
+        with self._cond:
+            self._closed = True
+            pending, self._pending = self._pending, []
+            submitted, self._submitted = self._submitted, {}
+            self._cond.notify_all()
+        for _, _, future in pending:
+            future.set_exception(BatchJobError("batch collector closed"))
+        for futures in submitted.values():
+            self._fail(futures, "batch collector closed")
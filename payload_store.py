@@ -0,0 +1,321 @@
+# payload_store.py
+"""
+Content-addressed side table for large checkpoint payloads.
+
+Search dumps and report drafts end up inside ToolMessages and state fields,
+and every later checkpoint of the thread serializes them again. With
+CHECKPOINT_PAYLOADS=1 the checkpointers are given a PayloadSerializer. It
+moves every string of CHECKPOINT_PAYLOAD_MIN_CHARS or more into a PayloadStore,
+keyed by the sha256 of the text and zstd-compressed, and leaves a short
+reference in the checkpoint. A payload repeated in 20 checkpoints is
+stored once.
+
+References are resolved only when a checkpoint or write is actually loaded,
+through a small in-process LRU. Payloads that no checkpoint refers to any
+more are removed by `compaction.py`.
+
+The store is a SQLite file on the local host, so enable it only where every
+process that reads the checkpointer also shares that file.
+"""
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from langchain_core.messages import BaseMessage
+
+try:
+    import zstandard
+except ImportError:  # payloads are stored uncompressed without it
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_PAYLOADS = os.getenv("CHECKPOINT_PAYLOADS", "0") == "1"
+CHECKPOINT_PAYLOAD_PATH = os.getenv("CHECKPOINT_PAYLOAD_PATH", "checkpoint_payloads.db")
+CHECKPOINT_PAYLOAD_MIN_CHARS = int(os.getenv("CHECKPOINT_PAYLOAD_MIN_CHARS", "2048"))
+ZSTD_LEVEL = 3
+PAYLOAD_CACHE_ENTRIES = 256
+# A payload reused by a new checkpoint has its touched_at refreshed at most this often
+PAYLOAD_TOUCH_SECONDS = 60.0
+
+# Strings of this form in a serialized checkpoint stand for a stored payload
+REF_PREFIX = "\x00payload:sha256:"
+REF_PATTERN = re.compile(re.escape(REF_PREFIX.encode()) + rb"([0-9a-f]{64})")
+# Appended to the inner serializer's type tag when the data holds references
+TYPE_SUFFIX = "+payloads"
+MESSAGE_FIELDS = ("content", "tool_calls", "additional_kwargs")
+
+
+def payload_digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def references(data: bytes) -> Set[str]:
+    """Payload digests referenced from serialized checkpoint bytes."""
+    return {m.decode() for m in REF_PATTERN.findall(data or b"")}
+
+
+class PayloadStore:
+    """
+    Payload texts in a SQLite file, keyed by their sha256 and compressed with
+    zstd when it is installed. Safe to share across threads; processes share
+    the file.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_PAYLOAD_PATH, level: int = ZSTD_LEVEL,
+                 cache_entries: int = PAYLOAD_CACHE_ENTRIES):
+        self.path = path
+        self.level = level
+        self.cache_entries = cache_entries
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        # text -> (digest, monotonic time it was last written or touched by this process).
+        # Keyed by the text itself: str hashes are cached, so a repeated payload skips sha256.
+        self._known: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._stats = {"stored": 0, "deduped": 0, "bytes_in": 0, "bytes_stored": 0,
+                       "loads": 0, "cache_hits": 0, "missing": 0}
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS payloads ("
+                "digest TEXT PRIMARY KEY, codec TEXT NOT NULL, data BLOB NOT NULL, size INTEGER NOT NULL, "
+                "stored_size INTEGER NOT NULL, created_at REAL NOT NULL, touched_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS payloads_touched_idx ON payloads(touched_at)")
+            self._conn.commit()
+
+    def _remember(self, digest: str, text: str, touched: bool = True) -> None:
+        """Caller holds the lock."""
+        self._cache[digest] = text
+        self._cache.move_to_end(digest)
+        while len(self._cache) > self.cache_entries:
+            self._cache.popitem(last=False)
+        if not touched:
+            return
+        self._known[text] = (digest, time.monotonic())
+        self._known.move_to_end(text)
+        while len(self._known) > self.cache_entries:
+            self._known.popitem(last=False)
+
+    def put(self, text: str) -> str:
+        """Store `text` (once) and return its digest."""
+        with self._lock:
+            seen = self._known.get(text)
+            if seen is not None and time.monotonic() - seen[1] < PAYLOAD_TOUCH_SECONDS:
+                self._stats["deduped"] += 1
+                self._known.move_to_end(text)
+                return seen[0]
+        digest = seen[0] if seen is not None else payload_digest(text)
+        now = time.time()
+        with self._lock:
+            raw = text.encode("utf-8")
+            touched = self._conn.execute("UPDATE payloads SET touched_at = ? WHERE digest = ?", (now, digest))
+            if touched.rowcount:
+                self._stats["deduped"] += 1
+            else:
+                if zstandard is not None:
+                    codec, data = "zstd", zstandard.ZstdCompressor(level=self.level).compress(raw)
+                else:
+                    codec, data = "raw", raw
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO payloads (digest, codec, data, size, stored_size, created_at, touched_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", (digest, codec, data, len(raw), len(data), now, now))
+                self._stats["stored"] += 1
+                self._stats["bytes_in"] += len(raw)
+                self._stats["bytes_stored"] += len(data)
+            self._conn.commit()
+            self._remember(digest, text)
+        return digest
+
+    def get(self, digest: str) -> Optional[str]:
+        """The text stored under `digest`, or None if it is not in the store."""
+        with self._lock:
+            self._stats["loads"] += 1
+            text = self._cache.get(digest)
+            if text is not None:
+                self._stats["cache_hits"] += 1
+                self._cache.move_to_end(digest)
+                return text
+            row = self._conn.execute("SELECT codec, data FROM payloads WHERE digest = ?", (digest,)).fetchone()
+            if row is None:
+                self._stats["missing"] += 1
+                return None
+            codec, data = row
+            if codec == "zstd":
+                if zstandard is None:
+                    raise RuntimeError("checkpoint payload is zstd-compressed but zstandard is not installed")
+                data = zstandard.ZstdDecompressor().decompress(data)
+            text = bytes(data).decode("utf-8")
+            self._remember(digest, text, touched=False)
+            return text
+
+    def sweep(self, referenced: Set[str], older_than: float) -> Tuple[int, int]:
+        """
+        Delete payloads outside `referenced` that were last written or reused
+        before the unix time `older_than`. Returns (payloads, bytes) removed.
+        """
+        removed = size = 0
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT digest, stored_size FROM payloads WHERE touched_at < ?", (older_than,)).fetchall()
+            for digest, stored_size in rows:
+                if digest in referenced:
+                    continue
+                self._conn.execute("DELETE FROM payloads WHERE digest = ? AND touched_at < ?", (digest, older_than))
+                self._cache.pop(digest, None)
+                removed, size = removed + 1, size + stored_size
+            if removed:
+                self._known.clear()
+            self._conn.commit()
+        return removed, size
+
+    def stats(self) -> dict:
+        """Process-local counters plus the current on-disk footprint."""
+        with self._lock:
+            entries, size, stored = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) FROM payloads"
+            ).fetchone()
+            return dict(self._stats, entries=entries, size_bytes=size, stored_bytes=stored)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class PayloadSerializer:
+    """
+    Checkpoint serializer (`dumps_typed` / `loads_typed`) that wraps the
+    saver's usual JsonPlusSerializer and swaps long strings for references
+    into a PayloadStore. It walks dicts, lists, tuples and the content, tool
+    calls and kwargs of LangChain messages, and never changes the objects it
+    is given. Data without references keeps the inner serializer's format, so
+    existing checkpoints still load.
+    """
+
+    def __init__(self, store: PayloadStore, inner=None, min_chars: int = CHECKPOINT_PAYLOAD_MIN_CHARS):
+        if inner is None:
+            from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+            inner = JsonPlusSerializer()
+        self.store = store
+        self.inner = inner
+        self.min_chars = min_chars
+        # id(message) -> (its fields when walked, the message with references, their digests).
+        # Entries are dropped when the message is garbage collected.
+        self._slim: Dict[int, tuple] = {}
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        refs: List[str] = []
+        slim = self._extract(obj, refs)
+        type_, data = self.inner.dumps_typed(slim)
+        return (type_ + TYPE_SUFFIX, data) if refs else (type_, data)
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, raw = data
+        if not type_.endswith(TYPE_SUFFIX):
+            return self.inner.loads_typed(data)
+        return self._rehydrate(self.inner.loads_typed((type_[:-len(TYPE_SUFFIX)], raw)))
+
+    def _extract(self, value: Any, refs: List[str]) -> Any:
+        if isinstance(value, str):
+            if len(value) < self.min_chars or value.startswith(REF_PREFIX):
+                return value
+            refs.append(self.store.put(value))
+            return REF_PREFIX + refs[-1]
+        if isinstance(value, BaseMessage):
+            fields = tuple(getattr(value, field, None) for field in MESSAGE_FIELDS)
+            cached = self._slim.get(id(value))
+            # State messages are shared across checkpoints, so each is usually walked once
+            if cached is not None and all(a is b for a, b in zip(cached[0], fields)):
+                refs.extend(cached[2])
+                return cached[1] or value
+            found: List[str] = []
+            updates = {}
+            for field, current in zip(MESSAGE_FIELDS, fields):
+                if current is not None:
+                    slim = self._extract(current, found)
+                    if slim is not current:
+                        updates[field] = slim
+            slim_message = value.model_copy(update=updates) if updates else None
+            if id(value) not in self._slim:
+                weakref.finalize(value, self._slim.pop, id(value), None)
+            # None (not the message itself) when unchanged, so the cache never keeps a message alive
+            self._slim[id(value)] = (fields, slim_message, found)
+            refs.extend(found)
+            return slim_message or value
+        if type(value) is dict:
+            copy = None
+            for key, item in value.items():
+                slim = self._extract(item, refs)
+                if slim is not item:
+                    copy = copy if copy is not None else dict(value)
+                    copy[key] = slim
+            return value if copy is None else copy
+        if type(value) in (list, tuple):
+            items = [self._extract(item, refs) for item in value]
+            if all(a is b for a, b in zip(items, value)):
+                return value
+            return type(value)(items)
+        return value
+
+    def _rehydrate(self, value: Any) -> Any:
+        """Resolve references in freshly loaded data, in place where it is mutable."""
+        if isinstance(value, str):
+            if not value.startswith(REF_PREFIX):
+                return value
+            digest = value[len(REF_PREFIX):]
+            text = self.store.get(digest)
+            if text is None:
+                logger.warning(f"⚠️ Checkpoint payload {digest[:12]} is missing from {self.store.path}")
+                return f"[error: checkpoint payload {digest[:12]} missing]"
+            return text
+        if isinstance(value, BaseMessage):
+            for field in MESSAGE_FIELDS:
+                current = getattr(value, field, None)
+                if current is not None:
+                    resolved = self._rehydrate(current)
+                    if resolved is not current:
+                        setattr(value, field, resolved)
+            return value
+        if isinstance(value, dict):
+            for key, item in value.items():
+                value[key] = self._rehydrate(item)
+            return value
+        if isinstance(value, list):
+            value[:] = [self._rehydrate(item) for item in value]
+            return value
+        if type(value) is tuple:
+            return tuple(self._rehydrate(item) for item in value)
+        return value
+
+
+_store: Optional[PayloadStore] = None
+_store_lock = threading.Lock()
+
+
+def get_payload_store() -> PayloadStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PayloadStore(CHECKPOINT_PAYLOAD_PATH)
+    return _store
+
+
+def checkpoint_serde():
+    """Serializer for new checkpointers: a PayloadSerializer when CHECKPOINT_PAYLOADS=1, else None (the default)."""
+    if not CHECKPOINT_PAYLOADS:
+        return None
+    return PayloadSerializer(get_payload_store())
+
@@ -0,0 +1,289 @@
+# provider_router.py
+"""
+Latency-aware routing between LLM providers.
+
+A ProviderRouter runs one logical completion against an ordered set of
+providers. The preferred provider goes first. If it has not answered by its
+learned p95 latency for this kind of call, a hedged request goes to the next
+provider, and whichever succeeds first wins. A provider that fails outright
+hands over immediately instead of waiting for the deadline.
+
+Latency and error outcomes are tracked per provider. A provider whose recent
+error rate or median latency marks it as degraded is moved to the back of the
+order, so traffic routes around it before it times out.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+HEDGE_ENABLED = os.getenv("LLM_HEDGE", "1") == "1"
+# Deadline before the first HEDGE_MIN_SAMPLES latencies for a call type are known
+HEDGE_INITIAL_DELAY = float(os.getenv("HEDGE_INITIAL_DELAY", "10"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.5"))
+HEDGE_MAX_DELAY = float(os.getenv("HEDGE_MAX_DELAY", "30"))
+HEDGE_QUANTILE = 0.95
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+# A provider is degraded when at least DEGRADED_MIN_SAMPLES of its last
+# OUTCOME_WINDOW calls gave an error rate >= DEGRADED_ERROR_RATE, or its
+# median latency is DEGRADED_LATENCY_RATIO times that of the next provider.
+# Outcomes older than OUTCOME_MAX_AGE seconds are ignored, so a provider that
+# was routed around gets traffic (and a chance to recover) again.
+OUTCOME_WINDOW = 20
+OUTCOME_MAX_AGE = 120.0
+DEGRADED_MIN_SAMPLES = 5
+DEGRADED_ERROR_RATE = 0.5
+DEGRADED_LATENCY_RATIO = 3.0
+
+
+def is_error(value: Any) -> bool:
+    """Provider helpers report failures as "[error: ...]" strings rather than raising."""
+    return isinstance(value, str) and value.startswith("[error")
+
+
+def _quantile(samples: Sequence[float], q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ProviderStats:
+    """Rolling latency and outcome windows for one provider."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.cancelled = 0
+        self.outcomes: Deque[Tuple[float, bool]] = deque(maxlen=OUTCOME_WINDOW)
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.latencies_by_key: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+
+    def record(self, key: str, ok: bool, latency: float) -> None:
+        self.calls += 1
+        self.outcomes.append((time.monotonic(), ok))
+        if ok:
+            self.latencies.append(latency)
+            self.latencies_by_key[key].append(latency)
+        else:
+            self.errors += 1
+
+    def recent_outcomes(self) -> List[bool]:
+        cutoff = time.monotonic() - OUTCOME_MAX_AGE
+        return [ok for at, ok in self.outcomes if at >= cutoff]
+
+    def error_rate(self) -> float:
+        recent = self.recent_outcomes()
+        return (recent.count(False) / len(recent)) if recent else 0.0
+
+    def snapshot(self) -> dict:
+        latencies = list(self.latencies)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "error_rate": round(self.error_rate(), 3),
+            "p50": _quantile(latencies, 0.5),
+            "p95": _quantile(latencies, 0.95),
+            "p99": _quantile(latencies, 0.99),
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "cancelled": self.cancelled,
+        }
+
+
+class ProviderRouter:
+    """
+    Races a completion across `providers` (in preference order).
+
+    `run()` takes a mapping of provider name to a zero-argument callable and
+    returns `(result, provider_name)`; `arun()` does the same with coroutine
+    functions and cancels the losing task. `key` groups calls of similar size
+    (e.g. model and max_tokens) so each gets its own learned deadline.
+    """
+
+    def __init__(self, providers: Sequence[str], hedge: bool = HEDGE_ENABLED,
+                 initial_delay: float = HEDGE_INITIAL_DELAY,
+                 min_delay: float = HEDGE_MIN_DELAY, max_delay: float = HEDGE_MAX_DELAY):
+        self.providers = list(providers)
+        self.hedge = hedge
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self._stats = {name: ProviderStats() for name in self.providers}
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-route")
+            return self._pool
+
+    def _degraded(self, name: str, other: Optional[str]) -> bool:
+        stats = self._stats[name]
+        if len(stats.recent_outcomes()) >= DEGRADED_MIN_SAMPLES and stats.error_rate() >= DEGRADED_ERROR_RATE:
+            return True
+        if other is None:
+            return False
+        mine, theirs = _quantile(stats.latencies, 0.5), _quantile(self._stats[other].latencies, 0.5)
+        return (len(stats.latencies) >= DEGRADED_MIN_SAMPLES and mine is not None and theirs is not None
+                and mine > DEGRADED_LATENCY_RATIO * theirs)
+
+    def order(self, available: Sequence[str]) -> List[str]:
+        """Preference order for this call, with degraded providers moved last."""
+        names = [p for p in self.providers if p in available]
+        with self._lock:
+            healthy, degraded = [], []
+            for i, name in enumerate(names):
+                other = names[i + 1] if i + 1 < len(names) else None
+                (degraded if self._degraded(name, other) else healthy).append(name)
+        return healthy + degraded
+
+    def hedge_delay(self, name: str, key: str) -> Optional[float]:
+        """Seconds to wait on `name` before hedging: its learned p95 for `key`, clamped."""
+        if not self.hedge:
+            return None
+        with self._lock:
+            samples = list(self._stats[name].latencies_by_key.get(key, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return self.initial_delay
+        return min(self.max_delay, max(self.min_delay, _quantile(samples, HEDGE_QUANTILE)))
+
+    def _record(self, name: str, key: str, ok: bool, latency: float) -> None:
+        with self._lock:
+            self._stats[name].record(key, ok, latency)
+
+    def _count(self, name: str, field: str) -> None:
+        with self._lock:
+            setattr(self._stats[name], field, getattr(self._stats[name], field) + 1)
+
+    def _timed(self, name: str, fn: Callable[[], Any], key: str) -> Tuple[bool, Any]:
+        started = time.monotonic()
+        try:
+            value = fn()
+            ok = not is_error(value)
+        except Exception as e:
+            value, ok = e, False
+        self._record(name, key, ok, time.monotonic() - started)
+        return ok, value
+
+    @staticmethod
+    def _failure(name: str, value: Any) -> str:
+        return value if is_error(value) else f"[error: {name} failed: {value}]"
+
+    def run(self, calls: Dict[str, Callable[[], Any]], key: str = "") -> Tuple[Any, str]:
+        """Run `calls` with hedging/failover; returns (first successful result, provider)."""
+        queue = self.order(list(calls))
+        pool = self._get_pool()
+        pending: Dict[Any, str] = {}
+        hedged = set()
+        failure: Tuple[str, Any] = (queue[0], None)
+
+        def launch(as_hedge: bool) -> float:
+            name = queue.pop(0)
+            if as_hedge:
+                hedged.add(name)
+                self._count(name, "hedges")
+            pending[pool.submit(self._timed, name, calls[name], key)] = name
+            return time.monotonic() + (self.hedge_delay(name, key) or 0)
+
+        deadline = launch(False)
+        while pending:
+            timeout = None
+            if queue and self.hedge:
+                timeout = max(0.0, deadline - time.monotonic())
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                logger.info(f"{pending[next(iter(pending))]} slower than its p95; hedging to {queue[0]}.")
+                deadline = launch(True)
+                continue
+            for fut in done:
+                name = pending.pop(fut)
+                ok, value = fut.result()
+                if ok:
+                    for loser in pending:
+                        # Running threads cannot be interrupted; their result is discarded
+                        loser.cancel()
+                        self._count(pending[loser], "cancelled")
+                    if name in hedged:
+                        self._count(name, "hedge_wins")
+                    return value, name
+                failure = (name, value)
+                logger.warning(f"⚠️ {name} failed: {value}.")
+            if queue and not pending:
+                logger.warning(f"⚠️ Failing over to {queue[0]}...")
+                deadline = launch(False)
+        return self._failure(*failure), failure[0]
+
+    async def _atimed(self, name: str, fn: Callable[[], Awaitable[Any]], key: str) -> Tuple[bool, Any]:
+        started = time.monotonic()
+        try:
+            value = await fn()
+            ok = not is_error(value)
+        except asyncio.CancelledError:
+            self._count(name, "cancelled")
+            raise
+        except Exception as e:
+            value, ok = e, False
+        self._record(name, key, ok, time.monotonic() - started)
+        return ok, value
+
+    async def arun(self, calls: Dict[str, Callable[[], Awaitable[Any]]], key: str = "") -> Tuple[Any, str]:
+        """Async counterpart of `run()`; the losing request's task is cancelled."""
+        queue = self.order(list(calls))
+        pending: Dict[asyncio.Task, str] = {}
+        hedged = set()
+        failure: Tuple[str, Any] = (queue[0], None)
+        loop = asyncio.get_running_loop()
+
+        def launch(as_hedge: bool) -> float:
+            name = queue.pop(0)
+            if as_hedge:
+                hedged.add(name)
+                self._count(name, "hedges")
+            pending[asyncio.ensure_future(self._atimed(name, calls[name], key))] = name
+            return loop.time() + (self.hedge_delay(name, key) or 0)
+
+        deadline = launch(False)
+        try:
+            while pending:
+                timeout = max(0.0, deadline - loop.time()) if (queue and self.hedge) else None
+                done, _ = await asyncio.wait(list(pending), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    deadline = launch(True)
+                    continue
+                for task in done:
+                    name = pending.pop(task)
+                    ok, value = task.result()
+                    if ok:
+                        if name in hedged:
+                            self._count(name, "hedge_wins")
+                        return value, name
+                    failure = (name, value)
+                    logger.warning(f"⚠️ {name} failed: {value}.")
+                if queue and not pending:
+                    logger.warning(f"⚠️ Failing over to {queue[0]}...")
+                    deadline = launch(False)
+        finally:
+            for task in pending:
+                task.cancel()
+        return self._failure(*failure), failure[0]
+
+    def stats(self) -> dict:
+        """Per-provider calls, error rate, latency quantiles and hedge counts."""
+        with self._lock:
+            snapshot = {name: stats.snapshot() for name, stats in self._stats.items()}
+        order = self.order(self.providers)
+        for name in snapshot:
+            snapshot[name]["preferred"] = bool(order) and order[0] == name
+        return snapshot
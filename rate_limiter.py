@@ -0,0 +1,318 @@
+# rate_limiter.py
+"""
+Process-wide client-side rate limiting for LLM providers.
+
+Every (provider, model) pair gets a RateLimiter holding two token buckets,
+requests-per-minute and tokens-per-minute. Callers take a place in a FIFO
+queue and are released in arrival order once both buckets can cover the
+call, so threads and async tasks share the quota fairly instead of all
+firing, hitting 429 together and backing off in lockstep.
+
+Buckets start from the configured limits and are corrected from the
+provider's `x-ratelimit-*` / `retry-after` response headers whenever a
+response passes through `response_hook()` / `async_response_hook()`.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Per-minute quotas per provider; 0 disables that bucket
+GROQ_RPM = float(os.getenv("GROQ_RPM", "30"))
+GROQ_TPM = float(os.getenv("GROQ_TPM", "8000"))
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "10"))
+GEMINI_TPM = float(os.getenv("GEMINI_TPM", "250000"))
+
+# Completion size assumed when a call does not set max_tokens
+DEFAULT_COMPLETION_TOKENS = 512
+
+_DURATION_RE = re.compile(r"(?P<value>\d+(?:\.\d+)?)(?P<unit>ms|h|m|s)")
+_UNIT_SECONDS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def estimate_tokens(prompt: str, max_tokens: Optional[int] = None) -> int:
+    """Rough request size for the TPM bucket: ~4 chars/token of prompt plus the completion cap."""
+    return len(prompt) // 4 + (max_tokens if max_tokens is not None else DEFAULT_COMPLETION_TOKENS)
+
+
+def _parse_duration(value: Optional[str]) -> Optional[float]:
+    """Seconds in a rate-limit reset header such as "7.66s", "2m59.56s", "120ms" or "30"."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    matches = list(_DURATION_RE.finditer(value))
+    if not matches:
+        return None
+    return sum(float(m.group("value")) * _UNIT_SECONDS[m.group("unit")] for m in matches)
+
+
+def _header_float(headers: Mapping[str, str], name: str) -> Optional[float]:
+    try:
+        value = headers.get(name)
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Continuously refilling bucket sized for one minute of quota."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)  # a single oversize call waits for a full bucket, not forever
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.level -= min(amount, self.capacity)
+
+    def clamp(self, remaining: float, now: float) -> None:
+        self._refill(now)
+        self.level = min(self.level, remaining)
+
+    def set_limit(self, per_minute: float, now: float) -> None:
+        self._refill(now)
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = min(self.level, self.capacity)
+
+
+class RateLimiter:
+    """
+    FIFO admission control against RPM and TPM buckets for one provider/model.
+
+    `acquire()` blocks the calling thread and `aacquire()` suspends the
+    calling task; both return the seconds spent waiting. A call that was
+    charged an estimate can settle the difference with `adjust()` once the
+    real usage is known.
+    """
+
+    def __init__(self, name: str, rpm: float = 0, tpm: float = 0):
+        self.name = name
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self._lock = threading.Lock()
+        self._turn = threading.Condition(self._lock)
+        self._queue: deque = deque()
+        self._tickets = itertools.count()
+        self._paused_until = 0.0
+        self._stats = {"granted": 0, "waited": 0, "total_wait": 0.0, "max_wait": 0.0, "throttled": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.requests is not None or self.tokens is not None
+
+    def _poll(self, ticket: int, tokens: float) -> Optional[float]:
+        """
+        With the lock held: admit `ticket` and return 0.0, or return how long
+        to wait before polling again (None when another caller is ahead).
+        """
+        if self._queue[0] != ticket:
+            return None
+        now = time.monotonic()
+        wait = self._paused_until - now
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1, now))
+        if self.tokens is not None and tokens:
+            wait = max(wait, self.tokens.wait_time(tokens, now))
+        if wait > 0:
+            return wait
+        if self.requests is not None:
+            self.requests.take(1)
+        if self.tokens is not None and tokens:
+            self.tokens.take(tokens)
+        self._queue.popleft()
+        self._turn.notify_all()
+        return 0.0
+
+    def _record(self, waited: float) -> None:
+        self._stats["granted"] += 1
+        if waited > 0.001:
+            self._stats["waited"] += 1
+            self._stats["total_wait"] += waited
+            self._stats["max_wait"] = max(self._stats["max_wait"], waited)
+
+    def _leave(self, ticket: int) -> None:
+        with self._lock:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+                self._turn.notify_all()
+
+    def acquire(self, tokens: float = 0) -> float:
+        """Block until this call may be sent. Returns the seconds waited."""
+        if not self.enabled:
+            return 0.0
+        started = time.monotonic()
+        with self._lock:
+            ticket = next(self._tickets)
+            self._queue.append(ticket)
+            try:
+                while True:
+                    wait = self._poll(ticket, tokens)
+                    if wait == 0.0:
+                        break
+                    # Waiting for our turn is woken by notify; waiting for refill is timed
+                    self._turn.wait(timeout=1.0 if wait is None else min(wait, 1.0))
+            except BaseException:
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                    self._turn.notify_all()
+                raise
+            waited = time.monotonic() - started
+            self._record(waited)
+        return waited
+
+    async def aacquire(self, tokens: float = 0) -> float:
+        """Async counterpart of `acquire()`; shares the same queue, so threads and tasks interleave fairly."""
+        if not self.enabled:
+            return 0.0
+        started = time.monotonic()
+        with self._lock:
+            ticket = next(self._tickets)
+            self._queue.append(ticket)
+        try:
+            while True:
+                with self._lock:
+                    wait = self._poll(ticket, tokens)
+                    if wait == 0.0:
+                        waited = time.monotonic() - started
+                        self._record(waited)
+                        return waited
+                await asyncio.sleep(0.01 if wait is None else min(wait, 1.0))
+        except BaseException:
+            self._leave(ticket)
+            raise
+
+    def adjust(self, tokens: float) -> None:
+        """Charge (positive) or refund (negative) the TPM bucket once actual usage is known."""
+        if self.tokens is None or not tokens:
+            return
+        with self._lock:
+            self.tokens._refill(time.monotonic())
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level - tokens)
+            self._turn.notify_all()
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """
+        Correct the buckets from provider headers: `x-ratelimit-limit-tokens`
+        resets the TPM quota, `x-ratelimit-remaining-*` caps what the buckets
+        may still hand out, and an exhausted quota or `retry-after` pauses the
+        queue until the advertised reset.
+        """
+        now = time.monotonic()
+        pause = _parse_duration(headers.get("retry-after"))
+        with self._lock:
+            limit_tokens = _header_float(headers, "x-ratelimit-limit-tokens")
+            if limit_tokens:
+                if self.tokens is None:
+                    self.tokens = TokenBucket(limit_tokens)
+                elif limit_tokens != self.tokens.capacity:
+                    self.tokens.set_limit(limit_tokens, now)
+
+            for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+                remaining = _header_float(headers, f"x-ratelimit-remaining-{kind}")
+                if remaining is None:
+                    continue
+                if bucket is not None:
+                    bucket.clamp(remaining, now)
+                if remaining <= 0:
+                    reset = _parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                    if reset is not None:
+                        pause = max(pause or 0.0, reset)
+
+            if pause:
+                self._paused_until = max(self._paused_until, now + pause)
+                self._stats["throttled"] += 1
+                logger.info(f"Rate limit reached for {self.name}; pausing {pause:.2f}s.")
+            self._turn.notify_all()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["queue_depth"] = len(self._queue)
+            stats["paused_for"] = max(0.0, self._paused_until - time.monotonic())
+            stats["rpm"] = self.requests.capacity if self.requests else None
+            stats["tpm"] = self.tokens.capacity if self.tokens else None
+        stats["avg_wait"] = stats["total_wait"] / stats["granted"] if stats["granted"] else 0.0
+        return stats
+
+
+_DEFAULT_LIMITS = {
+    "groq": (GROQ_RPM, GROQ_TPM),
+    "gemini": (GEMINI_RPM, GEMINI_TPM),
+}
+
+_limiters: Dict[Tuple[str, str], RateLimiter] = {}
+_registry_lock = threading.Lock()
+
+
+def get_limiter(provider: str, model: str) -> RateLimiter:
+    """The process-wide limiter for `provider`/`model`, created with the provider's default quota."""
+    key = (provider, model)
+    limiter = _limiters.get(key)
+    if limiter is not None:
+        return limiter
+    with _registry_lock:
+        if key not in _limiters:
+            rpm, tpm = _DEFAULT_LIMITS.get(provider, (0, 0))
+            _limiters[key] = RateLimiter(f"{provider}:{model}", rpm=rpm, tpm=tpm)
+        return _limiters[key]
+
+
+def stats() -> dict:
+    """Queue depth, wait times and current quotas for every limiter in use, keyed "provider:model"."""
+    with _registry_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
+
+
+def reset() -> None:
+    """Forget all limiters (and their bucket levels)."""
+    with _registry_lock:
+        _limiters.clear()
+
+
+def _model_of(request) -> Optional[str]:
+    try:
+        return json.loads(request.content or b"{}").get("model")
+    except Exception:
+        return None
+
+
+def response_hook(provider: str):
+    """An httpx response event hook that feeds rate-limit headers to the matching limiter."""
+    def _hook(response) -> None:
+        model = _model_of(response.request)
+        if model:
+            get_limiter(provider, model).update_from_headers(response.headers)
+    return _hook
+
+
+def async_response_hook(provider: str):
+    """`response_hook` for httpx.AsyncClient, which requires coroutine hooks."""
+    hook = response_hook(provider)
+
+    async def _hook(response) -> None:
+        hook(response)
+    return _hook
@@ -0,0 +1,452 @@
+# runtime.py
+import asyncio
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import db_manager
+from db_manager import ThreadCursor, ThreadInfo
+from payload_store import checkpoint_serde
+
+logger = logging.getLogger(__name__)
+
+# Seconds between attempts to reach Postgres again after falling back to memory
+RECONNECT_INTERVAL = 30.0
+
+# Thread index used while serving from MemorySaver (the checkpoints are in-process too)
+_memory_threads: Dict[str, ThreadInfo] = {}
+_memory_threads_lock = threading.Lock()
+
+
+def _remember_thread(thread_id: str, title: str, status: str) -> None:
+    now = datetime.now(timezone.utc)
+    with _memory_threads_lock:
+        known = _memory_threads.get(thread_id)
+        _memory_threads[thread_id] = ThreadInfo(
+            thread_id, (known.title if known and known.title else db_manager.thread_title(title)),
+            status, known.created_at if known else now, now)
+
+
+def _memory_thread_page(limit: int, before: Optional[ThreadCursor], search: Optional[str]) -> List[ThreadInfo]:
+    with _memory_threads_lock:
+        threads = sorted(_memory_threads.values(), key=lambda t: (t.updated_at, t.thread_id), reverse=True)
+    if search:
+        threads = [t for t in threads if search.lower() in t.title.lower()]
+    if before is not None:
+        threads = [t for t in threads if (t.updated_at, t.thread_id) < tuple(before)]
+    return threads[:limit]
+
+
+def _memory_checkpoints(saver) -> list:
+    """Every checkpoint tuple in a MemorySaver, oldest first within each thread."""
+    return sorted(saver.list(None), key=lambda t: (t.config["configurable"]["thread_id"],
+                                                   t.config["configurable"].get("checkpoint_ns", ""),
+                                                   t.checkpoint["id"]))
+
+
+def _put_args(item) -> tuple:
+    """Arguments for `put()` that recreate `item` (same id and parent) in another checkpointer."""
+    configurable = item.config["configurable"]
+    target = {"thread_id": configurable["thread_id"], "checkpoint_ns": configurable.get("checkpoint_ns", "")}
+    parent = (item.parent_config or {}).get("configurable", {}).get("checkpoint_id")
+    if parent:
+        target["checkpoint_id"] = parent
+    return {"configurable": target}, item.checkpoint, item.metadata, dict(item.checkpoint["channel_versions"])
+
+
+def _grouped_writes(item) -> Dict[str, list]:
+    writes: Dict[str, list] = {}
+    for task_id, channel, value in item.pending_writes or []:
+        writes.setdefault(task_id, []).append((channel, value))
+    return writes
+
+
+def _copy_checkpoints(source, target) -> int:
+    """Copy every checkpoint (and its pending writes) from MemorySaver `source` into `target`."""
+    items = _memory_checkpoints(source)
+    for item in items:
+        saved = target.put(*_put_args(item))
+        for task_id, writes in _grouped_writes(item).items():
+            target.put_writes(saved, writes, task_id)
+    return len(items)
+
+
+async def _acopy_checkpoints(source, target) -> int:
+    items = _memory_checkpoints(source)
+    for item in items:
+        saved = await target.aput(*_put_args(item))
+        for task_id, writes in _grouped_writes(item).items():
+            await target.aput_writes(saved, writes, task_id)
+    return len(items)
+
+
+def _memory_thread_rows() -> List[ThreadInfo]:
+    """The in-memory thread index, least recently updated first (the order to upsert it in)."""
+    with _memory_threads_lock:
+        return sorted(_memory_threads.values(), key=lambda t: (t.updated_at, t.thread_id))
+
+
+def _forget_memory_threads(threads: List[ThreadInfo]) -> None:
+    with _memory_threads_lock:
+        for thread in threads:
+            if _memory_threads.get(thread.thread_id) is thread:
+                del _memory_threads[thread.thread_id]
+
+
+class AgentRuntime:
+    """
+    Long-lived owner of the checkpointer and the compiled LangGraph.
+
+    One runtime per process holds a single Postgres connection pool, one
+    PostgresSaver (whose `setup()` DDL runs once, at start) and one compiled
+    graph per workflow mode, so chat messages only pay for the graph run itself.
+
+    If Postgres is down at start-up the runtime serves from MemorySaver and
+    lazily retries Postgres on later accesses, at most every
+    `reconnect_interval` seconds. The retry runs outside the runtime's lock,
+    so other callers keep getting the memory graph meanwhile. When the
+    database answers, the threads served from memory (checkpoints and
+    history index rows) are copied into it before the runtime switches over;
+    if that copy fails the runtime stays on MemorySaver. Dropped connections
+    inside a healthy pool are replaced by the pool itself.
+
+    A `sqlite:///path` db_uri selects a PooledSqliteSaver on that file
+    (sqlite_saver.py) instead of Postgres.
+    """
+
+    def __init__(self, db_uri: str = db_manager.DB_URI,
+                 reconnect_interval: float = RECONNECT_INTERVAL):
+        self.db_uri = db_uri
+        self.reconnect_interval = reconnect_interval
+        self.pool = None
+        self.checkpointer = None
+        self.backend: Optional[str] = None
+        self._graphs = {}
+        self._last_attempt = 0.0
+        self._reconnecting = False
+        self._lock = threading.RLock()
+
+    def start(self) -> "AgentRuntime":
+        """Connect the checkpointer and compile the default graph. Safe to call repeatedly."""
+        self.get_graph()
+        return self
+
+    @property
+    def _database(self) -> str:
+        return "SQLite" if db_manager.sqlite_path(self.db_uri) is not None else "PostgreSQL"
+
+    def _open(self) -> tuple:
+        """(pool, checkpointer, backend) for db_uri, set up and ready. Raises when unreachable."""
+        sqlite = db_manager.sqlite_path(self.db_uri) is not None
+        if sqlite:
+            pool = db_manager.open_sqlite_pool(self.db_uri)
+        else:
+            pool = db_manager.open_postgres_pool(self.db_uri)
+        try:
+            saver = db_manager.PooledSqliteSaver if sqlite else db_manager.PostgresSaver
+            checkpointer = saver(pool, serde=checkpoint_serde())
+            checkpointer.setup()
+            db_manager.setup_threads(pool)
+        except Exception:
+            pool.close()
+            raise
+        return pool, checkpointer, "sqlite" if sqlite else "postgres"
+
+    def _connect(self) -> None:
+        """First connection, under `_lock`: the database, or MemorySaver when it is unavailable."""
+        self._last_attempt = time.monotonic()
+        try:
+            self.pool, self.checkpointer, self.backend = self._open()
+        except Exception as e:
+            print(f"⚠️ {self._database} unavailable ({e}). Falling back to MemorySaver.")
+            from langgraph.checkpoint.memory import MemorySaver
+            self.pool, self.checkpointer, self.backend = None, MemorySaver(), "memory"
+
+        # Graphs compiled against the previous checkpointer are stale now
+        self._graphs = {}
+        logger.info(f"Agent runtime ready (checkpointer: {self.backend}).")
+
+    def _maybe_reconnect(self) -> None:
+        """While on MemorySaver, try the database again once `reconnect_interval` has passed."""
+        with self._lock:
+            if (self.backend != "memory" or self._reconnecting
+                    or time.monotonic() - self._last_attempt < self.reconnect_interval):
+                return
+            self._reconnecting = True
+            self._last_attempt = time.monotonic()
+        try:
+            # The probe can take seconds against a dead host, so it runs without the lock
+            try:
+                opened = self._open()
+            except Exception as e:
+                logger.debug(f"{self._database} still unavailable ({e}).")
+                return
+            with self._lock:
+                self._upgrade(*opened)
+        finally:
+            self._reconnecting = False
+
+    def _upgrade(self, pool, checkpointer, backend: str) -> None:
+        """Copy the memory threads into the database, then serve from it. Runs under `_lock`."""
+        threads = _memory_thread_rows()
+        try:
+            copied = _copy_checkpoints(self.checkpointer, checkpointer)
+            for thread in threads:
+                db_manager.upsert_thread(pool, thread.thread_id, thread.title, thread.status)
+        except Exception as e:
+            logger.warning(f"⚠️ {self._database} is reachable again, but the threads served from memory "
+                           f"could not be copied into it ({e}); staying on MemorySaver.")
+            pool.close()
+            return
+        _forget_memory_threads(threads)
+        self.pool, self.checkpointer, self.backend = pool, checkpointer, backend
+        self._graphs = {}
+        logger.warning(f"⚠️ Agent runtime moved from MemorySaver to {backend}: "
+                       f"copied {copied} checkpoints across {len(threads)} threads.")
+
+    def get_graph(self, mode: Optional[str] = None):
+        """The compiled graph for `mode` ("react" or "pipeline"), built on first use."""
+        from app import build_workflow, DEFAULT_WORKFLOW_MODE
+
+        mode = mode or DEFAULT_WORKFLOW_MODE
+        self._maybe_reconnect()
+        with self._lock:
+            if self.checkpointer is None:
+                self._connect()
+            if mode not in self._graphs:
+                self._graphs[mode] = build_workflow(self.checkpointer, mode=mode)
+            return self._graphs[mode]
+
+    @property
+    def graph(self):
+        """The compiled graph for the default workflow mode."""
+        return self.get_graph()
+
+    def get_pool(self):
+        """The shared Postgres (or SQLite) pool, or None while serving from MemorySaver."""
+        self._maybe_reconnect()
+        with self._lock:
+            if self.checkpointer is None:
+                self._connect()
+            return self.pool
+
+    def record_thread(self, thread_id: str, title: str = "", status: str = "running") -> None:
+        """Upsert the thread's row in the history index. Failures are logged, never raised."""
+        try:
+            pool = self.get_pool()
+            if pool is None:
+                _remember_thread(thread_id, title, status)
+            else:
+                db_manager.upsert_thread(pool, thread_id, title, status)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not record thread {thread_id}: {e}")
+
+    def list_threads(self, limit: int = 50, before: Optional[ThreadCursor] = None,
+                     search: Optional[str] = None) -> List[ThreadInfo]:
+        pool = self.get_pool()
+        if pool is None:
+            return _memory_thread_page(limit, before, search)
+        return db_manager.list_threads(pool, limit, before, search)
+
+    def shutdown(self) -> None:
+        """Close the connection pool and drop the compiled graph."""
+        with self._lock:
+            if self.pool is not None:
+                try:
+                    self.pool.close()
+                except Exception as e:
+                    logger.warning(f"Error closing connection pool: {e}")
+            self.pool = None
+            self.checkpointer = None
+            self.backend = None
+            self._graphs = {}
+
+
+class AsyncAgentRuntime:
+    """
+    Event-loop counterpart of AgentRuntime for `graph.astream` runs.
+
+    Owns an AsyncConnectionPool and AsyncPostgresSaver (or MemorySaver when
+    Postgres is down) plus one compiled graph per mode. It must be started on the loop
+    that serves requests, since the pool binds to that loop. With the async
+    skills in tools.py, one loop can carry hundreds of in-flight reports.
+    A `sqlite:///path` db_uri uses a PooledSqliteSaver, whose async methods
+    run on executor threads.
+    """
+
+    def __init__(self, db_uri: str = db_manager.DB_URI,
+                 reconnect_interval: float = RECONNECT_INTERVAL):
+        self.db_uri = db_uri
+        self.reconnect_interval = reconnect_interval
+        self.pool = None
+        self.checkpointer = None
+        self.backend: Optional[str] = None
+        self._graphs = {}
+        self._last_attempt = 0.0
+        self._reconnecting = False
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def start(self) -> "AsyncAgentRuntime":
+        await self.get_graph()
+        return self
+
+    @property
+    def _database(self) -> str:
+        return "SQLite" if db_manager.sqlite_path(self.db_uri) is not None else "PostgreSQL"
+
+    async def _open(self) -> tuple:
+        sqlite = db_manager.sqlite_path(self.db_uri) is not None
+        if sqlite:
+            # The pooled SqliteSaver runs its async methods on executor threads
+            pool = await asyncio.to_thread(db_manager.open_sqlite_pool, self.db_uri)
+            try:
+                checkpointer = db_manager.PooledSqliteSaver(pool, serde=checkpoint_serde())
+                await asyncio.to_thread(checkpointer.setup)
+                await db_manager.asetup_threads(pool)
+            except Exception:
+                pool.close()
+                raise
+        else:
+            pool = await db_manager.open_async_postgres_pool(self.db_uri)
+            try:
+                checkpointer = db_manager.AsyncPostgresSaver(pool, serde=checkpoint_serde())
+                await checkpointer.setup()
+                await db_manager.asetup_threads(pool)
+            except Exception:
+                await pool.close()
+                raise
+        return pool, checkpointer, "sqlite" if sqlite else "postgres"
+
+    async def _close_pool(self, pool, backend: str) -> None:
+        if backend == "sqlite":
+            pool.close()
+        else:
+            await pool.close()
+
+    async def _connect(self) -> None:
+        self._last_attempt = time.monotonic()
+        try:
+            self.pool, self.checkpointer, self.backend = await self._open()
+        except Exception as e:
+            print(f"⚠️ {self._database} unavailable ({e}). Falling back to MemorySaver.")
+            from langgraph.checkpoint.memory import MemorySaver
+            self.pool, self.checkpointer, self.backend = None, MemorySaver(), "memory"
+
+        self._graphs = {}
+        logger.info(f"Async agent runtime ready (checkpointer: {self.backend}).")
+
+    async def _maybe_reconnect(self) -> None:
+        """As AgentRuntime._maybe_reconnect: probe without holding the lock, then copy and switch."""
+        if (self.backend != "memory" or self._reconnecting
+                or time.monotonic() - self._last_attempt < self.reconnect_interval):
+            return
+        self._reconnecting = True
+        self._last_attempt = time.monotonic()
+        try:
+            try:
+                opened = await self._open()
+            except Exception as e:
+                logger.debug(f"{self._database} still unavailable ({e}).")
+                return
+            async with self._get_lock():
+                await self._upgrade(*opened)
+        finally:
+            self._reconnecting = False
+
+    async def _upgrade(self, pool, checkpointer, backend: str) -> None:
+        threads = _memory_thread_rows()
+        try:
+            copied = await _acopy_checkpoints(self.checkpointer, checkpointer)
+            for thread in threads:
+                await db_manager.aupsert_thread(pool, thread.thread_id, thread.title, thread.status)
+        except Exception as e:
+            logger.warning(f"⚠️ {self._database} is reachable again, but the threads served from memory "
+                           f"could not be copied into it ({e}); staying on MemorySaver.")
+            await self._close_pool(pool, backend)
+            return
+        _forget_memory_threads(threads)
+        self.pool, self.checkpointer, self.backend = pool, checkpointer, backend
+        self._graphs = {}
+        logger.warning(f"⚠️ Async agent runtime moved from MemorySaver to {backend}: "
+                       f"copied {copied} checkpoints across {len(threads)} threads.")
+
+    async def get_graph(self, mode: Optional[str] = None):
+        """The compiled graph for `mode`, built on first use; retries Postgres lazily after a fallback."""
+        from app import build_workflow, DEFAULT_WORKFLOW_MODE
+
+        mode = mode or DEFAULT_WORKFLOW_MODE
+        await self._maybe_reconnect()
+        async with self._get_lock():
+            if self.checkpointer is None:
+                await self._connect()
+            if mode not in self._graphs:
+                self._graphs[mode] = build_workflow(self.checkpointer, mode=mode)
+            return self._graphs[mode]
+
+    async def get_pool(self):
+        await self._maybe_reconnect()
+        async with self._get_lock():
+            if self.checkpointer is None:
+                await self._connect()
+            return self.pool
+
+    async def record_thread(self, thread_id: str, title: str = "", status: str = "running") -> None:
+        try:
+            pool = await self.get_pool()
+            if pool is None:
+                _remember_thread(thread_id, title, status)
+            else:
+                await db_manager.aupsert_thread(pool, thread_id, title, status)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not record thread {thread_id}: {e}")
+
+    async def list_threads(self, limit: int = 50, before: Optional[ThreadCursor] = None,
+                           search: Optional[str] = None) -> List[ThreadInfo]:
+        pool = await self.get_pool()
+        if pool is None:
+            return _memory_thread_page(limit, before, search)
+        return await db_manager.alist_threads(pool, limit, before, search)
+
+    async def shutdown(self) -> None:
+        async with self._get_lock():
+            if self.pool is not None:
+                try:
+                    await self._close_pool(self.pool, self.backend)
+                except Exception as e:
+                    logger.warning(f"Error closing async connection pool: {e}")
+            self.pool = None
+            self.checkpointer = None
+            self.backend = None
+            self._graphs = {}
+
+
+_runtime: Optional[AgentRuntime] = None
+_async_runtime: Optional[AsyncAgentRuntime] = None
+_runtime_lock = threading.Lock()
+
+
+def get_runtime() -> AgentRuntime:
+    """Return the process-wide runtime, creating it (and its shutdown hook) on first use."""
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None:
+            _runtime = AgentRuntime()
+            atexit.register(_runtime.shutdown)
+        return _runtime
+
+
+def get_async_runtime() -> AsyncAgentRuntime:
+    """Return the process-wide async runtime. Await `get_graph()` on it from the serving loop."""
+    global _async_runtime
+    with _runtime_lock:
+        if _async_runtime is None:
+            _async_runtime = AsyncAgentRuntime()
+        return _async_runtime
@@ -0,0 +1,84 @@
+# singleflight.py
+"""
+Collapse duplicate in-flight calls.
+
+When several threads (or tasks) ask for the same key at the same time, only
+the first one (the leader) runs the work. The others wait for it and get its
+result, or its exception. Once the call has finished the key is released.
+Later callers are expected to hit a cache instead, so together the cache and
+SingleFlight make identical work run exactly once.
+"""
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    `do(key, fn)` for threads, `ado(key, fn)` for coroutines. An async call
+    runs as its own task, so a waiter that is cancelled does not cancel the
+    work the other waiters are sharing.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, _Call] = {}
+        self._tasks: Dict[Tuple[int, str], asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._stats = {"executed": 0, "shared": 0}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats["executed"] += 1
+            else:
+                self._stats["shared"] += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = fn()
+            return call.value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        # Futures belong to one event loop, so keys are scoped per loop
+        slot = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            task = self._tasks.get(slot)
+            if task is None:
+                task = self._tasks[slot] = asyncio.ensure_future(fn())
+                task.add_done_callback(lambda _: self._release(slot))
+                self._stats["executed"] += 1
+            else:
+                self._stats["shared"] += 1
+        return await asyncio.shield(task)
+
+    def _release(self, slot: Tuple[int, str]) -> None:
+        with self._lock:
+            self._tasks.pop(slot, None)
+
+    def stats(self) -> dict:
+        """`executed` calls that did the work and `shared` calls that reused one already in flight."""
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._calls) + len(self._tasks))
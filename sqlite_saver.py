@@ -0,0 +1,181 @@
+# sqlite_saver.py
+"""
+SQLite checkpointer for single-host deployments.
+
+With `DATABASE_URL=sqlite:///checkpoints.db` the runtime checkpoints to a
+local file instead of Postgres, so history survives restarts without a
+database server. MemorySaver remains the fallback when the configured
+database cannot be opened.
+
+Each thread that touches the checkpointer gets its own connection to the
+file (SqliteConnectionPool), instead of every report queueing on one
+connection's lock. Connections are tuned when they are opened:
+  * WAL journal, so readers never block the writer or each other;
+  * synchronous=NORMAL, so commits are not fsynced one by one (the WAL is
+    synced at checkpoints; a power cut can lose the last commits but does
+    not corrupt the file);
+  * a memory-mapped read window of SQLITE_MMAP_SIZE bytes;
+  * a busy timeout of SQLITE_BUSY_TIMEOUT seconds to wait for the single
+    writer lock, rather than failing with "database is locked".
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Tuple
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+logger = logging.getLogger(__name__)
+
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "5"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+
+
+class SqliteConnectionPool:
+    """
+    One tuned sqlite3 connection per thread, all on the same file. A
+    connection is opened on a thread's first `connection()` call, and closed
+    when that thread exits or the pool is closed. `with pool.connection() as
+    conn:` commits on exit, like a psycopg pool connection.
+    """
+
+    dialect = "sqlite"
+
+    def __init__(self, path: str, busy_timeout: float = SQLITE_BUSY_TIMEOUT,
+                 mmap_size: int = SQLITE_MMAP_SIZE, synchronous: str = SQLITE_SYNCHRONOUS):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.mmap_size = mmap_size
+        self.synchronous = synchronous
+        self._local = threading.local()
+        self._connections: Dict[int, Tuple["weakref.ref[threading.Thread]", sqlite3.Connection]] = {}
+        self._lock = threading.Lock()
+        # SQLite has a single writer; queueing writers here is cheaper than its busy-wait sleeps
+        self.write_lock = threading.Lock()
+        self._closed = False
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # The journal mode is stored in the file, so setting it once covers every connection
+        self.connection().execute("PRAGMA journal_mode=WAL")
+
+    def _open(self) -> sqlite3.Connection:
+        # check_same_thread=False only so close() may close it from another thread
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, check_same_thread=False)
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """The calling thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError(f"SQLite pool for {self.path} is closed")
+                self._close_dead()
+                conn = self._local.conn = self._open()
+                self._connections[threading.get_ident()] = (weakref.ref(threading.current_thread()), conn)
+        return conn
+
+    def _close_dead(self) -> None:
+        for ident, (thread, conn) in list(self._connections.items()):
+            owner = thread()
+            if owner is None or not owner.is_alive():
+                del self._connections[ident]
+                conn.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"path": self.path, "connections": len(self._connections)}
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            connections = [conn for _, conn in self._connections.values()]
+            self._connections = {}
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception as e:
+                logger.warning(f"Error closing SQLite connection: {e}")
+
+
+class PooledSqliteSaver(SqliteSaver):
+    """
+    SqliteSaver on a SqliteConnectionPool: every call uses the calling
+    thread's connection, so reads never wait and concurrent reports only
+    queue on the pool's write lock while one of them is committing. The async methods run the sync ones
+    on the default executor, which makes the saver usable from `graph.astream`
+    too.
+    """
+
+    def __init__(self, pool: SqliteConnectionPool, *, serde=None):
+        self.pool = pool
+        super().__init__(pool.connection(), serde=serde)
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        return self.pool.connection()
+
+    @conn.setter
+    def conn(self, value: sqlite3.Connection) -> None:
+        # SqliteSaver.__init__ assigns its connection; ours always come from the pool
+        pass
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        with self.lock:
+            super().setup()
+
+    @contextmanager
+    def cursor(self, transaction: bool = True) -> Iterator[sqlite3.Cursor]:
+        self.setup()
+        conn = self.conn
+        cur = conn.cursor()
+        try:
+            yield cur
+        finally:
+            if transaction:
+                conn.commit()
+            cur.close()
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        with self.pool.write_lock:
+            return super().put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(self, config, writes: Sequence, task_id: str, task_path: str = "") -> None:
+        with self.pool.write_lock:
+            super().put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self.pool.write_lock:
+            super().delete_thread(thread_id)
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter: Optional[dict] = None, before=None,
+                    limit: Optional[int] = None) -> AsyncIterator[Any]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes: Sequence, task_id: str, task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    async def aget_delta_channel_history(self, *, config, channels):
+        return await asyncio.to_thread(self.get_delta_channel_history, config=config, channels=channels)
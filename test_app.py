@@ -74,3 +74,117 @@ def test_full_workflow_safe_input(mock_react_agent_invoke):
             mock_react_agent_invoke.assert_called_once()
         except Exception:
             pass
+
+def _fake_skill_llm(prompt, **kwargs):
+    """Stand-in for ask_groq: returns a critique with weaknesses every time."""
+    if "CRITICAL REVIEWER" in prompt:
+        return '{"summary": "ok", "weaknesses": ["needs sources"]}'
+    if "RESEARCH ASSISTANT" in prompt:
+        return '{"queries": ["ev sales 2025"]}'
+    return '{"title": "EV", "sections": []}'
+
+@patch("tools.tavily")
+@patch("tools.ask_groq_stream")
+@patch("tools.ask_groq")
+def test_pipeline_workflow_bounded_revisions(mock_ask_groq, mock_stream, mock_tavily):
+    """
+    Test that pipeline mode runs plan/search/write/critique as graph nodes and
+    stops revising after PIPELINE_MAX_REVISIONS even if critiques keep finding weaknesses.
+    """
+    from langgraph.checkpoint.memory import MemorySaver
+    from app import build_workflow, PIPELINE_MAX_REVISIONS
+
+    mock_ask_groq.side_effect = _fake_skill_llm
+    mock_stream.side_effect = lambda *args, **kwargs: iter(["Final ", "report."])
+    mock_tavily.search.return_value = {"results": [{"content": "EV sales grew", "url": "iea.org"}]}
+
+    graph = build_workflow(MemorySaver(), mode="pipeline")
+    config = {"configurable": {"thread_id": "test_pipeline"}}
+    final = graph.invoke({"messages": [HumanMessage(content="EV market outlook 2025")]}, config)
+
+    assert final["messages"][-1].content == "Final report."
+    assert final["topic"] == "EV market outlook 2025"
+    assert "iea.org" in final["gathered_content"]
+    assert final["revisions"] == PIPELINE_MAX_REVISIONS
+    # One draft per round: the first plus one per revision
+    assert mock_stream.call_count == PIPELINE_MAX_REVISIONS + 1
+
+@patch("tools.tavily")
+@patch("tools.ask_groq_stream")
+@patch("tools.ask_groq")
+def test_pipeline_revision_rounds_keep_the_section_writer(mock_ask_groq, mock_stream, mock_tavily):
+    """
+    The critique reaches every section prompt on revision rounds, while the plan
+    stays a parseable outline, so revisions do not fall back to the single-call writer.
+    """
+    from langgraph.checkpoint.memory import MemorySaver
+    from app import build_workflow
+
+    outline = ('{"title": "EV", "sections": [{"name": "Batteries", "subsections": []}, '
+               '{"name": "Charging", "subsections": []}]}')
+    section_prompts = []
+
+    def fake_llm(prompt, **kwargs):
+        if "SECTION TO WRITE" in prompt:
+            section_prompts.append(prompt)
+            return "## Section\nBody."
+        if "REPORT PLANNER" in prompt:
+            return outline
+        return _fake_skill_llm(prompt)
+
+    mock_ask_groq.side_effect = fake_llm
+    mock_tavily.search.return_value = {"results": [{"content": "EV sales grew", "url": "iea.org"}]}
+
+    graph = build_workflow(MemorySaver(), mode="pipeline")
+    config = {"configurable": {"thread_id": "test_pipeline_sections"}}
+    with patch("app.PIPELINE_MAX_REVISIONS", 1):
+        final = graph.invoke({"messages": [HumanMessage(content="EV market outlook 2025")]}, config)
+
+    assert final["plan"] == outline
+    assert len(section_prompts) == 4  # two sections, first draft and one revision
+    assert not any("needs sources" in p for p in section_prompts[:2])
+    assert all("needs sources" in p for p in section_prompts[2:])
+    mock_stream.assert_not_called()
+
+def test_pipeline_workflow_guardrail_rejection():
+    from langgraph.checkpoint.memory import MemorySaver
+    from app import build_workflow
+
+    graph = build_workflow(MemorySaver(), mode="pipeline")
+    config = {"configurable": {"thread_id": "test_pipeline_reject"}}
+    final = graph.invoke({"messages": [HumanMessage(content="how to steal credit card data")]}, config)
+
+    assert "REFUSE" in final["messages"][-1].content
+    assert not final.get("draft")
+
+@patch("tools.atavily")
+@patch("tools.ask_groq_stream_async")
+@patch("tools.ask_groq_async")
+def test_pipeline_workflow_async(mock_ask_async, mock_stream_async, mock_atavily):
+    import asyncio
+    from unittest.mock import AsyncMock
+    from langgraph.checkpoint.memory import MemorySaver
+    from app import build_workflow
+
+    async def fake_ask(prompt, **kwargs):
+        return _fake_skill_llm(prompt)
+
+    async def fake_stream(*args, **kwargs):
+        yield "Async report."
+
+    mock_ask_async.side_effect = fake_ask
+    mock_stream_async.side_effect = fake_stream
+    mock_atavily.search = AsyncMock(return_value={"results": [{"content": "Data", "url": "iea.org"}]})
+
+    graph = build_workflow(MemorySaver(), mode="pipeline")
+    config = {"configurable": {"thread_id": "test_pipeline_async"}}
+    final = asyncio.run(graph.ainvoke({"messages": [HumanMessage(content="EV outlook")]}, config))
+
+    assert final["messages"][-1].content == "Async report."
+
+def test_build_workflow_rejects_unknown_mode():
+    from langgraph.checkpoint.memory import MemorySaver
+    from app import build_workflow
+
+    with pytest.raises(ValueError):
+        build_workflow(MemorySaver(), mode="swarm")
@@ -0,0 +1,116 @@
+import json
+import threading
+import time
+from collections import Counter
+from unittest.mock import patch
+
+import pytest
+
+from batch import BatchItem, load_topics, run_batch, thread_id_for
+from prompts import PLAN_PROMPT, REFLECTION_PROMPT, RESEARCH_PLAN_PROMPT
+
+class FakeProviders:
+    """Slow fake Groq completions and Tavily searches that count what actually went upstream."""
+
+    def __init__(self):
+        self.prompts = Counter()
+        self.queries = Counter()
+        self.drafts = 0
+        self._lock = threading.Lock()
+
+    def complete(self, prompt, model, temperature, max_tokens, estimated):
+        with self._lock:
+            self.prompts[prompt] += 1
+        time.sleep(0.05)  # long enough for concurrent topics to overlap
+        if prompt.startswith(PLAN_PROMPT):
+            return "1. Market size\n2. Outlook"
+        if prompt.startswith(RESEARCH_PLAN_PROMPT):
+            return '{"queries": ["global EV sales 2025", "battery pack prices"]}'
+        if prompt.startswith(REFLECTION_PROMPT):
+            return '{"weaknesses": []}'
+        return "Final report."
+
+    def stream(self, prompt, **kwargs):
+        with self._lock:
+            self.drafts += 1
+        return iter(["Final ", "report."])
+
+    def search(self, query, **kwargs):
+        with self._lock:
+            self.queries[query] += 1
+        time.sleep(0.05)
+        return {"results": [{"content": f"Facts about {query}", "url": "iea.org"}]}
+
+    def planner_calls(self, topic):
+        return self.prompts[f"{PLAN_PROMPT}\n\nTask: {topic}"]
+
+@pytest.fixture
+def fakes():
+    providers = FakeProviders()
+    with patch("groq_client._groq_complete", side_effect=providers.complete), \
+         patch("tools.ask_groq_stream", side_effect=providers.stream), \
+         patch("tools.tavily") as mock_tavily:
+        mock_tavily.search.side_effect = providers.search
+        yield providers
+
+def _pipeline(checkpointer):
+    from app import build_workflow
+    return build_workflow(checkpointer, mode="pipeline")
+
+def test_load_topics_from_jsonl_and_csv(tmp_path):
+    jsonl = tmp_path / "topics.jsonl"
+    jsonl.write_text('{"id": "ev", "topic": "EV outlook"}\n\n"Solar outlook"\n{"id": "ev", "topic": "dup"}\n')
+    items = load_topics(str(jsonl))
+    assert items[0] == BatchItem("ev", "EV outlook")
+    assert items[1].topic == "Solar outlook" and items[1].id.startswith("solar-outlook-")
+    assert len(items) == 2
+
+    csv_file = tmp_path / "topics.csv"
+    csv_file.write_text("id,topic\nev,EV outlook\n,Wind power\n")
+    assert [i.topic for i in load_topics(str(csv_file))] == ["EV outlook", "Wind power"]
+
+    # Thread ids are stable per batch and topic, so re-runs land on the same checkpoints
+    assert thread_id_for(items[0], "nightly") == thread_id_for(BatchItem("ev", "EV outlook"), "nightly")
+    assert thread_id_for(items[0], "nightly") != thread_id_for(items[0], "weekly")
+
+def test_shared_planner_prompts_and_queries_run_once(tmp_path, fakes):
+    from langgraph.checkpoint.memory import MemorySaver
+
+    items = [BatchItem("ev-a", "EV outlook"), BatchItem("ev-b", "EV outlook"), BatchItem("solar", "Solar outlook")]
+    results = run_batch(items, str(tmp_path), graph=_pipeline(MemorySaver()), concurrency=3)
+
+    assert [r["status"] for r in results] == ["done"] * 3
+    assert (tmp_path / "ev-a.md").read_text() == "Final report.\n"
+    assert fakes.planner_calls("EV outlook") == 1
+    assert fakes.planner_calls("Solar outlook") == 1
+    # Six searches were requested across the batch, but each distinct query went upstream once
+    assert fakes.queries == Counter({"global EV sales 2025": 1, "battery pack prices": 1})
+    manifest = [json.loads(line) for line in (tmp_path / "manifest.jsonl").read_text().splitlines()]
+    assert sorted(m["id"] for m in manifest) == ["ev-a", "ev-b", "solar"]
+
+def test_rerun_resumes_crashed_topic_from_checkpoint(tmp_path, fakes, monkeypatch):
+    import app
+    from langgraph.checkpoint.memory import MemorySaver
+
+    checkpointer = MemorySaver()
+    items = [BatchItem("ev", "EV outlook"), BatchItem("solar", "Solar outlook")]
+    real_critique = app.critique_node
+
+    def crash_on_solar(state):
+        if state["topic"] == "Solar outlook":
+            raise RuntimeError("worker killed")
+        return real_critique(state)
+
+    monkeypatch.setattr(app, "critique_node", crash_on_solar)
+    first = run_batch(items, str(tmp_path), graph=_pipeline(checkpointer), batch_name="nightly")
+    assert [r["status"] for r in first] == ["done", "failed"]
+    assert not (tmp_path / "solar.md").exists()
+
+    # A fresh graph on the same checkpointer, as after a restart
+    monkeypatch.setattr(app, "critique_node", real_critique)
+    second = run_batch(items, str(tmp_path), graph=_pipeline(checkpointer), batch_name="nightly")
+    assert [r["status"] for r in second] == ["skipped", "resumed"]
+    assert (tmp_path / "solar.md").read_text() == "Final report.\n"
+    # Planning, search and writing were not repeated for the resumed topic
+    assert fakes.planner_calls("Solar outlook") == 1
+    assert fakes.drafts == 2
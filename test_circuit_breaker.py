@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+import pytest
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+def _fail(error):
+    def call():
+        raise error
+    return call
+
+def test_opens_when_failure_rate_crosses_threshold():
+    breaker = CircuitBreaker("p", min_calls=4, failure_rate=0.5, open_seconds=60)
+    breaker.call(lambda: "ok")
+    breaker.call(lambda: "ok")
+    with pytest.raises(StatusError):
+        breaker.call(_fail(StatusError(500)))
+    assert breaker.state == CLOSED
+    with pytest.raises(CircuitOpenError):  # the tripping failure is reported as an open circuit
+        breaker.call(_fail(StatusError(503)))
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "never called")
+    assert breaker.snapshot()["rejected"] == 1
+
+def test_client_errors_do_not_trip_the_breaker():
+    breaker = CircuitBreaker("p", min_calls=1)
+    for _ in range(3):
+        with pytest.raises(StatusError):
+            breaker.call(_fail(StatusError(400)))
+    assert breaker.state == CLOSED
+    with pytest.raises(CircuitOpenError):
+        breaker.call(_fail(StatusError(429)))
+
+def test_half_open_allows_one_probe_and_reopens_on_failure():
+    breaker = CircuitBreaker("p", min_calls=1, open_seconds=0.05)
+    with pytest.raises(CircuitOpenError):
+        breaker.call(_fail(TimeoutError()))
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() is True
+    assert breaker.allow() is False  # only one probe in flight
+    breaker.record_failure(TimeoutError())
+    assert breaker.state == OPEN
+    assert breaker.snapshot()["opened"] == 2
+
+def test_old_failures_age_out_of_the_window():
+    breaker = CircuitBreaker("p", window=0.05, min_calls=2, failure_rate=0.6)
+    with pytest.raises(ConnectionError):
+        breaker.call(_fail(ConnectionError()))
+    time.sleep(0.06)
+    breaker.call(lambda: "ok")
+    with pytest.raises(ConnectionError):
+        breaker.call(_fail(ConnectionError()))
+    assert breaker.state == CLOSED
+
+def test_async_call_records_outcomes():
+    breaker = CircuitBreaker("p", min_calls=1, open_seconds=60)
+
+    async def boom():
+        raise ConnectionError()
+
+    async def main():
+        with pytest.raises(CircuitOpenError):
+            await breaker.acall(boom)
+
+    asyncio.run(main())
+    assert breaker.state == OPEN
+
+def test_cancelled_half_open_probe_frees_its_slot():
+    breaker = CircuitBreaker("p", min_calls=1, open_seconds=0.05)
+    with pytest.raises(CircuitOpenError):
+        breaker.call(_fail(TimeoutError()))
+    time.sleep(0.06)
+
+    async def slow():
+        await asyncio.sleep(10)
+
+    async def main():
+        # e.g. the losing Groq task after a Gemini hedge won
+        probe = asyncio.create_task(breaker.acall(slow))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+    asyncio.run(main())
+    assert breaker.state == HALF_OPEN
+    assert breaker.snapshot()["failures"] == 1
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == CLOSED
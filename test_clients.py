@@ -0,0 +1,80 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import clients
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def local_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    clients.reset_stats()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+    clients.reset_stats()
+
+def test_sync_client_reuses_keepalive_connections(local_server):
+    with clients.httpx_client("local") as client:
+        for _ in range(5):
+            assert client.get(local_server).text == "ok"
+    stats = clients.stats()["local"]
+    assert stats["requests"] == 5
+    assert stats["new_connections"] == 1
+    assert stats["reuse_rate"] == 0.8
+
+def test_async_client_counts_reuse(local_server):
+    async def main():
+        async with clients.async_httpx_client("local_async") as client:
+            for _ in range(4):
+                await client.get(local_server)
+
+    asyncio.run(main())
+    stats = clients.stats()["local_async"]
+    assert stats["requests"] == 4 and stats["new_connections"] == 1
+
+def test_registry_builds_one_client_per_provider(monkeypatch):
+    monkeypatch.setattr(clients, "_clients", {})
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        groq_clients = list(pool.map(lambda _: clients.get_groq(), range(16)))
+    assert all(c is groq_clients[0] for c in groq_clients)
+    assert clients.get_groq()._client.event_hooks["request"]  # instrumented pool
+
+def test_async_clients_are_kept_per_event_loop(monkeypatch, local_server):
+    monkeypatch.setattr(clients, "_loop_clients", clients.weakref.WeakKeyDictionary())
+    made = []
+
+    def factory():
+        made.append(clients.async_httpx_client("local_loop"))
+        return made[-1]
+
+    async def main():
+        client = clients._get_async("local_loop", factory)
+        assert clients._get_async("local_loop", factory) is client
+        return (await client.get(local_server)).status_code
+
+    # The second loop must not reuse connections opened on the first, now closed, loop
+    assert [asyncio.run(main()) for _ in range(2)] == [200, 200]
+    assert len(made) == 2
+
+def test_missing_key_raises_environment_error(monkeypatch):
+    monkeypatch.setattr(clients, "_clients", {})
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    with pytest.raises(EnvironmentError):
+        clients.get_gemini()
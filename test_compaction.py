@@ -0,0 +1,85 @@
+import sqlite3
+import time
+from typing import Annotated, List, TypedDict
+
+import pytest
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.graph import END, StateGraph
+
+from compaction import checkpoint_time, compact_sqlite
+
+
+class CountState(TypedDict):
+    notes: Annotated[List[str], lambda a, b: a + b]
+
+
+def _graph(checkpointer):
+    builder = StateGraph(CountState)
+    for name, nxt in (("plan", "search"), ("search", "write"), ("write", END)):
+        builder.add_node(name, lambda state, name=name: {"notes": [name * 200]})
+        builder.add_edge(name, nxt)
+    builder.set_entry_point("plan")
+    return builder.compile(checkpointer=checkpointer)
+
+
+@pytest.fixture
+def checkpoint_db(tmp_path):
+    path = str(tmp_path / "checkpoints.db")
+    conn = sqlite3.connect(path, check_same_thread=False)
+    saver = SqliteSaver(conn)
+    graph = _graph(saver)
+    for thread_id in ("active", "finished"):
+        for _ in range(3):
+            graph.invoke({"notes": ["topic"]}, {"configurable": {"thread_id": thread_id}})
+    conn.execute("CREATE TABLE threads (thread_id TEXT PRIMARY KEY, status TEXT)")
+    conn.execute("INSERT INTO threads VALUES ('active', 'running'), ('finished', 'done')")
+    conn.commit()
+    yield path, graph
+    conn.close()
+
+
+def _counts(path):
+    with sqlite3.connect(path) as conn:
+        return dict(conn.execute("SELECT thread_id, COUNT(*) FROM checkpoints GROUP BY thread_id").fetchall())
+
+
+def test_keeps_latest_checkpoints_and_prunes_orphaned_writes(checkpoint_db):
+    path, graph = checkpoint_db
+    config = {"configurable": {"thread_id": "active"}}
+    before = graph.get_state(config).values
+
+    stats = compact_sqlite(path, keep_last=2, retention_days=0, min_idle_seconds=0)
+
+    assert _counts(path) == {"active": 2, "finished": 1}
+    assert stats["compacted"] == 2 and stats["bytes_reclaimed"] > 0
+    with sqlite3.connect(path) as conn:
+        orphans = conn.execute(
+            "SELECT COUNT(*) FROM writes w WHERE NOT EXISTS (SELECT 1 FROM checkpoints c WHERE "
+            "c.thread_id = w.thread_id AND c.checkpoint_ns = w.checkpoint_ns AND c.checkpoint_id = w.checkpoint_id)"
+        ).fetchone()[0]
+    assert orphans == 0
+    # The thread still resumes from its latest state
+    assert graph.get_state(config).values == before
+    assert len(graph.invoke({"notes": ["more"]}, config)["notes"]) == len(before["notes"]) + 4
+
+
+def test_skips_busy_threads_and_expires_old_ones(checkpoint_db):
+    path, _ = checkpoint_db
+    untouched = _counts(path)
+
+    busy = compact_sqlite(path, keep_last=1, retention_days=1, min_idle_seconds=300)
+    assert busy["busy"] == 2 and _counts(path) == untouched
+
+    expired = compact_sqlite(path, keep_last=1, retention_days=1, min_idle_seconds=300,
+                             now=time.time() + 2 * 86400)
+    assert expired["expired"] == 2 and _counts(path) == {}
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM writes").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM threads").fetchone()[0] == 0
+
+
+def test_checkpoint_time_reads_uuid6_ids():
+    from langgraph.checkpoint.base.id import uuid6
+
+    assert checkpoint_time(str(uuid6())) == pytest.approx(time.time(), abs=5)
+    assert checkpoint_time("not-a-uuid") is None
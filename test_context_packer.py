@@ -0,0 +1,40 @@
+from unittest.mock import patch
+
+import context_packer
+from context_packer import Snippet, dedupe, pack, pack_context, parse_snippets
+
+BATTERY = "Lithium-ion battery pack prices fell to 139 dollars per kilowatt hour in 2023 according to BNEF"
+CHARGERS = "Public fast chargers in Europe doubled between 2022 and 2024 as networks expanded along highways"
+POLICY = "The Inflation Reduction Act offers a 7500 dollar clean vehicle tax credit for qualifying buyers"
+
+def test_parse_snippets_keeps_source_urls():
+    snippets = parse_snippets(f"{BATTERY} (Source: https://a.com/x)\n\nNo source here")
+    assert snippets == [Snippet(BATTERY, "https://a.com/x"), Snippet("No source here", None)]
+    assert snippets[0].render() == f"{BATTERY} (Source: https://a.com/x)"
+
+def test_dedupe_drops_near_duplicates_only():
+    near_copy = BATTERY.replace("BNEF", "BNEF.")  # same words, different punctuation
+    snippets = [Snippet(BATTERY, "a.com"), Snippet(near_copy, "b.com"), Snippet(CHARGERS, "c.com")]
+    assert dedupe(snippets) == [Snippet(BATTERY, "a.com"), Snippet(CHARGERS, "c.com")]
+
+def test_pack_respects_budget_and_covers_each_section():
+    filler = [Snippet(f"Battery chemistry note number {i} about lithium battery cells", f"f{i}.com") for i in range(10)]
+    snippets = filler + [Snippet(CHARGERS, "c.com"), Snippet(POLICY, "p.com")]
+    with patch.object(context_packer, "count_tokens", lambda text: 20):
+        packed = pack(snippets, ["battery lithium", "fast chargers", "tax credit policy"], budget_tokens=100)
+    assert len(packed) == 5
+    assert Snippet(CHARGERS, "c.com") in packed and Snippet(POLICY, "p.com") in packed
+    # Original order is preserved
+    assert [snippets.index(s) for s in packed] == sorted(snippets.index(s) for s in packed)
+
+def test_pack_context_round_trips_format():
+    gathered = "\n\n".join([f"{BATTERY} (Source: a.com)", f"{BATTERY} (Source: b.com)", f"{POLICY} (Source: p.com)"])
+    assert pack_context(gathered, ["battery prices", "tax credit"]) == \
+        f"{BATTERY} (Source: a.com)\n\n{POLICY} (Source: p.com)"
+
+def test_writer_prompt_is_packed_against_plan():
+    import tools
+    gathered = "\n\n".join([f"{BATTERY} (Source: a.com)", f"{CHARGERS} (Source: c.com)"])
+    with patch.object(tools.context_packer, "CONTEXT_TOKEN_BUDGET", context_packer.count_tokens(CHARGERS) + 10):
+        prompt = tools._writer_prompt("EVs", '{"sections": [{"name": "Charging", "subsections": ["fast chargers"]}]}', gathered)
+    assert "c.com" in prompt and "a.com" not in prompt
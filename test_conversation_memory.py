@@ -0,0 +1,79 @@
+import asyncio
+from unittest.mock import patch
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+import conversation_memory
+from conversation_memory import plan_fold, split_turns
+
+DUMP = "EV battery demand forecast (Source: https://example.com/ev) " * 60
+
+
+def _turn(n):
+    return [HumanMessage(content=f"Question {n}", id=f"h{n}"),
+            AIMessage(content="", id=f"c{n}",
+                      tool_calls=[{"name": "robust_search_skill", "args": {"topic": f"q{n}"}, "id": f"t{n}"}]),
+            ToolMessage(content=DUMP, tool_call_id=f"t{n}", name="robust_search_skill", id=f"r{n}"),
+            AIMessage(content=f"Answer {n}\nDetails.", id=f"a{n}")]
+
+
+def test_plan_fold_keeps_recent_turns_whole():
+    messages = [m for n in range(5) for m in _turn(n)] + [HumanMessage(content="Question 5", id="h5")]
+    assert plan_fold(messages, budget=100_000) == ([], messages)
+
+    folded, kept = plan_fold(messages, budget=2000, keep_turns=2)
+    assert [m.id for m in folded] == [m.id for n in range(3) for m in _turn(n)]
+    assert [turn[0].id for turn in split_turns(kept)] == ["h3", "h4", "h5"]
+
+    # Over budget even with the kept turns: fold those too, but never the current request
+    folded, kept = plan_fold(messages, budget=10, keep_turns=2)
+    assert [m.id for m in kept] == ["h5"]
+
+
+def _fake_agent(seen):
+    def agent(state):
+        seen.append(conversation_memory.history_tokens(state["messages"], state.get("summary") or ""))
+        return {"messages": [AIMessage(content="", tool_calls=[{"name": "robust_search_skill",
+                                                                 "args": {"topic": "x"}, "id": f"t{len(seen)}"}]),
+                             ToolMessage(content=DUMP, tool_call_id=f"t{len(seen)}", name="robust_search_skill"),
+                             AIMessage(content=f"Report {len(seen)}")]}
+    return agent
+
+
+@patch("conversation_memory.ask_groq", return_value="User researched EV batteries.")
+@patch.object(conversation_memory, "MEMORY_TOKEN_BUDGET", 3000)
+def test_react_workflow_bounds_history_with_a_rolling_summary(mock_ask_groq):
+    import app
+
+    seen = []
+    with patch.object(app, "_get_react_agent", return_value=_fake_agent(seen)):
+        graph = app.build_workflow(MemorySaver())
+    config = {"configurable": {"thread_id": "long-thread"}}
+    for n in range(8):
+        graph.invoke({"messages": [HumanMessage(content=f"Follow-up {n}")]}, config)
+
+    state = graph.get_state(config).values
+    assert state["summary"] == "User researched EV batteries."
+    assert mock_ask_groq.called
+    assert max(seen) <= 3000
+    # Older turns were removed from the checkpointed state, not just hidden from the agent
+    assert state["messages"][0].content != "Follow-up 0"
+    assert len(split_turns(state["messages"])) < 8
+    assert "Follow-up 0" in conversation_memory.summary_prompt("", [HumanMessage(content="Follow-up 0")])
+    assert "User researched EV batteries." in app._agent_prompt(state)[0].content
+
+
+@patch("conversation_memory.ask_groq_async")
+def test_failed_summary_falls_back_to_extractive(mock_ask_async):
+    async def fail(prompt, **kwargs):
+        return "[error: both Groq and Gemini fallback failed: timeout]"
+
+    mock_ask_async.side_effect = fail
+    messages = [m for n in range(4) for m in _turn(n)] + [HumanMessage(content="Question 4", id="h4")]
+    with patch.object(conversation_memory, "MEMORY_TOKEN_BUDGET", 2500):
+        update = asyncio.run(conversation_memory.asummarize_node({"messages": messages, "summary": "- earlier"}))
+
+    assert update["summary"].startswith("- earlier\n- User asked: Question 0 → Answer 0")
+    assert "[error" not in update["summary"]
+    assert {m.id for m in update["messages"]} == {m.id for n in range(2) for m in _turn(n)}
@@ -11,7 +11,7 @@ def test_fetch_thread_history_empty_on_error():
 
 def test_get_postgres_saver_context_mgr():
     """Test the context manager initializes the checkpointer correctly when mocked."""
-    with patch("db_manager.ConnectionPool") as mock_pool:
+    with patch("db_manager.psycopg"), patch("db_manager.ConnectionPool") as mock_pool:
         # Mock the context manager behavior of ConnectionPool
         mock_pool_instance = mock_pool.return_value.__enter__.return_value
         
@@ -18,3 +18,40 @@ def test_fetch_thread_history_fallback():
     # Simply let it fail naturally
     history = fetch_thread_history()
     assert history == []
+
+def test_threads_query_uses_keyset_cursor_and_escaped_search():
+    from datetime import datetime, timezone
+    from db_manager import threads_query
+
+    cursor = (datetime(2026, 3, 1, tzinfo=timezone.utc), "thread-b")
+    sql, params = threads_query(20, before=cursor, search="100%_Growth")
+    assert "(updated_at, thread_id) < (%s, %s)" in sql
+    assert sql.endswith("ORDER BY updated_at DESC, thread_id DESC LIMIT %s")
+    assert "OFFSET" not in sql and "DISTINCT" not in sql
+    assert params == ["%100\\%\\_growth%", cursor[0], "thread-b", 20]
+
+def test_setup_threads_backfills_only_when_table_is_new():
+    from db_manager import THREADS_BACKFILL, setup_threads
+
+    for existed, backfilled in ((None, True), ("threads", False)):
+        pool = MagicMock()
+        conn = pool.connection.return_value.__enter__.return_value
+        conn.execute.return_value.fetchone.return_value = (existed,)
+        setup_threads(pool)
+        statements = [c.args[0] for c in conn.execute.call_args_list]
+        assert (THREADS_BACKFILL in statements) == backfilled
+
+def test_memory_runtime_thread_index_pages_and_searches():
+    from runtime import AgentRuntime
+
+    runtime = AgentRuntime(db_uri="postgresql://nobody@127.0.0.1:1/none")
+    for i in range(5):
+        runtime.record_thread(f"t{i}", f"Report {i} on {'solar' if i % 2 else 'EV'} markets")
+    runtime.record_thread("t0", "a later title is ignored", "done")
+
+    first = runtime.list_threads(limit=2)
+    assert [t.thread_id for t in first] == ["t0", "t4"]
+    assert (first[0].title, first[0].status) == ("Report 0 on EV markets", "done")
+    after = runtime.list_threads(limit=2, before=(first[-1].updated_at, first[-1].thread_id))
+    assert [t.thread_id for t in after] == ["t3", "t2"]
+    assert [t.thread_id for t in runtime.list_threads(search="SOLAR")] == ["t3", "t1"]
@@ -0,0 +1,52 @@
+import pytest
+from disk_cache import DiskCache, make_key
+
+def test_disk_cache_roundtrip_and_counters(tmp_path):
+    cache = DiskCache(str(tmp_path / "c.db"), table="t")
+    key = make_key("model", "prompt", 0.7)
+
+    assert cache.get(key) is None
+    cache.set(key, "hello", cost=1.5)
+    assert cache.get(key) == "hello"
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["bytes_served"] == 5
+    assert stats["cost_saved"] == 1.5
+    assert stats["entries"] == 1
+
+def test_disk_cache_ttl_expiry(tmp_path, monkeypatch):
+    import disk_cache
+    clock = [1000.0]
+    monkeypatch.setattr(disk_cache.time, "time", lambda: clock[0])
+
+    cache = DiskCache(str(tmp_path / "c.db"), ttl=60)
+    cache.set("k", "v")
+    clock[0] += 30
+    assert cache.get("k") == "v"
+    clock[0] += 31
+    assert cache.get("k") is None
+
+def test_disk_cache_lru_eviction(tmp_path, monkeypatch):
+    import disk_cache
+    clock = [1000.0]
+    monkeypatch.setattr(disk_cache.time, "time", lambda: clock[0])
+
+    cache = DiskCache(str(tmp_path / "c.db"), max_bytes=20)
+    for key in ("a", "b"):
+        cache.set(key, "x" * 10)
+        clock[0] += 1
+    # Touch "a" so "b" becomes the least recently used entry
+    assert cache.get("a") is not None
+    clock[0] += 1
+    cache.set("c", "x" * 10)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+def test_disk_cache_shared_across_connections(tmp_path):
+    path = str(tmp_path / "c.db")
+    DiskCache(path).set("k", "v")
+    assert DiskCache(path).get("k") == "v"
@@ -0,0 +1,62 @@
+import os
+import threading
+import time
+
+import pytest
+
+from export_service import ExportService
+
+REPORT = "# EV Battery Outlook\n\nDemand grows **30%** a year.\n"
+
+
+def test_repeated_exports_reuse_one_artifact_per_format(tmp_path):
+    service = ExportService(str(tmp_path), workers=0)
+    first = service.export(REPORT, "html", session_id="a")
+    again = service.export(REPORT, "html", session_id="a")
+    other = service.export(REPORT, "html", session_id="b/../c")
+    markdown = service.export(REPORT, "md", session_id="a")
+
+    assert first == again and first != other
+    assert os.path.dirname(other) == str(tmp_path / "sessions" / "b_c")
+    assert os.path.samefile(first, other)
+    assert "<title>EV Battery Outlook</title>" in open(first, encoding="utf-8").read()
+    assert open(markdown, encoding="utf-8").read() == REPORT
+    stats = service.stats()
+    assert (stats["hits"], stats["misses"], stats["artifacts"]) == (2, 2, 2)
+
+    with pytest.raises(ValueError):
+        service.export(REPORT, "docx")
+
+
+def test_concurrent_exports_share_one_render_in_the_pool(tmp_path):
+    service = ExportService(str(tmp_path), workers=1)
+    paths = []
+    threads = [threading.Thread(target=lambda n=n: paths.append(service.export(REPORT, "html", f"s{n}")))
+               for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    service.close()
+
+    assert len(paths) == 4 and len(set(paths)) == 4
+    assert service.stats()["misses"] == 1
+    assert "Demand grows" in open(paths[0], encoding="utf-8").read()
+
+
+def test_cleanup_removes_idle_sessions_and_old_artifacts(tmp_path):
+    service = ExportService(str(tmp_path), workers=0, session_ttl=60, cache_ttl=3600, max_bytes=None)
+    old = service.export(REPORT, "md", session_id="old")
+    fresh = service.export(REPORT + "more", "md", session_id="fresh")
+    past = time.time() - 7200
+    os.utime(os.path.dirname(old), (past, past))
+    os.utime(service.artifact(REPORT, "md"), (past, past))
+
+    assert service.cleanup() == 2
+    assert not os.path.exists(os.path.dirname(old))
+    assert os.path.exists(fresh)
+    assert service.stats()["artifacts"] == 1
+
+    service.max_bytes = 0
+    service.cleanup()
+    assert service.stats()["artifacts"] == 0
@@ -48,3 +48,145 @@ def test_groq_success_no_fallback():
             # Assert Gemini was NOT called
             mock_gemini.assert_not_called()
             assert response == "This is a successful Groq response."
+
+def test_ask_groq_serves_repeat_prompts_from_cache():
+    """
+    Test that an identical prompt is answered from the completion cache,
+    and that use_cache=False forces a fresh call.
+    """
+    with patch("groq_client._get_client") as mock_groq_client:
+        mock_instance = MagicMock()
+        mock_response = MagicMock()
+        mock_response.choices = [MagicMock()]
+        mock_response.choices[0].message.content = "Cached answer."
+        mock_instance.chat.completions.create.return_value = mock_response
+        mock_groq_client.return_value = mock_instance
+
+        from groq_client import cache_stats
+        assert ask_groq("Plan a report", max_tokens=100) == "Cached answer."
+        assert ask_groq("Plan a report", max_tokens=100) == "Cached answer."
+        assert mock_instance.chat.completions.create.call_count == 1
+
+        # A different max_tokens is a different cache key
+        ask_groq("Plan a report", max_tokens=200)
+        assert mock_instance.chat.completions.create.call_count == 2
+
+        ask_groq("Plan a report", max_tokens=100, use_cache=False)
+        assert mock_instance.chat.completions.create.call_count == 3
+
+        stats = cache_stats()
+        assert stats["hits"] == 1
+        assert stats["tokens_saved"] > 0
+
+def test_ask_groq_does_not_cache_fallback_responses():
+    with patch("groq_client._get_client") as mock_groq_client:
+        mock_instance = MagicMock()
+        mock_instance.chat.completions.create.side_effect = Exception("HTTP 500")
+        mock_groq_client.return_value = mock_instance
+
+        with patch("groq_client._call_gemini_fallback") as mock_gemini:
+            mock_gemini.return_value = "Gemini says hi."
+            with patch("tenacity.nap.time.sleep"):
+                assert ask_groq("Uncacheable") == "Gemini says hi."
+                assert ask_groq("Uncacheable") == "Gemini says hi."
+            assert mock_gemini.call_count == 2
+
+def test_ask_groq_async_failover_to_gemini():
+    import asyncio
+    from unittest.mock import AsyncMock
+    from groq_client import ask_groq_async
+
+    with patch("groq_client._get_async_client") as mock_async_client:
+        mock_instance = MagicMock()
+        mock_instance.chat.completions.create = AsyncMock(side_effect=Exception("HTTP 503"))
+        mock_async_client.return_value = mock_instance
+
+        with patch("groq_client._call_gemini_fallback_async", new_callable=AsyncMock) as mock_gemini, \
+             patch("asyncio.sleep", new_callable=AsyncMock):
+            mock_gemini.return_value = "Async Gemini response."
+            response = asyncio.run(ask_groq_async("Tell me a joke"))
+
+        assert response == "Async Gemini response."
+        assert mock_instance.chat.completions.create.await_count == 3
+
+def _stream_chunks(*texts):
+    chunks = []
+    for text in texts:
+        chunk = MagicMock()
+        chunk.choices = [MagicMock()]
+        chunk.choices[0].delta.content = text
+        chunks.append(chunk)
+    return chunks
+
+def test_ask_groq_stream_yields_tokens_and_caches_result():
+    from groq_client import ask_groq_stream
+
+    with patch("groq_client._get_client") as mock_groq_client:
+        mock_instance = MagicMock()
+        mock_instance.chat.completions.create.return_value = iter(_stream_chunks("Hel", "lo", None))
+        mock_groq_client.return_value = mock_instance
+
+        assert list(ask_groq_stream("Stream me")) == ["Hel", "lo"]
+        assert mock_instance.chat.completions.create.call_args.kwargs["stream"] is True
+
+        # The completed stream is served from cache afterwards
+        assert ask_groq("Stream me") == "Hello"
+        assert mock_instance.chat.completions.create.call_count == 1
+
+def test_ask_groq_stream_falls_back_to_gemini_stream():
+    from groq_client import ask_groq_stream
+
+    with patch("groq_client._get_client") as mock_groq_client:
+        mock_instance = MagicMock()
+        mock_instance.chat.completions.create.side_effect = Exception("HTTP 429")
+        mock_groq_client.return_value = mock_instance
+
+        with patch("groq_client._stream_gemini_fallback") as mock_gemini, \
+             patch("tenacity.nap.time.sleep"):
+            mock_gemini.return_value = iter(["Gem", "ini"])
+            assert "".join(ask_groq_stream("Stream me")) == "Gemini"
+            mock_gemini.assert_called_once()
+
+def test_open_circuit_sends_traffic_straight_to_gemini():
+    """During a Groq outage only the call that trips the breaker touches Groq."""
+    import time
+    import circuit_breaker
+    from groq_client import breaker_stats
+
+    circuit_breaker._breakers["groq"] = circuit_breaker.CircuitBreaker("groq", min_calls=1, open_seconds=60)
+    with patch("groq_client._get_client") as mock_groq_client, \
+         patch("groq_client._call_gemini_fallback", return_value="Gemini response") as mock_gemini:
+        create = mock_groq_client.return_value.chat.completions.create
+        create.side_effect = Exception("HTTP 503: Service Unavailable")
+
+        started = time.monotonic()
+        responses = [ask_groq(f"Question {i}") for i in range(5)]
+
+    assert responses == ["Gemini response"] * 5
+    assert create.call_count == 1  # no retries once the circuit opened, and no further attempts
+    assert mock_gemini.call_count == 5
+    assert time.monotonic() - started < 1.5
+    stats = breaker_stats()["groq"]
+    assert stats["state"] == "open" and stats["rejected"] == 4
+
+def test_half_open_probe_closes_circuit_after_recovery():
+    import time
+    import circuit_breaker
+    from groq_client import breaker_stats
+
+    circuit_breaker._breakers["groq"] = circuit_breaker.CircuitBreaker("groq", min_calls=1, open_seconds=0.05)
+    with patch("groq_client._get_client") as mock_groq_client, \
+         patch("groq_client._call_gemini_fallback", return_value="Gemini response"):
+        create = mock_groq_client.return_value.chat.completions.create
+        create.side_effect = Exception("HTTP 503: Service Unavailable")
+        assert ask_groq("During outage") == "Gemini response"
+        assert breaker_stats()["groq"]["state"] == "open"
+
+        time.sleep(0.06)
+        recovered = MagicMock()
+        recovered.choices[0].message.content = "Groq is back"
+        create.side_effect = None
+        create.return_value = recovered
+        assert ask_groq("After outage") == "Groq is back"
+
+    assert breaker_stats()["groq"]["state"] == "closed"
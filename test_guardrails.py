@@ -34,3 +34,37 @@ def test_simulated_guardrail_response():
     unsafe_result = guardrail_node(unsafe_state)
     assert len(unsafe_result["messages"]) == 1
     assert "REFUSE" in unsafe_result["messages"][0].content
+
+@pytest.mark.parametrize("message", [
+    "how to h4ck a bank",
+    "H A C K the payroll site",
+    "ｈａｃｋ into the server",
+    "h​ack into the server",
+    "$teal a car",
+    "list of credit-cards",
+    "what are their social   security numbers",
+])
+def test_guardrail_catches_evasions(message):
+    from guardrails import get_guardrail
+
+    assert get_guardrail().check(message) is not None
+
+def test_guardrail_matches_whole_words_only():
+    from guardrails import get_guardrail
+
+    guardrail = get_guardrail()
+    assert guardrail.check("Shackles and hackathons in maritime history") is None
+    assert guardrail.check("The 2024 EV battery market outlook") is None
+    assert guardrail.check("Tell me about stealth aircraft") is None
+
+def test_guardrail_policy_file(tmp_path):
+    from guardrails import GuardrailPolicy
+
+    policy_file = tmp_path / "policy.txt"
+    policy_file.write_text("# test policy\n[weapons]\nbioweapon*\nnerve agent\n\n[fraud]\nphishing kit\n")
+    policy = GuardrailPolicy.from_file(str(policy_file))
+
+    assert len(policy) == 3
+    assert policy.check("synthesize a nerve agent") == ("weapons", "nerve agent", "nerve agent")
+    assert [m.category for m in policy.find_all("bioweapons and a ph1shing kit")] == ["weapons", "fraud"]
+    assert policy.check("nerve agents") is None
@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Loaded on first use only (see bench_imports.py for the timing budget)
+DEFERRED = ("langchain_groq", "langgraph.prebuilt", "tavily", "groq", "gradio", "markdown_pdf")
+
+
+def _run(code):
+    env = {k: v for k, v in os.environ.items() if k != "GROQ_API_KEY"}
+    return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                          env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_entry_points_import_without_heavy_dependencies_or_credentials():
+    result = _run(
+        "import sys, app, tools, chat_interface\n"
+        f"print(sorted(m for m in sys.modules if any(m == d or m.startswith(d + '.') for d in {DEFERRED!r})))"
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]"
+
+
+def test_models_and_clients_are_built_on_first_use():
+    result = _run(
+        "from langgraph.checkpoint.memory import MemorySaver\n"
+        "import app\n"
+        "app.build_workflow(MemorySaver(), mode='pipeline')\n"
+        "try:\n"
+        "    app.build_workflow(MemorySaver(), mode='react')\n"
+        "except EnvironmentError as e:\n"
+        "    print('react needs', e)\n"
+    )
+    assert result.returncode == 0, result.stderr
+    assert "GROQ_API_KEY" in result.stdout
+
+
+def test_lazy_attributes_resolve_once(monkeypatch):
+    import app
+
+    monkeypatch.delitem(app.__dict__, "react_agent", raising=False)
+    agent = app.react_agent
+    assert app.react_agent is agent and app._get_react_agent() is agent
+    with pytest.raises(AttributeError):
+        app.not_an_attribute
@@ -0,0 +1,87 @@
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from jobs import DONE, FAILED, RUNNING, JobQueue, WorkerPool, run_job
+
+@pytest.fixture
+def queue(tmp_path):
+    q = JobQueue(str(tmp_path / "jobs.db"))
+    yield q
+    q.close()
+
+def test_each_job_is_claimed_by_exactly_one_worker(tmp_path, queue):
+    for i in range(20):
+        queue.enqueue(f"topic {i}")
+    claimed = []
+
+    def worker(name):
+        # One connection per worker, as separate processes would have
+        own = JobQueue(queue.path)
+        while (job := own.claim(name)) is not None:
+            claimed.append(job.id)
+        own.close()
+
+    threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(claimed) == list(range(1, 21))
+    assert queue.stats() == {RUNNING: 20}
+
+def test_silent_workers_jobs_are_requeued(queue):
+    job = queue.enqueue("EV outlook", thread_id="thread-1")
+    assert queue.claim("w1").id == job.id
+    assert queue.requeue_stale(stale_after=60) == 0
+    queue._conn.execute("UPDATE jobs SET heartbeat_at = heartbeat_at - 120")
+    assert queue.requeue_stale(stale_after=60) == 1
+
+    retry = queue.claim("w2")
+    assert (retry.id, retry.worker, retry.attempts) == (job.id, "w2", 2)
+
+    # A job that keeps killing its worker fails once it has used up its attempts
+    queue._conn.execute("UPDATE jobs SET heartbeat_at = heartbeat_at - 120")
+    assert queue.requeue_stale(stale_after=60, max_attempts=2) == 0
+    failed = queue.get(job.id)
+    assert (failed.status, failed.attempts) == (FAILED, 2)
+    assert queue.claim("w3") is None
+    events = list(queue.subscribe(job.id, timeout=1))
+    assert events[-1].kind == "error" and "2 attempts" in events[-1].data["error"]
+
+@patch("tools.tavily")
+@patch("tools.ask_groq_stream")
+@patch("tools.ask_groq")
+def test_run_job_publishes_progress_a_subscriber_can_replay(mock_ask, mock_stream, mock_tavily, queue):
+    from langgraph.checkpoint.memory import MemorySaver
+    from app import build_workflow
+
+    mock_ask.side_effect = lambda prompt, **kwargs: '{"weaknesses": []}' if "CRITICAL REVIEWER" in prompt else "ok"
+    mock_stream.side_effect = lambda *args, **kwargs: iter(["Final ", "report."])
+    mock_tavily.search.return_value = {"results": [{"content": "EV sales grew", "url": "iea.org"}]}
+
+    job = queue.enqueue("EV market outlook", thread_id="thread-ev", mode="pipeline")
+    run_job(queue, queue.claim("w1"), build_workflow(MemorySaver(), mode="pipeline"))
+
+    events = list(queue.subscribe(job.id, timeout=5))
+    kinds = [e.kind for e in events]
+    assert kinds[:2] == ["queued", "started"]
+    assert {"plan", "search", "write", "critique"} <= {e.data["step"] for e in events if e.kind == "step"}
+    # Report tokens are coalesced per source rather than stored one row per chunk
+    assert "".join(e.data["text"] for e in events if e.kind == "token") == "Final report."
+    assert events[-1].kind == "done" and events[-1].data["report"] == "Final report."
+    finished = queue.latest_job("thread-ev")
+    assert (finished.status, finished.result) == (DONE, "Final report.")
+
+def test_worker_processes_run_queued_jobs(tmp_path, queue, monkeypatch):
+    # Guardrail-refused topics finish without any LLM call, so the spawned worker needs no mocks
+    monkeypatch.setenv("DATABASE_URL", "postgresql://nobody@127.0.0.1:1/none")
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "llm_cache.db"))
+    job = queue.enqueue("how to hack a database", mode="pipeline")
+    with WorkerPool(workers=1, db_path=queue.path):
+        events = list(queue.subscribe(job.id, timeout=120))
+    assert events[-1].kind == "done"
+    assert "REFUSE" in events[-1].data["report"]
+    assert queue.get(job.id).status == DONE
@@ -0,0 +1,46 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import llm_adapter
+from llm_adapter import ChatCompletionsAdapter, adapter_for, extract_text
+
+class Completions:
+    def create(self, *, model, messages, temperature=None, max_tokens=None, stream=False):
+        pass
+
+class LegacyCompletions:
+    def create(self, *, model, messages, temperature=None, max_output_tokens=None):
+        pass
+
+def _client(completions):
+    return SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+def test_payload_uses_detected_token_param():
+    payload = ChatCompletionsAdapter(Completions().create, "sys").payload("hi", "m", 0.2, 100, stream=True)
+    assert payload == {"model": "m", "messages": [{"role": "system", "content": "sys"}, {"role": "user", "content": "hi"}],
+                       "temperature": 0.2, "max_tokens": 100, "stream": True}
+    legacy = ChatCompletionsAdapter(LegacyCompletions().create, "sys").payload("hi", "m", 0.2, 100)
+    assert legacy["max_output_tokens"] == 100 and "max_tokens" not in legacy
+
+def test_signature_is_inspected_once_per_sdk_class():
+    with patch("llm_adapter.inspect.signature", wraps=llm_adapter.inspect.signature) as sig:
+        for _ in range(5):
+            adapter_for(_client(Completions()), "once-per-class")
+    assert sig.call_count == 1
+
+def test_extractor_is_learned_per_response_type():
+    class LegacyResponse:
+        def __init__(self, text):
+            self.choices = [SimpleNamespace(text=text)]
+
+    assert extract_text(LegacyResponse("first")) == "first"
+    assert llm_adapter._extractors[LegacyResponse] is llm_adapter._SHAPES[1]
+    assert extract_text(LegacyResponse("second")) == "second"
+
+def test_groq_chat_completion_uses_typed_extractor():
+    from groq.types.chat import ChatCompletion
+    resp = ChatCompletion.model_validate({
+        "id": "1", "object": "chat.completion", "created": 0, "model": "m",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "typed"}}],
+    })
+    assert extract_text(resp) == "typed"
@@ -0,0 +1,87 @@
+import threading
+from unittest.mock import patch
+
+import pytest
+from groq import Groq
+
+import groq_client
+import llm_batch
+from fake_batch_server import FakeBatchServer
+from llm_batch import BatchCollector, BatchJobError, GroqBatchBackend
+
+def _collector(server, **kwargs):
+    client = Groq(api_key="test", base_url=server.url, max_retries=0)
+    kwargs.setdefault("flush_seconds", 0.1)
+    kwargs.setdefault("poll_seconds", 0.05)
+    return BatchCollector(GroqBatchBackend(client), **kwargs)
+
+def _body(prompt):
+    return {"model": "test-model", "messages": [{"role": "user", "content": prompt}]}
+
+@pytest.fixture
+def batch_mode(monkeypatch):
+    """Route groq_client through a collector on a local fake batch server."""
+    with FakeBatchServer(responder=lambda body: f"batched: {body['messages'][-1]['content']}") as server:
+        collector = _collector(server)
+        monkeypatch.setattr(groq_client, "LLM_BATCH", True)
+        monkeypatch.setattr(groq_client, "_batch", collector)
+        yield server, collector
+        collector.close()
+
+def test_concurrent_requests_share_one_batch_file():
+    with FakeBatchServer(responder=lambda body: body["messages"][-1]["content"].upper()) as server:
+        collector = _collector(server)
+        results = {}
+
+        def worker(i):
+            results[i] = collector.submit(_body(f"prompt {i}")).result(timeout=10)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        collector.close()
+
+    assert {i: llm_batch.completion_text(r) for i, r in results.items()} == {i: f"PROMPT {i}" for i in range(6)}
+    assert len(server.batches) == 1
+    assert collector.stats()["completed"] == 6
+
+def test_full_batches_flush_early_and_failures_reach_callers():
+    def responder(body):
+        if "bad" in body["messages"][-1]["content"]:
+            raise ValueError("model overloaded")
+        return "ok"
+
+    with FakeBatchServer(responder=responder) as server:
+        collector = _collector(server, max_requests=2, flush_seconds=30)
+        good, bad = collector.submit(_body("good")), collector.submit(_body("bad"))
+        assert llm_batch.completion_text(good.result(timeout=10)) == "ok"
+        with pytest.raises(BatchJobError, match="model overloaded"):
+            bad.result(timeout=10)
+        collector.close()
+
+    with FakeBatchServer(status="expired") as server:
+        collector = _collector(server)
+        with pytest.raises(BatchJobError, match="expired"):
+            collector.submit(_body("late")).result(timeout=10)
+        collector.close()
+
+def test_ask_groq_and_streams_go_through_the_batch(batch_mode):
+    import asyncio
+    import tools
+
+    server, collector = batch_mode
+    # tools.py is unchanged: its skills reach the batch through ask_groq / ask_groq_stream
+    plan = tools._expert_planner("EV outlook")
+    assert plan.startswith("batched: ") and "Task: EV outlook" in plan
+    assert list(groq_client.ask_groq_stream("write it", use_cache=False)) == ["batched: write it"]
+    assert asyncio.run(groq_client.ask_groq_async("async prompt")) == "batched: async prompt"
+    assert collector.stats()["completed"] == 3
+
+def test_failed_batch_request_falls_back_to_interactive(batch_mode):
+    server, collector = batch_mode
+    server.responder = lambda body: (_ for _ in ()).throw(ValueError("rejected"))
+    with patch("groq_client._groq_complete", return_value="interactive answer") as interactive:
+        assert groq_client.ask_groq("hello") == "interactive answer"
+    interactive.assert_called_once()
@@ -0,0 +1,93 @@
+import sqlite3
+import time
+from typing import Annotated, TypedDict
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.graph import StateGraph
+from langgraph.graph.message import add_messages
+
+from payload_store import REF_PREFIX, PayloadSerializer, PayloadStore
+
+DUMP = "Source: https://example.com/ev\n" + "lithium supply outlook " * 400
+
+
+class ChatState(TypedDict):
+    messages: Annotated[list, add_messages]
+
+
+def _graph(checkpointer):
+    def search(state):
+        n = len(state["messages"])
+        call = AIMessage("", tool_calls=[{"name": "robust_search_skill", "args": {"query": "ev"}, "id": f"c{n}"}])
+        return {"messages": [call, ToolMessage(DUMP, tool_call_id=f"c{n}")]}
+
+    builder = StateGraph(ChatState)
+    builder.add_node("search", search)
+    builder.set_entry_point("search")
+    return builder.compile(checkpointer=checkpointer)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PayloadStore(str(tmp_path / "payloads.db"))
+    yield store
+    store.close()
+
+
+def test_large_payloads_are_stored_once_and_rehydrated(tmp_path, store):
+    conn = sqlite3.connect(str(tmp_path / "checkpoints.db"), check_same_thread=False)
+    graph = _graph(SqliteSaver(conn, serde=PayloadSerializer(store)))
+    config = {"configurable": {"thread_id": "t"}}
+    for _ in range(3):
+        graph.invoke({"messages": [HumanMessage("EV outlook")]}, config)
+
+    messages = graph.get_state(config).values["messages"]
+    assert [m.content for m in messages if m.type == "tool"] == [DUMP] * 3
+    assert store.stats()["entries"] == 1
+    blobs = [row[0] for row in conn.execute("SELECT checkpoint FROM checkpoints UNION ALL SELECT value FROM writes")]
+    assert not any(b"lithium supply outlook" in blob for blob in blobs)
+    assert any(REF_PREFIX.encode() in blob for blob in blobs)
+    conn.close()
+
+
+def test_serializer_leaves_inputs_alone_and_reads_plain_data(store):
+    serde = PayloadSerializer(store, min_chars=100)
+    message = ToolMessage(DUMP, tool_call_id="c1")
+    state = {"messages": [message], "draft": DUMP, "topic": "short"}
+
+    type_, data = serde.dumps_typed(state)
+    assert type_ == "msgpack+payloads" and len(data) < 1000
+    assert message.content == DUMP and state["draft"] == DUMP
+    loaded = serde.loads_typed((type_, data))
+    assert loaded["messages"][0].content == DUMP and loaded["draft"] == DUMP
+
+    plain = JsonPlusSerializer().dumps_typed(state)
+    assert serde.loads_typed(plain)["draft"] == DUMP
+    assert serde.dumps_typed({"topic": "short"})[0] == "msgpack"
+
+
+def test_compaction_sweeps_payloads_of_deleted_threads(tmp_path, store):
+    from compaction import compact_sqlite
+
+    path = str(tmp_path / "checkpoints.db")
+    conn = sqlite3.connect(path, check_same_thread=False)
+    serde = PayloadSerializer(store)
+    graph = _graph(SqliteSaver(conn, serde=serde))
+    graph.invoke({"messages": [HumanMessage("EV outlook")]}, {"configurable": {"thread_id": "old"}})
+    serde.dumps_typed("orphaned " * 1000)
+    assert store.stats()["entries"] == 2
+
+    later = time.time() + 2 * 86400
+    kept = compact_sqlite(path, keep_last=1, retention_days=0, min_idle_seconds=0, payloads=store, now=later)
+    assert kept["payloads"] == 0  # within the sweep grace period
+    store._conn.execute("UPDATE payloads SET touched_at = touched_at - 7200")
+    store._conn.commit()
+    kept = compact_sqlite(path, keep_last=1, retention_days=0, min_idle_seconds=0, payloads=store, now=later)
+    assert kept["payloads"] == 1 and store.stats()["entries"] == 1
+    expired = compact_sqlite(path, keep_last=1, retention_days=1, min_idle_seconds=0, payloads=store, now=later)
+    assert expired["expired"] == 1 and expired["payloads"] == 1
+    assert store.stats()["entries"] == 0
+    conn.close()
@@ -0,0 +1,120 @@
+import asyncio
+import time
+from unittest.mock import MagicMock, patch
+
+from provider_router import ProviderRouter
+
+def _sleeper(seconds, value):
+    def call():
+        time.sleep(seconds)
+        return value
+    return call
+
+def test_hedges_slow_primary_and_takes_first_answer():
+    router = ProviderRouter(["primary", "secondary"], initial_delay=0.05)
+    started = time.monotonic()
+    result = router.run({"primary": _sleeper(0.5, "slow"), "secondary": _sleeper(0.01, "fast")})
+    assert result == ("fast", "secondary")
+    assert time.monotonic() - started < 0.3
+    stats = router.stats()
+    assert stats["secondary"]["hedges"] == 1 and stats["secondary"]["hedge_wins"] == 1
+    assert stats["primary"]["cancelled"] == 1
+
+def test_fails_over_immediately_on_error():
+    router = ProviderRouter(["primary", "secondary"], initial_delay=5)
+    started = time.monotonic()
+    result = router.run({"primary": lambda: "[error: boom]", "secondary": lambda: "ok"})
+    assert result == ("ok", "secondary")
+    assert time.monotonic() - started < 0.5
+    assert router.stats()["secondary"]["hedges"] == 0
+
+def test_returns_last_error_when_every_provider_fails():
+    def boom():
+        raise RuntimeError("down")
+    router = ProviderRouter(["primary", "secondary"], initial_delay=5)
+    assert router.run({"primary": boom, "secondary": lambda: "[error: gemini down]"}) == ("[error: gemini down]", "secondary")
+
+def test_learns_hedge_deadline_from_p95():
+    router = ProviderRouter(["primary", "secondary"], initial_delay=10, min_delay=0)
+    assert router.hedge_delay("primary", "k") == 10
+    for _ in range(20):
+        router.run({"primary": _sleeper(0.005, "ok"), "secondary": lambda: "unused"}, key="k")
+    assert router.hedge_delay("primary", "k") < 0.1
+    assert router.hedge_delay("primary", "other-size") == 10
+
+def test_routes_around_a_degraded_provider():
+    router = ProviderRouter(["primary", "secondary"], hedge=False)
+    for _ in range(5):
+        router.run({"primary": lambda: "[error: 503]", "secondary": lambda: "ok"})
+    assert router.order(["primary", "secondary"]) == ["secondary", "primary"]
+    calls = []
+    router.run({"primary": lambda: calls.append("primary") or "p", "secondary": lambda: calls.append("secondary") or "s"})
+    assert calls == ["secondary"]
+    assert router.stats()["secondary"]["preferred"] is True
+
+def test_async_hedge_cancels_the_loser():
+    router = ProviderRouter(["primary", "secondary"], initial_delay=0.05)
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return "slow"
+
+    async def fast():
+        return "fast"
+
+    result = asyncio.run(router.arun({"primary": slow, "secondary": fast}))
+    assert result == ("fast", "secondary")
+    assert cancelled == [True]
+
+def test_ask_groq_hedges_to_gemini_without_caching_it():
+    import groq_client
+    from groq_client import ask_groq, cache_stats
+
+    def slow_create(**kwargs):
+        time.sleep(0.4)
+        resp = MagicMock()
+        resp.choices[0].message.content = "groq answer"
+        return resp
+
+    with patch("groq_client._get_client") as mock_client, \
+         patch("groq_client._call_gemini_fallback", return_value="gemini answer") as mock_gemini:
+        mock_client.return_value.chat.completions.create.side_effect = slow_create
+        groq_client._router = ProviderRouter(["groq", "gemini"], initial_delay=0.05)
+
+        assert ask_groq("Hedge me") == "gemini answer"
+        mock_gemini.assert_called_once_with("Hedge me")
+
+    assert cache_stats()["entries"] == 0
+    assert groq_client.provider_stats()["gemini"]["hedge_wins"] == 1
+
+def test_waiting_for_groq_quota_does_not_trigger_hedges():
+    import groq_client
+    import rate_limiter
+    from concurrent.futures import ThreadPoolExecutor
+    from groq_client import ask_groq
+
+    resp = MagicMock()
+    resp.choices[0].message.content = "groq answer"
+    resp.usage.total_tokens = 10
+    limiter = rate_limiter.get_limiter("groq", "m3")
+    limiter.requests = rate_limiter.TokenBucket(600)  # one request every 100ms
+    limiter.requests.level = 0
+
+    with patch("groq_client._get_client") as mock_client, \
+         patch("groq_client._call_gemini_fallback", return_value="gemini answer") as mock_gemini:
+        mock_client.return_value.chat.completions.create.return_value = resp
+        groq_client._router = ProviderRouter(["groq", "gemini"], initial_delay=0.05)
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            answers = list(pool.map(lambda n: ask_groq(f"Burst {n}", model="m3", use_cache=False), range(5)))
+
+    assert answers == ["groq answer"] * 5
+    assert rate_limiter.stats()["groq:m3"]["max_wait"] > 0.3
+    mock_gemini.assert_not_called()
+    stats = groq_client.provider_stats()
+    assert stats["groq"]["hedges"] + stats["gemini"]["hedges"] == 0
+    assert stats["groq"]["p95"] < 0.05 and stats["groq"]["preferred"] is True
@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import httpx
+
+import rate_limiter
+from rate_limiter import RateLimiter, _parse_duration
+
+def test_parse_duration_handles_provider_formats():
+    assert _parse_duration("7.66s") == 7.66
+    assert abs(_parse_duration("2m59.56s") - 179.56) < 1e-9
+    assert _parse_duration("120ms") == 0.12
+    assert _parse_duration("30") == 30.0
+    assert _parse_duration(None) is None
+
+def test_threads_are_released_in_arrival_order():
+    limiter = RateLimiter("test", rpm=6000)  # refills one request every 10ms
+    limiter.requests.level = 0
+    limiter.update_from_headers({"retry-after": "60"})  # hold the queue while it fills
+    order = []
+
+    def worker(i):
+        limiter.acquire()
+        order.append(i)
+
+    threads = []
+    for i in range(5):
+        t = threading.Thread(target=worker, args=(i,))
+        t.start()
+        threads.append(t)
+        while limiter.stats()["queue_depth"] < i + 1:
+            time.sleep(0.001)
+    with limiter._lock:
+        limiter._paused_until = 0.0
+        limiter._turn.notify_all()
+    for t in threads:
+        t.join(timeout=2)
+
+    assert order == [0, 1, 2, 3, 4]
+    stats = limiter.stats()
+    assert stats["granted"] == 5 and stats["queue_depth"] == 0
+    assert stats["waited"] == 5 and stats["max_wait"] >= 0.03
+
+def test_token_bucket_paces_large_requests():
+    limiter = RateLimiter("test", tpm=60000)  # 1000 tokens/s
+    started = time.monotonic()
+    limiter.acquire(60000)
+    limiter.acquire(100)
+    assert time.monotonic() - started >= 0.09
+
+def test_headers_pause_and_clamp_buckets():
+    limiter = RateLimiter("test", rpm=30, tpm=8000)
+    limiter.update_from_headers({"x-ratelimit-limit-tokens": "6000", "x-ratelimit-remaining-tokens": "1200"})
+    assert limiter.tokens.capacity == 6000 and limiter.tokens.level <= 1201
+
+    limiter.update_from_headers({"retry-after": "0.1"})
+    started = time.monotonic()
+    limiter.acquire(10)
+    assert time.monotonic() - started >= 0.08
+    assert limiter.stats()["throttled"] == 1
+
+def test_async_tasks_share_the_queue():
+    limiter = RateLimiter("test", rpm=6000)
+    limiter.requests.level = 0
+
+    async def main():
+        order = []
+
+        async def task(i):
+            await limiter.aacquire()
+            order.append(i)
+
+        tasks = []
+        for i in range(3):
+            tasks.append(asyncio.create_task(task(i)))
+            await asyncio.sleep(0.002)
+        assert limiter.stats()["queue_depth"] >= 1
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(main()) == [0, 1, 2]
+
+def test_cancelled_waiter_leaves_the_queue():
+    limiter = RateLimiter("test", rpm=60)
+    limiter.requests.level = 0
+
+    async def main():
+        with_timeout = asyncio.wait_for(limiter.aacquire(), timeout=0.05)
+        try:
+            await with_timeout
+        except asyncio.TimeoutError:
+            pass
+
+    asyncio.run(main())
+    assert limiter.stats()["queue_depth"] == 0
+
+def test_response_hook_updates_the_models_limiter():
+    request = httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions",
+                            json={"model": "m1", "messages": []})
+    response = httpx.Response(429, headers={"retry-after": "2"}, request=request)
+    rate_limiter.response_hook("groq")(response)
+    assert rate_limiter.stats()["groq:m1"]["paused_for"] > 1.5
+
+def test_ask_groq_waits_for_quota_and_settles_usage():
+    from groq_client import ask_groq
+    with patch("groq_client._get_client") as mock_client:
+        resp = MagicMock()
+        resp.choices[0].message.content = "ok"
+        resp.usage.total_tokens = 40
+        mock_client.return_value.chat.completions.create.return_value = resp
+        limiter = rate_limiter.get_limiter("groq", "m2")
+        before = limiter.tokens.level
+
+        assert ask_groq("x" * 400, model="m2", max_tokens=100, use_cache=False) == "ok"
+
+    stats = rate_limiter.stats()["groq:m2"]
+    assert stats["granted"] == 1
+    # Charged the estimate (200) first, then refunded down to the 40 tokens billed
+    assert before - limiter.tokens.level < 45
@@ -0,0 +1,110 @@
+from unittest.mock import patch
+from langgraph.checkpoint.memory import MemorySaver
+from runtime import AgentRuntime
+
+def test_runtime_builds_graph_once():
+    """The compiled graph and its checkpointer are reused across messages."""
+    with patch("db_manager.open_postgres_pool") as mock_open_pool, \
+         patch("db_manager.PostgresSaver") as mock_saver, \
+         patch("app.build_workflow") as mock_build:
+        runtime = AgentRuntime().start()
+
+        assert runtime.graph is runtime.graph
+        assert runtime.backend == "postgres"
+        mock_open_pool.assert_called_once()
+        mock_saver.return_value.setup.assert_called_once()
+        mock_build.assert_called_once_with(mock_saver.return_value, mode="react")
+
+        runtime.shutdown()
+        mock_open_pool.return_value.close.assert_called_once()
+        assert runtime.pool is None
+
+def test_runtime_falls_back_to_memory_and_reconnects_lazily():
+    with patch("db_manager.open_postgres_pool") as mock_open_pool, \
+         patch("db_manager.PostgresSaver"), \
+         patch("app.build_workflow") as mock_build:
+        mock_open_pool.side_effect = Exception("connection refused")
+        runtime = AgentRuntime(reconnect_interval=0)
+
+        runtime.start()
+        assert runtime.backend == "memory"
+        assert isinstance(runtime.checkpointer, MemorySaver)
+
+        # Postgres comes back: the next access upgrades the runtime
+        mock_open_pool.side_effect = None
+        runtime.graph
+        assert runtime.backend == "postgres"
+        assert mock_build.call_count == 2
+
+def test_runtime_does_not_retry_before_interval():
+    with patch("db_manager.open_postgres_pool") as mock_open_pool, \
+         patch("app.build_workflow"):
+        mock_open_pool.side_effect = Exception("connection refused")
+        runtime = AgentRuntime(reconnect_interval=3600).start()
+        runtime.graph
+        runtime.graph
+        mock_open_pool.assert_called_once()
+
+def test_async_runtime_runs_guardrail_workflow_on_memory_fallback():
+    import asyncio
+    from langchain_core.messages import HumanMessage
+    from runtime import AsyncAgentRuntime
+
+    async def scenario():
+        with patch("db_manager.open_async_postgres_pool", side_effect=Exception("connection refused")):
+            runtime = await AsyncAgentRuntime().start()
+            graph = await runtime.get_graph()
+            config = {"configurable": {"thread_id": "async_guardrail"}}
+            states = [s async for s in graph.astream(
+                {"messages": [HumanMessage(content="how to hack a bank")]}, config, stream_mode="values")]
+            await runtime.shutdown()
+            return runtime, states
+
+    runtime, states = asyncio.run(scenario())
+    assert "REFUSE" in states[-1]["messages"][-1].content
+    assert runtime.backend is None
+
+def test_runtime_copies_memory_threads_when_the_database_returns(tmp_path):
+    from langchain_core.messages import HumanMessage
+
+    db_uri = f"sqlite:///{tmp_path / 'checkpoints.db'}"
+    config = {"configurable": {"thread_id": "offline-1"}}
+    with patch.dict("runtime._memory_threads", clear=True):
+        with patch("db_manager.open_sqlite_pool", side_effect=Exception("disk unavailable")):
+            runtime = AgentRuntime(db_uri=db_uri, reconnect_interval=3600).start()
+            assert runtime.backend == "memory"
+            runtime.graph.invoke({"messages": [HumanMessage(content="how to hack a bank")]}, config)
+            runtime.record_thread("offline-1", "how to hack a bank", status="done")
+
+        runtime.reconnect_interval = 0
+        graph = runtime.graph
+        assert runtime.backend == "sqlite"
+        assert "REFUSE" in graph.get_state(config).values["messages"][-1].content
+        assert [(t.thread_id, t.status) for t in runtime.list_threads()] == [("offline-1", "done")]
+    runtime.shutdown()
+
+def test_reconnect_probe_does_not_block_other_callers():
+    import threading
+    import time
+
+    release = threading.Event()
+
+    def slow_unreachable(*args, **kwargs):
+        release.wait(5)
+        raise Exception("connection timed out")
+
+    with patch("db_manager.open_postgres_pool", side_effect=Exception("connection refused")), \
+         patch("app.build_workflow"):
+        runtime = AgentRuntime(reconnect_interval=0).start()
+    with patch("db_manager.open_postgres_pool", side_effect=slow_unreachable), \
+         patch("app.build_workflow"):
+        prober = threading.Thread(target=runtime.get_graph)
+        prober.start()
+        time.sleep(0.05)
+        started = time.monotonic()
+        runtime.get_graph()
+        assert runtime.get_pool() is None
+        assert time.monotonic() - started < 1
+        release.set()
+        prober.join()
+    assert runtime.backend == "memory"
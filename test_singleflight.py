@@ -0,0 +1,51 @@
+import asyncio
+import threading
+import time
+
+from singleflight import SingleFlight
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight("test")
+    calls = []
+
+    def work():
+        calls.append(1)
+        time.sleep(0.1)
+        return "result"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", work))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"executed": 1, "shared": 4, "in_flight": 0}
+    # The key is released once the call finishes
+    assert flight.do("k", lambda: "again") == "again"
+
+def test_async_waiters_share_result_and_errors():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def failing():
+        await asyncio.sleep(0.05)
+        raise ValueError("upstream down")
+
+    async def main():
+        results = await asyncio.gather(*[flight.ado("k", work) for _ in range(4)])
+        errors = await asyncio.gather(*[flight.ado("bad", failing) for _ in range(3)], return_exceptions=True)
+        return results, errors
+
+    results, errors = asyncio.run(main())
+    assert results == ["result"] * 4
+    assert len(calls) == 1
+    assert all(isinstance(e, ValueError) for e in errors)
+    assert flight.stats()["in_flight"] == 0
@@ -0,0 +1,77 @@
+import asyncio
+import threading
+from datetime import datetime, timezone
+
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+
+from runtime import AgentRuntime, AsyncAgentRuntime
+from sqlite_saver import PooledSqliteSaver, SqliteConnectionPool
+
+
+def test_sqlite_runtime_persists_reports_and_threads_across_restarts(tmp_path):
+    db_uri = f"sqlite:///{tmp_path / 'checkpoints.db'}"
+    config = {"configurable": {"thread_id": "report-1"}}
+    runtime = AgentRuntime(db_uri=db_uri).start()
+    assert runtime.backend == "sqlite"
+    runtime.graph.invoke({"messages": [HumanMessage(content="how to hack a bank")]}, config)
+    runtime.record_thread("report-1", "how to hack a bank", status="done")
+    runtime.record_thread("report-2", "EV battery market")
+    runtime.shutdown()
+
+    restarted = AgentRuntime(db_uri=db_uri).start()
+    assert "REFUSE" in restarted.graph.get_state(config).values["messages"][-1].content
+    first = restarted.list_threads(limit=1)
+    assert [t.thread_id for t in first] == ["report-2"]
+    second = restarted.list_threads(limit=1, before=(first[-1].updated_at, first[-1].thread_id))
+    assert [(t.thread_id, t.status) for t in second] == [("report-1", "done")]
+    assert [t.thread_id for t in restarted.list_threads(search="battery")] == ["report-2"]
+    assert isinstance(second[0].updated_at, datetime) and second[0].updated_at.tzinfo == timezone.utc
+    restarted.shutdown()
+
+
+def test_pool_gives_each_thread_a_tuned_connection(tmp_path):
+    pool = SqliteConnectionPool(str(tmp_path / "checkpoints.db"), busy_timeout=2)
+    saver = PooledSqliteSaver(pool)
+    saver.setup()
+
+    def write(n):
+        for i in range(20):
+            checkpoint = empty_checkpoint()
+            saver.put({"configurable": {"thread_id": f"t{n}", "checkpoint_ns": ""}}, checkpoint,
+                      {"step": i}, {})
+
+    workers = [threading.Thread(target=write, args=(n,)) for n in range(6)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    conn = pool.connection()
+    assert conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0] == 120
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 2000
+    assert pool.stats()["connections"] >= 2
+    pool.close()
+
+
+def test_async_runtime_runs_on_sqlite(tmp_path):
+    db_uri = f"sqlite:///{tmp_path / 'checkpoints.db'}"
+
+    async def scenario():
+        runtime = await AsyncAgentRuntime(db_uri=db_uri).start()
+        assert runtime.backend == "sqlite"
+        config = {"configurable": {"thread_id": "async-1"}}
+        graph = await runtime.get_graph()
+        await graph.ainvoke({"messages": [HumanMessage(content="how to hack a bank")]}, config)
+        await runtime.record_thread("async-1", "how to hack a bank", status="done")
+        state = await graph.aget_state(config)
+        threads = await runtime.list_threads()
+        await runtime.shutdown()
+        return runtime, state, threads
+
+    runtime, state, threads = asyncio.run(scenario())
+    assert "REFUSE" in state.values["messages"][-1].content
+    assert [t.thread_id for t in threads] == ["async-1"]
+    assert runtime.backend is None
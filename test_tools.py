@@ -39,3 +39,246 @@ def test_report_writer_skill(mock_ask_groq):
     assert "Final robust report." in result
     mock_ask_groq.assert_called_once()
 
+
+@patch("tools.tavily")
+def test_run_searches_preserves_query_order(mock_tavily_instance):
+    import time
+
+    def slow_first(query, **kwargs):
+        # The first query finishes last; results must still come back in query order
+        time.sleep(0.2 if query == "q0" else 0.01)
+        return {"results": [{"content": f"Result {query}", "url": "test.com"}]}
+
+    mock_tavily_instance.search.side_effect = slow_first
+    from tools import run_searches
+    results = run_searches(["q0", "q1", "q2"], max_workers=3)
+
+    assert [r[0].split(" (")[0] for r in results] == ["Result q0", "Result q1", "Result q2"]
+
+@patch("tools.tavily")
+def test_run_searches_isolates_errors_and_timeouts(mock_tavily_instance):
+    import time
+
+    def flaky(query, **kwargs):
+        if query == "boom":
+            raise RuntimeError("HTTP 500")
+        if query == "hang":
+            time.sleep(2)
+        return {"results": [{"content": "ok", "url": "test.com"}]}
+
+    mock_tavily_instance.search.side_effect = flaky
+    from tools import run_searches
+    results = run_searches(["boom", "fine", "hang"], max_workers=3, timeout=0.2)
+
+    assert results[0] == ["[search_error: boom] HTTP 500"]
+    assert results[1] == ["ok (Source: test.com)"]
+    assert results[2] == ["[search_error: hang] timed out after 0.2s"]
+
+def test_normalize_query_ignores_case_stopwords_and_order():
+    from tools import normalize_query
+    assert normalize_query("EV market outlook 2025") == normalize_query("the  2025 outlook of the ev MARKET")
+    assert normalize_query("EV market 2025") != normalize_query("EV market 2024")
+
+@patch("tools.tavily")
+def test_search_cache_hits_normalized_variants(mock_tavily_instance):
+    mock_tavily_instance.search.return_value = {"results": [{"content": "Cached", "url": "test.com"}]}
+    from tools import run_searches, search_cache_stats
+
+    first = run_searches(["EV market outlook 2025"])
+    second = run_searches(["the outlook for the EV market, 2025"])
+
+    assert first == second == [["Cached (Source: test.com)"]]
+    assert mock_tavily_instance.search.call_count == 1
+    assert search_cache_stats()["hits"] == 1
+
+@patch("tools.tavily")
+def test_search_cache_serves_stale_when_upstream_slow(mock_tavily_instance, monkeypatch, tmp_path):
+    import time
+    import tools
+    monkeypatch.setattr(tools, "SEARCH_CACHE_TTL", 0.0)
+    monkeypatch.setattr(tools, "SEARCH_STALE_AFTER", 0.05)
+
+    mock_tavily_instance.search.return_value = {"results": [{"content": "Old", "url": "test.com"}]}
+    tools.run_searches(["grid storage"])
+
+    def slow(query, **kwargs):
+        time.sleep(0.5)
+        return {"results": [{"content": "New", "url": "test.com"}]}
+    mock_tavily_instance.search.side_effect = slow
+    time.sleep(0.01)
+
+    assert tools.run_searches(["grid storage"]) == [["Old (Source: test.com)"]]
+    assert tools.search_cache_stats()["stale_hits"] == 1
+
+    # The refresh still running writes into the cache it was started from, not the current one
+    original = tools._search_cache
+    monkeypatch.setattr(tools, "SEARCH_CACHE_PATH", str(tmp_path / "other_cache.db"))
+    monkeypatch.setattr(tools, "_search_cache", None)
+    other = tools._get_search_cache()
+    while tools._refreshes:
+        time.sleep(0.01)
+    key = tools.make_key("tavily", tools.normalize_query("grid storage"), tools.SEARCH_MAX_RESULTS)
+    assert "New" in original.lookup(key).value
+    assert other.lookup(key) is None
+
+@patch("tools.tavily")
+def test_concurrent_stale_reads_share_one_refresh(mock_tavily_instance, monkeypatch):
+    import asyncio
+    import threading
+    import time
+    import tools
+    monkeypatch.setattr(tools, "SEARCH_CACHE_TTL", 0.0)
+    monkeypatch.setattr(tools, "SEARCH_STALE_AFTER", 0.05)
+
+    mock_tavily_instance.search.return_value = {"results": [{"content": "Old", "url": "test.com"}]}
+    tools.run_searches(["pumped hydro"])
+
+    calls = []
+    def slow(query, **kwargs):
+        calls.append(query)
+        time.sleep(0.3)
+        return {"results": [{"content": "New", "url": "test.com"}]}
+    mock_tavily_instance.search.side_effect = slow
+    time.sleep(0.01)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(tools._search_one("pumped hydro", 5)))
+               for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [["Old (Source: test.com)"]] * 10
+    assert len(calls) == 1
+    while tools._refreshes:
+        time.sleep(0.01)
+
+    class SlowAsyncTavily:
+        async def search(self, query, **kwargs):
+            calls.append(query)
+            await asyncio.sleep(0.3)
+            return {"results": [{"content": "Newer", "url": "test.com"}]}
+
+    async def read_concurrently():
+        stale = await asyncio.gather(*(tools._asearch_one("pumped hydro", 5) for _ in range(10)))
+        await asyncio.gather(*tools._arefreshes.values())
+        return stale
+
+    time.sleep(0.01)
+    with patch("tools.atavily", SlowAsyncTavily()):
+        assert asyncio.run(read_concurrently()) == [["New (Source: test.com)"]] * 10
+    assert len(calls) == 2
+
+
+def test_async_skills_use_async_clients():
+    import asyncio
+    from unittest.mock import AsyncMock
+    with patch("tools.ask_groq_async", new_callable=AsyncMock) as mock_ask, \
+         patch("tools.atavily") as mock_atavily, \
+         patch("tools.ask_groq") as mock_sync_ask:
+        mock_ask.return_value = '[{"query": "q1"}, {"query": "q2"}]'
+        mock_atavily.search = AsyncMock(return_value={"results": [{"content": "Async result", "url": "test.com"}]})
+
+        result = asyncio.run(robust_search_skill.ainvoke({"topic": "AI in 2025"}))
+
+        assert "Async result (Source: test.com)" in result
+        assert mock_atavily.search.await_count == 2
+        mock_sync_ask.assert_not_called()
+
+        mock_ask.return_value = "Async plan."
+        assert asyncio.run(expert_planner_skill.ainvoke({"topic": "AI"})) == "Async plan."
+
+def test_arun_searches_bounds_concurrency_and_keeps_order():
+    import asyncio
+    import tools
+
+    in_flight = {"now": 0, "peak": 0}
+
+    class FakeAsyncTavily:
+        async def search(self, query, **kwargs):
+            in_flight["now"] += 1
+            in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+            await asyncio.sleep(0.05 if query == "q0" else 0.01)
+            in_flight["now"] -= 1
+            if query == "hang":
+                await asyncio.sleep(5)
+            return {"results": [{"content": query, "url": "test.com"}]}
+
+    with patch("tools.atavily", FakeAsyncTavily()):
+        queries = ["q0", "q1", "q2", "q3", "hang"]
+        results = asyncio.run(tools.arun_searches(queries, max_concurrency=2, timeout=0.3))
+
+    assert [r[0] for r in results[:4]] == [f"q{i} (Source: test.com)" for i in range(4)]
+    assert results[4] == ["[search_error: hang] timed out after 0.3s"]
+    assert in_flight["peak"] <= 2
+
+def test_report_writer_streams_tokens_inside_graph():
+    from langgraph.graph import StateGraph, START, END
+    from typing_extensions import TypedDict
+
+    class State(TypedDict):
+        report: str
+
+    def write(state):
+        return {"report": report_writer_skill.invoke({"topic": "T", "plan": "P", "gathered_content": "C"})}
+
+    builder = StateGraph(State)
+    builder.add_node("write", write)
+    builder.add_edge(START, "write")
+    builder.add_edge("write", END)
+    graph = builder.compile()
+
+    with patch("tools.ask_groq_stream") as mock_stream, patch("tools.ask_groq") as mock_ask:
+        mock_stream.return_value = iter(["Final ", "report."])
+        events = list(graph.stream({"report": ""}, stream_mode=["custom", "values"]))
+
+    tokens = [data["report_token"] for mode, data in events if mode == "custom"]
+    assert tokens == ["Final ", "report."]
+    assert events[-1] == ("values", {"report": "Final report."})
+    mock_ask.assert_not_called()
+
+OUTLINE = ('{"title": "EV Outlook", "sections": ['
+           '{"name": "Battery costs", "subsections": ["Lithium prices"]}, '
+           '{"name": "Charging networks", "subsections": ["Fast chargers"]}]}')
+GATHERED = ("Lithium prices fell 20% in 2024 (Source: a.com)\n\n"
+            "Fast chargers doubled in Europe (Source: b.com)")
+
+def test_report_writer_writes_outline_sections_in_parallel():
+    import threading
+    import time
+    started, barrier = [], threading.Barrier(2, timeout=2)
+
+    def fake_ask(prompt, **kwargs):
+        if "SENIOR EDITOR" in prompt:
+            return "## Executive Summary\nBoth sections agree."
+        section = "Battery costs" if "SECTION TO WRITE ###\nBattery costs" in prompt else "Charging networks"
+        started.append(section)
+        barrier.wait()  # deadlocks unless both sections are in flight together
+        if section == "Battery costs":
+            assert "a.com" in prompt and "b.com" not in prompt
+            time.sleep(0.05)
+        return f"## {section}\nBody."
+
+    with patch("tools.ask_groq", side_effect=fake_ask), patch("tools.ask_groq_stream") as mock_stream:
+        result = report_writer_skill.invoke({"topic": "EV", "plan": OUTLINE, "gathered_content": GATHERED})
+
+    assert sorted(started) == ["Battery costs", "Charging networks"]
+    assert result.index("# EV Outlook") < result.index("## Executive Summary") \
+        < result.index("## Battery costs") < result.index("## Charging networks")
+    mock_stream.assert_not_called()
+
+def test_async_report_writer_writes_outline_sections():
+    import asyncio
+    from unittest.mock import AsyncMock
+
+    async def fake_ask(prompt, **kwargs):
+        if "SENIOR EDITOR" in prompt:
+            return "[error: summary failed]"
+        return "## Charging networks\nBody." if "SECTION TO WRITE ###\nCharging" in prompt else "## Battery costs\nBody."
+
+    with patch("tools.ask_groq_async", new=AsyncMock(side_effect=fake_ask)) as mock_ask:
+        result = asyncio.run(report_writer_skill.ainvoke({"topic": "EV", "plan": OUTLINE, "gathered_content": GATHERED}))
+
+    assert mock_ask.await_count == 3
+    assert result == "# EV Outlook\n\n## Battery costs\nBody.\n\n## Charging networks\nBody."
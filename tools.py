@@ -1,19 +1,84 @@
 import os
+import re
 import json
-from typing import List, Dict, Any, Optional
-from langchain_core.tools import tool
-from tavily import TavilyClient
+import math
+import logging
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait, as_completed
+from typing import List, Dict, Any, Optional, Tuple, TYPE_CHECKING
+from langchain_core.tools import StructuredTool
+from langgraph.config import get_stream_writer
 from pathlib import Path
-from groq_client import ask_groq
+from groq_client import ask_groq, ask_groq_async, ask_groq_stream, ask_groq_stream_async
+from disk_cache import DiskCache, make_key
+import clients
+import context_packer
+from singleflight import SingleFlight
 from prompts import (
     PLAN_PROMPT,
     WRITER_PROMPT,
     REFLECTION_PROMPT,
     RESEARCH_PLAN_PROMPT,
     RESEARCH_CRITIQUE_PROMPT,
+    SECTION_WRITER_PROMPT,
+    CONSISTENCY_PROMPT,
 )
 
-tavily = TavilyClient(api_key=os.getenv("TAVILY_API_KEY", ""))
+if TYPE_CHECKING:
+    from tavily import TavilyClient, AsyncTavilyClient
+
+logger = logging.getLogger(__name__)
+
+# Shared, connection-pooled clients from the registry (see clients.py), fetched
+# on first search so importing tools does not load the Tavily SDK
+tavily: Optional["TavilyClient"] = None
+# Async searches get the registry's client for the running event loop (an async
+# connection pool cannot move between loops); set this to use one client instead
+atavily: Optional["AsyncTavilyClient"] = None
+
+# === SEARCH CONCURRENCY ===
+# Upper bound on Tavily requests in flight for a single search step, and the
+# per-query timeout (seconds) handed to the HTTP client.
+SEARCH_MAX_WORKERS = int(os.getenv("SEARCH_MAX_WORKERS", "4"))
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "15"))
+SEARCH_MAX_RESULTS = 2
+
+# === SEARCH CACHE ===
+# Results are shared across processes through a local SQLite file. Once an
+# entry is older than SEARCH_CACHE_TTL it is refreshed from Tavily, but if the
+# refresh takes longer than SEARCH_STALE_AFTER seconds (or fails) the stale
+# copy is served and the refresh completes in the background.
+# Set SEARCH_CACHE_PATH to an empty string to disable the cache.
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", os.path.join(".cache", "search_cache.db"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", str(6 * 3600)))
+SEARCH_CACHE_MAX_STALE = float(os.getenv("SEARCH_CACHE_MAX_STALE", str(7 * 24 * 3600)))
+SEARCH_STALE_AFTER = float(os.getenv("SEARCH_STALE_AFTER", "3"))
+
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from how in into is it of on or the this to "
+    "what when where which who why with about vs versus".split()
+)
+
+# === SECTION-PARALLEL WRITING ===
+# When the plan is a JSON outline with at least SECTION_PARALLEL_MIN_SECTIONS
+# sections, each section is written concurrently and then stitched together.
+SECTION_PARALLEL_MIN_SECTIONS = int(os.getenv("SECTION_PARALLEL_MIN_SECTIONS", "2"))
+SECTION_MAX_WORKERS = int(os.getenv("SECTION_MAX_WORKERS", "6"))
+SECTION_MAX_TOKENS = int(os.getenv("SECTION_MAX_TOKENS", "700"))
+# Token budget for the gathered content packed into each section's prompt
+SECTION_CONTEXT_BUDGET = int(os.getenv("SECTION_CONTEXT_BUDGET", "2000"))
+
+_search_cache: Optional[DiskCache] = None
+_refresh_pool: Optional[ThreadPoolExecutor] = None
+_init_lock = threading.Lock()
+# Refreshes of stale entries in flight, at most one per cache key (async ones
+# per event loop); later readers of the key serve the stale copy meanwhile
+_refreshes: Dict[str, Future] = {}
+_arefreshes: Dict[Tuple[int, str], "asyncio.Task"] = {}
+_refresh_lock = threading.Lock()
+# Identical (normalized) queries in flight at the same time share one Tavily call
+_search_flights = SingleFlight("search")
 
 def safe_json_parse(text: str, fallback=None):
     import json, ast, re
@@ -35,8 +100,378 @@ def safe_json_parse(text: str, fallback=None):
     return fallback or {"queries": [], "text": cleaned}
 
 
-@tool
-def expert_planner_skill(topic: str) -> str:
+def normalize_query(query: str) -> str:
+    """
+    Canonical form of a search query used as the cache key: casefolded,
+    punctuation and stopwords removed, tokens de-duplicated and sorted.
+    """
+    tokens = re.findall(r"\w+", query.casefold())
+    kept = sorted({t for t in tokens if t not in _STOPWORDS})
+    return " ".join(kept or sorted(set(tokens)))
+
+
+def _get_search_cache() -> Optional[DiskCache]:
+    global _search_cache
+    if _search_cache is not None:
+        return _search_cache
+    if not SEARCH_CACHE_PATH:
+        return None
+    with _init_lock:
+        if _search_cache is None:
+            try:
+                _search_cache = DiskCache(SEARCH_CACHE_PATH, table="tavily_results",
+                                          ttl=SEARCH_CACHE_TTL, max_stale=SEARCH_CACHE_MAX_STALE)
+            except Exception as e:
+                logger.warning(f"⚠️ Search cache unavailable ({e}). Continuing without it.")
+                return None
+    return _search_cache
+
+
+def _get_refresh_pool() -> ThreadPoolExecutor:
+    global _refresh_pool
+    with _init_lock:
+        if _refresh_pool is None:
+            _refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tavily-refresh")
+    return _refresh_pool
+
+
+def search_cache_stats() -> dict:
+    """Hit/stale-hit/miss counters and hit rate for the Tavily result cache."""
+    cache = _get_search_cache()
+    if cache is None:
+        return {"enabled": False}
+    stats = cache.stats()
+    stats["enabled"] = True
+    return stats
+
+
+def search_inflight_stats() -> dict:
+    """Tavily calls made and concurrent duplicate queries that shared them."""
+    return _search_flights.stats()
+
+
+def _format_results(hits: List[Dict[str, Any]]) -> List[str]:
+    return [f"{r.get('content', '')} (Source: {r.get('url', '')})" for r in hits]
+
+
+def _fetch_search(query: str, timeout: float, cache: Optional[DiskCache] = None,
+                  cache_key: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Call Tavily and, when a cache and key are given, store the raw hits there
+    (the caller's cache, so a refresh that outlives it cannot write elsewhere).
+    """
+    search = _get_tavily().search(query=query, max_results=SEARCH_MAX_RESULTS, timeout=timeout)
+    hits = [{"content": r.get("content", ""), "url": r.get("url", "")} for r in search.get("results", [])]
+    if cache is not None and cache_key is not None:
+        try:
+            cache.set(cache_key, json.dumps(hits))
+        except Exception as e:
+            logger.warning(f"⚠️ Could not write search cache: {e}")
+    return hits
+
+
+def _forget_refresh(refreshes: dict, key: Any, done: Any) -> None:
+    with _refresh_lock:
+        if refreshes.get(key) is done:
+            del refreshes[key]
+
+
+def _search_one(query: str, timeout: float) -> List[str]:
+    cache = _get_search_cache()
+    cache_key = make_key("tavily", normalize_query(query), SEARCH_MAX_RESULTS)
+    if cache is None:
+        return _format_results(_search_flights.do(cache_key, lambda: _fetch_search(query, timeout)))
+
+    entry = cache.lookup(cache_key)
+    if entry is None:
+        # Concurrent misses for the same query share one upstream call
+        return _format_results(_search_flights.do(cache_key, lambda: _fetch_search(query, timeout, cache, cache_key)))
+    if entry.fresh:
+        cache.record_hit(entry)
+        return _format_results(json.loads(entry.value))
+
+    # Stale entry: give the upstream a short head start, otherwise serve stale
+    with _refresh_lock:
+        refresh = _refreshes.get(cache_key)
+        started = refresh is None
+        if started:
+            refresh = _refreshes[cache_key] = _get_refresh_pool().submit(
+                _fetch_search, query, timeout, cache, cache_key)
+    if not started:
+        logger.info(f"Serving stale search results for '{query}' (refresh already in flight)")
+        cache.record_hit(entry)
+        return _format_results(json.loads(entry.value))
+    refresh.add_done_callback(lambda done: _forget_refresh(_refreshes, cache_key, done))
+    try:
+        hits = refresh.result(timeout=SEARCH_STALE_AFTER)
+        cache.record_miss()
+        return _format_results(hits)
+    except Exception as e:
+        logger.info(f"Serving stale search results for '{query}' ({type(e).__name__}: {e})")
+        cache.record_hit(entry)
+        return _format_results(json.loads(entry.value))
+
+
+def run_searches(queries: List[str],
+                 max_workers: Optional[int] = None,
+                 timeout: Optional[float] = None) -> List[List[str]]:
+    """
+    Run Tavily searches concurrently on a bounded worker pool.
+    Returns one list of formatted results per query, in query order. A query
+    that fails or times out yields a single '[search_error: ...]' entry.
+    """
+    if not queries:
+        return []
+    max_workers = max(1, min(max_workers or SEARCH_MAX_WORKERS, len(queries)))
+    timeout = timeout or SEARCH_TIMEOUT
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tavily")
+    try:
+        futures = [executor.submit(_search_one, q, timeout) for q in queries]
+        # The HTTP client enforces the per-query timeout; this outer deadline is
+        # a safety net covering every "wave" of queries the pool has to run.
+        waves = math.ceil(len(queries) / max_workers)
+        wait(futures, timeout=timeout * waves + 1)
+
+        results = []
+        for q, fut in zip(queries, futures):
+            if not fut.done():
+                fut.cancel()
+                results.append([f"[search_error: {q}] timed out after {timeout:g}s"])
+                continue
+            try:
+                results.append(fut.result())
+            except Exception as e:
+                results.append([f"[search_error: {q}] {e}"])
+        return results
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _get_tavily() -> "TavilyClient":
+    global tavily
+    if tavily is None:
+        tavily = clients.get_tavily()
+    return tavily
+
+
+def _get_async_tavily() -> "AsyncTavilyClient":
+    return atavily if atavily is not None else clients.get_async_tavily()
+
+
+async def _afetch_search(query: str, timeout: float, cache: Optional[DiskCache] = None,
+                         cache_key: Optional[str] = None) -> List[Dict[str, Any]]:
+    search = await _get_async_tavily().search(query=query, max_results=SEARCH_MAX_RESULTS, timeout=timeout)
+    hits = [{"content": r.get("content", ""), "url": r.get("url", "")} for r in search.get("results", [])]
+    if cache is not None and cache_key is not None:
+        try:
+            cache.set(cache_key, json.dumps(hits))
+        except Exception as e:
+            logger.warning(f"⚠️ Could not write search cache: {e}")
+    return hits
+
+
+async def _asearch_one(query: str, timeout: float) -> List[str]:
+    cache = _get_search_cache()
+    cache_key = make_key("tavily", normalize_query(query), SEARCH_MAX_RESULTS)
+    if cache is None:
+        return _format_results(await _search_flights.ado(cache_key, lambda: _afetch_search(query, timeout)))
+
+    entry = cache.lookup(cache_key)
+    if entry is None:
+        return _format_results(await _search_flights.ado(cache_key, lambda: _afetch_search(query, timeout, cache, cache_key)))
+    if entry.fresh:
+        cache.record_hit(entry)
+        return _format_results(json.loads(entry.value))
+
+    slot = (id(asyncio.get_running_loop()), cache_key)
+    with _refresh_lock:
+        refresh = _arefreshes.get(slot)
+        started = refresh is None
+        if started:
+            refresh = _arefreshes[slot] = asyncio.ensure_future(_afetch_search(query, timeout, cache, cache_key))
+    if not started:
+        logger.info(f"Serving stale search results for '{query}' (refresh already in flight)")
+        cache.record_hit(entry)
+        return _format_results(json.loads(entry.value))
+    refresh.add_done_callback(lambda done: _forget_refresh(_arefreshes, slot, done))
+    try:
+        hits = await asyncio.wait_for(asyncio.shield(refresh), SEARCH_STALE_AFTER)
+        cache.record_miss()
+        return _format_results(hits)
+    except Exception as e:
+        logger.info(f"Serving stale search results for '{query}' ({type(e).__name__}: {e})")
+        cache.record_hit(entry)
+        return _format_results(json.loads(entry.value))
+
+
+async def arun_searches(queries: List[str],
+                        max_concurrency: Optional[int] = None,
+                        timeout: Optional[float] = None) -> List[List[str]]:
+    """
+    Async counterpart of `run_searches`: fans queries out on the event loop,
+    with at most `max_concurrency` in flight and a timeout on each query.
+    Results come back in query order.
+    """
+    timeout = timeout or SEARCH_TIMEOUT
+    semaphore = asyncio.Semaphore(max(1, max_concurrency or SEARCH_MAX_WORKERS))
+
+    async def _bounded(q: str) -> List[str]:
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(_asearch_one(q, timeout), timeout)
+            except asyncio.TimeoutError:
+                return [f"[search_error: {q}] timed out after {timeout:g}s"]
+            except Exception as e:
+                return [f"[search_error: {q}] {e}"]
+
+    return list(await asyncio.gather(*(_bounded(q) for q in queries)))
+
+
+def _extract_queries(response_text: str) -> List[str]:
+    """Pull search query strings out of the research planner's response."""
+    queries_data = safe_json_parse(response_text)
+    if isinstance(queries_data, list):
+        # RESEARCH_PLAN_PROMPT asks for a JSON array of {"query": ...} objects
+        return [item.get("query", "") if isinstance(item, dict) else str(item) for item in queries_data]
+    return queries_data.get("queries", []) or queries_data.get("text", "").splitlines()
+
+
+def _research_prompt(topic: str, context: Optional[str]) -> str:
+    prompt_text = f"{RESEARCH_PLAN_PROMPT}\n\nTask: {topic}"
+    if context:
+        prompt_text += f"\n\nContext:\n{context}"
+    return prompt_text
+
+
+def _get_token_writer():
+    """
+    The graph's custom stream writer when running inside a LangGraph run, else
+    None. Report tokens are emitted as {"report_token": chunk} custom events.
+    """
+    try:
+        return get_stream_writer()
+    except (RuntimeError, KeyError):
+        # Invoked directly (no runnable context) or as a plain tool outside a graph
+        return None
+
+
+def _parse_outline(plan: str) -> Optional[Dict[str, Any]]:
+    """
+    The planner's JSON outline as {"title", "sections": [{"name", "subsections"}]},
+    or None when the plan is not a usable multi-section outline.
+    """
+    outline = safe_json_parse(plan, fallback={})
+    if not isinstance(outline, dict):
+        return None
+    sections = [s for s in outline.get("sections") or [] if isinstance(s, dict) and s.get("name")]
+    if len(sections) < SECTION_PARALLEL_MIN_SECTIONS:
+        return None
+    return {"title": outline.get("title") or "", "sections": sections}
+
+
+def _section_query(section: Dict[str, Any]) -> str:
+    return " ".join([str(section["name"]), *map(str, section.get("subsections") or [])])
+
+
+def _plan_queries(plan: str) -> List[str]:
+    """Ranking queries for context packing: one per outline section, or the plan text itself."""
+    outline = safe_json_parse(plan, fallback={})
+    sections = outline.get("sections") if isinstance(outline, dict) else None
+    queries = [_section_query(s) for s in sections or [] if isinstance(s, dict) and s.get("name")]
+    return queries or [plan]
+
+
+def _critique_block(critique: str) -> str:
+    return f"\n\nCritique of the previous draft (address every point):\n{critique}" if critique else ""
+
+
+def _section_prompts(topic: str, outline: Dict[str, Any], gathered_content: str, critique: str = "") -> List[str]:
+    snippets = context_packer.dedupe(context_packer.parse_snippets(gathered_content))
+    outline_text = "\n".join(f"- {s['name']}" for s in outline["sections"])
+    title = outline["title"] or topic
+    return [
+        SECTION_WRITER_PROMPT.format(
+            title=title,
+            outline=outline_text,
+            section=section["name"],
+            subsections=", ".join(map(str, section.get("subsections") or [])) or "(none)",
+            content=context_packer.format_snippets(
+                context_packer.pack(snippets, [_section_query(section)], SECTION_CONTEXT_BUDGET)
+            ) or "(no supporting content gathered)",
+        ) + _critique_block(critique)
+        for section in outline["sections"]
+    ]
+
+
+def _stitch(topic: str, outline: Dict[str, Any], sections: List[str], summary: str) -> str:
+    parts = [f"# {outline['title'] or topic}"]
+    if summary and not summary.startswith("[error"):
+        parts.append(summary.strip())
+    parts.extend(section.strip() for section in sections)
+    return "\n\n".join(parts)
+
+
+def _write_sections(topic: str, outline: Dict[str, Any], gathered_content: str, writer=None,
+                    critique: str = "") -> str:
+    """
+    Map-reduce writer: one concurrent completion per outline section, a short
+    consistency pass that adds an executive summary, then the stitched report.
+    Finished sections are streamed in document order as soon as every section
+    before them is done. A `critique` of the previous draft goes to every section.
+    """
+    prompts = _section_prompts(topic, outline, gathered_content, critique)
+    sections: List[Optional[str]] = [None] * len(prompts)
+    flushed = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, min(SECTION_MAX_WORKERS, len(prompts))),
+                            thread_name_prefix="section-writer") as executor:
+        futures = {executor.submit(ask_groq, p, max_tokens=SECTION_MAX_TOKENS): i for i, p in enumerate(prompts)}
+        for fut in as_completed(futures):
+            i = futures[fut]
+            try:
+                sections[i] = fut.result()
+            except Exception as e:
+                sections[i] = f"## {outline['sections'][i]['name']}\n\n[error: section writer failed] {e}"
+            while writer is not None and flushed < len(sections) and sections[flushed] is not None:
+                writer({"report_token": sections[flushed].strip() + "\n\n"})
+                flushed += 1
+
+    summary = ask_groq(f"{CONSISTENCY_PROMPT}\n\nReport:\n" + "\n\n".join(sections), max_tokens=400)
+    return _stitch(topic, outline, sections, summary)
+
+
+async def _awrite_sections(topic: str, outline: Dict[str, Any], gathered_content: str, writer=None,
+                           critique: str = "") -> str:
+    prompts = _section_prompts(topic, outline, gathered_content, critique)
+    semaphore = asyncio.Semaphore(max(1, SECTION_MAX_WORKERS))
+    sections: List[Optional[str]] = [None] * len(prompts)
+    flushed = 0
+
+    async def _write(i: int, prompt_text: str) -> None:
+        nonlocal flushed
+        async with semaphore:
+            try:
+                sections[i] = await ask_groq_async(prompt_text, max_tokens=SECTION_MAX_TOKENS)
+            except Exception as e:
+                sections[i] = f"## {outline['sections'][i]['name']}\n\n[error: section writer failed] {e}"
+        while writer is not None and flushed < len(sections) and sections[flushed] is not None:
+            writer({"report_token": sections[flushed].strip() + "\n\n"})
+            flushed += 1
+
+    await asyncio.gather(*(_write(i, p) for i, p in enumerate(prompts)))
+    summary = await ask_groq_async(f"{CONSISTENCY_PROMPT}\n\nReport:\n" + "\n\n".join(sections), max_tokens=400)
+    return _stitch(topic, outline, sections, summary)
+
+
+def _writer_prompt(topic: str, plan: str, gathered_content: str, critique: str = "") -> str:
+    # WRITER_PROMPT has no {content} slot, so the packed evidence is appended explicitly
+    content = context_packer.pack_context(gathered_content, _plan_queries(plan))
+    return (f"{WRITER_PROMPT}\n\nTask: {topic}\n\nPlan:\n{plan}{_critique_block(critique)}"
+            f"\n\nSupporting content:\n{content}")
+
+
+def _expert_planner(topic: str) -> str:
     """
     Use this skill to create a professional PRD/report outline before beginning research and writing.
     Returns a comprehensive outline mapped to the task topic.
@@ -48,35 +483,44 @@ def expert_planner_skill(topic: str) -> str:
     except Exception as e:
         return f"[error: expert_planner_skill failed] {e}"
 
-@tool
-def robust_search_skill(topic: str, context: Optional[str] = None) -> str:
+async def _aexpert_planner(topic: str) -> str:
+    prompt_text = f"{PLAN_PROMPT}\n\nTask: {topic}"
+    try:
+        return await ask_groq_async(prompt_text, max_tokens=500)
+    except Exception as e:
+        return f"[error: expert_planner_skill failed] {e}"
+
+def _robust_search(topic: str, context: Optional[str] = None) -> str:
     """
     Use this skill to generate search queries and gather verified information on a particular topic.
     Optionally provide context like a critique or research plan to focus the search.
     """
-    prompt_text = f"{RESEARCH_PLAN_PROMPT}\n\nTask: {topic}"
-    if context:
-        prompt_text += f"\n\nContext:\n{context}"
-    
     try:
-        response_text = ask_groq(prompt_text, max_tokens=300)
-        queries_data = safe_json_parse(response_text)
-        queries = queries_data.get("queries", []) or queries_data.get("text", "").splitlines()
+        response_text = ask_groq(_research_prompt(topic, context), max_tokens=300)
+        queries = _extract_queries(response_text)
     except Exception as e:
         return f"[error: robust_search_skill failed parsing queries] {e}"
 
     results = []
-    for q in queries:
-        try:
-            search = tavily.search(query=q, max_results=2)
-            results.extend([f"{r.get('content', '')} (Source: {r.get('url', '')})" for r in search.get("results", [])])
-        except Exception as e:
-            results.append(f"[search_error: {q}] {e}")
-            
+    for query_results in run_searches(queries):
+        results.extend(query_results)
+
+    return "\n\n".join(results)
+
+async def _arobust_search(topic: str, context: Optional[str] = None) -> str:
+    try:
+        response_text = await ask_groq_async(_research_prompt(topic, context), max_tokens=300)
+        queries = _extract_queries(response_text)
+    except Exception as e:
+        return f"[error: robust_search_skill failed parsing queries] {e}"
+
+    results = []
+    for query_results in await arun_searches(queries):
+        results.extend(query_results)
+
     return "\n\n".join(results)
 
-@tool
-def critique_skill(draft: str) -> str:
+def _critique(draft: str) -> str:
     """
     Use this skill to analyze a draft for weaknesses, factual accuracy, and logical cohesion.
     Returns highly critical feedback as JSON data.
@@ -87,13 +531,58 @@ def critique_skill(draft: str) -> str:
     except Exception as e:
         return f"[error: critique_skill failed] {e}"
 
-@tool
-def report_writer_skill(topic: str, plan: str, gathered_content: str) -> str:
+async def _acritique(draft: str) -> str:
+    prompt_text = f"{REFLECTION_PROMPT}\n\nDraft:\n{draft}"
+    try:
+        return await ask_groq_async(prompt_text, max_tokens=500)
+    except Exception as e:
+        return f"[error: critique_skill failed] {e}"
+
+def _report_writer(topic: str, plan: str, gathered_content: str, critique: str = "") -> str:
     """
     Use this skill to piece together the final generated report combining the topic, outline plan, and gathered information content.
+    Pass the critique of a previous draft as `critique` when revising; keep `plan` unchanged.
     """
-    prompt_text = WRITER_PROMPT.format(content=gathered_content) + f"\n\nTask: {topic}\n\nPlan:\n{plan}"
+    writer = _get_token_writer()
+    try:
+        outline = _parse_outline(plan)
+        if outline is not None:
+            return _write_sections(topic, outline, gathered_content, writer, critique)
+        prompt_text = _writer_prompt(topic, plan, gathered_content, critique)
+        if writer is None:
+            return ask_groq(prompt_text, max_tokens=1500)
+        parts = []
+        for chunk in ask_groq_stream(prompt_text, max_tokens=1500):
+            parts.append(chunk)
+            writer({"report_token": chunk})
+        return "".join(parts)
+    except Exception as e:
+        return f"[error: report_writer_skill failed] {e}"
+
+async def _areport_writer(topic: str, plan: str, gathered_content: str, critique: str = "") -> str:
+    writer = _get_token_writer()
     try:
-        return ask_groq(prompt_text, max_tokens=1500)
+        outline = _parse_outline(plan)
+        if outline is not None:
+            return await _awrite_sections(topic, outline, gathered_content, writer, critique)
+        prompt_text = _writer_prompt(topic, plan, gathered_content, critique)
+        if writer is None:
+            return await ask_groq_async(prompt_text, max_tokens=1500)
+        parts = []
+        async for chunk in ask_groq_stream_async(prompt_text, max_tokens=1500):
+            parts.append(chunk)
+            writer({"report_token": chunk})
+        return "".join(parts)
     except Exception as e:
         return f"[error: report_writer_skill failed] {e}"
+
+# Each skill carries a sync and an async implementation: `graph.stream` runs
+# the former, `graph.astream` awaits the latter without tying up a thread.
+expert_planner_skill = StructuredTool.from_function(
+    func=_expert_planner, coroutine=_aexpert_planner, name="expert_planner_skill")
+robust_search_skill = StructuredTool.from_function(
+    func=_robust_search, coroutine=_arobust_search, name="robust_search_skill")
+critique_skill = StructuredTool.from_function(
+    func=_critique, coroutine=_acritique, name="critique_skill")
+report_writer_skill = StructuredTool.from_function(
+    func=_report_writer, coroutine=_areport_writer, name="report_writer_skill")